@@ -2,14 +2,23 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from io import BytesIO
+import time
 from streamlit_extras.add_vertical_space import add_vertical_space
 
-from preprocessing.cleaner import preprocess_text
-from preprocessing.rules import detect_category, detect_priority
-from llm.gpt_classifier import classify_with_gpt
-from models.email_schema import EmailOutput
+from pipeline import pipeline_version, safe_str
+from llm.scoring import WEIGHTS, SCORE_TO_PRIORITY, rescore_frame
+from utils.aggregates import RunningAggregates
+from utils.compact import compact_results, memory_report, take_rows
+from utils.excel_io import EXCEL_MAX_CELL_CHARS, export_bytes, needs_bundle
+from utils.filter_index import FilterIndex
+from utils.people import PeopleIndex
+from utils.jobs import ACTIVE_STATES, JobRunner, JobStore
+from utils.result_cache import ResultCache, cache_key
+from utils.search_index import SearchIndex
+from utils.warehouse import Warehouse
+from utils.review import SORT_OPTIONS, page_count, page_positions, review_positions
 
 
 # --------------------------------------------------
@@ -118,8 +127,34 @@ st.markdown("""
 # --------------------------------------------------
 # HELPERS
 # --------------------------------------------------
-def safe_str(value):
-    return "" if value is None or pd.isna(value) else str(value).strip()
+# LLM requests in flight while analysing an upload (shared pooled client)
+LLM_CONCURRENCY = 8
+ANALYSIS_MODE = "tiered"
+LIVE_REFRESH_SECONDS = 2
+PRIORITY_COLORS = {"Critical": "#EF4444", "High": "#F59E0B", "Medium": "#EAB308", "Low": "#22C55E"}
+PEOPLE_BATCH_ROWS = 50_000
+
+
+@st.cache_resource
+def get_result_cache():
+    # Shared by every session in this server process. Disk only: each
+    # session keeps its own compact copy (see compact_results), so holding
+    # full frames in memory here as well would defeat the point
+    return ResultCache(max_entries=0)
+
+
+@st.cache_resource
+def get_job_runner():
+    # One runner per server process: claims queued uploads and runs each in a
+    # worker process (MAX_CONCURRENT_JOBS at a time); jobs outlive the tab
+    return JobRunner(JobStore()).start()
+
+
+@st.cache_resource
+def get_warehouse():
+    # Every finished job is appended by its worker; the History view only reads
+    return Warehouse()
+
 
 def get_priority_badge(priority):
     badges = {
@@ -131,6 +166,322 @@ def get_priority_badge(priority):
     return badges.get(priority, priority)
 
 
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def render_job_progress(job_id):
+    """
+    Status of a queued / running analysis job and its partial results,
+    refreshed every few seconds from the job row (the worker's incremental
+    aggregates, never the rows themselves).
+    """
+    job_store = get_job_runner().store
+    job = job_store.get(job_id)
+    if job is None or job["status"] not in ACTIVE_STATES:
+        st.rerun()
+
+    if job["status"] == "queued":
+        ahead = job_store.queue_position(job_id)
+        if job["preempted"]:
+            st.info(f"⏸️ Paused for a higher-risk upload — resumes from its checkpoint when a worker frees up "
+                    f"({ahead} job(s) ahead of this one)")
+        else:
+            st.info(f"⏳ Waiting for a free worker — {ahead} job(s) ahead of this one")
+    if st.button("✖️ Cancel analysis", key=f"cancel_{job_id}"):
+        job_store.request_cancel(job_id)
+        st.rerun()
+
+    live = job["live"] or {"emails": 0, "priority_counts": {}, "critical_items": []}
+    elapsed = time.time() - (job["started_at"] or job["created_at"])
+    stage_labels = {
+        "clean": "Cleaning email",
+        "local": "Local model scored",
+        "llm": "AI analysis of unique email",
+    }
+    if job["status"] == "running" and job["stage"]:
+        st.text(f"Job {job_id} · chunk {job['chunk']} · {stage_labels[job['stage']]} {job['stage_done']} of "
+                f"{job['stage_total']}... ({live['emails']:,} emails finished so far, {elapsed:,.0f}s)")
+        st.progress(job["stage_done"] / job["stage_total"] if job["stage_total"] else 1.0)
+    elif job["status"] == "running":
+        st.text(f"Job {job_id} · reading workbook...")
+
+    counts = live["priority_counts"]
+    cards = st.columns(5)
+    for col, (label, value) in zip(cards, [("Analysed so far", live["emails"])] +
+                                   [(p, counts.get(p, 0)) for p in PRIORITY_COLORS]):
+        with col:
+            st.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-label">{label}</div>
+                    <div class="metric-value">{value:,}</div>
+                </div>
+            """, unsafe_allow_html=True)
+
+    if live["emails"]:
+        left, right = st.columns([2, 3])
+        with left:
+            pri_data = pd.DataFrame({"priority": list(PRIORITY_COLORS),
+                                     "count": [counts.get(p, 0) for p in PRIORITY_COLORS]})
+            fig = px.bar(pri_data, x="priority", y="count", title="Priority Distribution (so far)", text="count",
+                         color="priority", color_discrete_map=PRIORITY_COLORS)
+            fig.update_traces(textposition="outside")
+            fig.update_layout(showlegend=False, height=400)
+            st.plotly_chart(fig, width="stretch", height=400)
+        with right:
+            st.markdown(f"**🔴 Critical emails found so far** (top {len(live['critical_items'])} by score)")
+            if live["critical_items"]:
+                st.dataframe(pd.DataFrame(live["critical_items"]).rename(columns={
+                    "unique_id": "Unique ID", "subject": "Subject", "from_email": "From",
+                    "category": "Category", "score": "Risk Score /100",
+                }), width="stretch", height=360, hide_index=True)
+            else:
+                st.caption("None yet")
+        if live.get("people"):
+            st.markdown("**👥 Riskiest senders so far**")
+            st.dataframe(pd.DataFrame(live["people"])[["address", "sent", "critical_sent", "max_score", "top_category"]]
+                         .rename(columns={"address": "Sender", "sent": "Sent", "critical_sent": "Critical Sent",
+                                          "max_score": "Max Score", "top_category": "Top Category"}),
+                         width="stretch", hide_index=True)
+
+
+def render_history_view(category_filter, priority_filter):
+    """
+    Questions across every stored run, answered from the history warehouse
+    (nothing is re-uploaded or reprocessed). The sidebar filters apply.
+    """
+    warehouse = get_warehouse()
+    st.markdown('<h2 class="section-header">🕘 Analysis History</h2>', unsafe_allow_html=True)
+    days = st.select_slider("Look back", options=[7, 30, 90, 180, 365, 730], value=90,
+                            format_func=lambda d: f"{d} days")
+
+    summary = warehouse.summary(days)
+    if not summary["runs"]:
+        st.info("No analyses stored for this period yet. Finished uploads and batch runs are added automatically.")
+        return
+    cards = st.columns(6)
+    for col, (label, value) in zip(cards, [("Runs", summary["runs"]), ("Emails", summary["emails"])] +
+                                   [(p, summary["priority_counts"].get(p, 0)) for p in PRIORITY_COLORS]):
+        with col:
+            st.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-label">{label}</div>
+                    <div class="metric-value">{value:,}</div>
+                </div>
+            """, unsafe_allow_html=True)
+
+    priorities = priority_filter or ["Critical"]
+    left, right = st.columns([2, 3])
+    with left:
+        senders = warehouse.top_senders(days, priorities=priorities, categories=category_filter)
+        st.markdown(f"**👤 Top senders by {' / '.join(priorities)} count**")
+        st.dataframe(senders.rename(columns={"sender": "From", "emails": "Emails", "avg_score": "Avg Score"}),
+                     width="stretch", height=400, hide_index=True,
+                     column_config={"Avg Score": st.column_config.NumberColumn(format="%.1f")})
+    with right:
+        trend = warehouse.daily_counts(days, by="priority", categories=category_filter,
+                                       priorities=priority_filter)
+        fig = px.bar(trend, x="date", y="emails", color="priority", title="Emails per day",
+                     color_discrete_map=PRIORITY_COLORS,
+                     category_orders={"priority": list(PRIORITY_COLORS)})
+        fig.update_layout(height=400, xaxis_title=None)
+        st.plotly_chart(fig, width="stretch", height=400)
+
+    st.markdown("**🔎 Highest-risk emails across runs**")
+    sender = st.text_input("Sender address (exact)", placeholder="e.g. john.smith@bank.com").strip()
+    matches = warehouse.search(days, categories=category_filter, priorities=priority_filter, sender=sender or None)
+    st.dataframe(matches.rename(columns={
+        "run_at": "Analysed", "file_name": "File", "unique_id": "Unique ID", "from_email": "From",
+        "to_email": "To", "subject": "Subject", "category": "Category", "priority": "Priority",
+        "score": "Risk Score /100", "source": "Source",
+    }), width="stretch", height=400, hide_index=True)
+
+    with st.expander("🗂️ Stored runs"):
+        st.dataframe(warehouse.runs().rename(columns={
+            "run_id": "Run", "file_name": "File", "mode": "Mode", "run_at": "Analysed", "emails": "Emails",
+            "critical": "Critical",
+        }), width="stretch", hide_index=True)
+
+
+def build_people_index(frame):
+    """
+    Per-person rollup of a results frame, fed batch by batch the same way a
+    running job feeds it; row ids are frame positions.
+    """
+    people = PeopleIndex()
+    columns = ["from_email", "to_email", "category", "priority", "score"]
+    for start in range(0, len(frame), PEOPLE_BATCH_ROWS):
+        stop = min(start + PEOPLE_BATCH_ROWS, len(frame))
+        people.update(frame.iloc[start:stop][columns], row_ids=np.arange(start, stop))
+    return people
+
+
+def load_search_index(result_cache, key, frame):
+    """
+    Full-text index of a result: the one saved next to the cached result
+    (memory-mapped), or built and saved now (results cached before indexes
+    existed, or evicted indexes).
+    """
+    path = result_cache.artifact_path(key, "search")
+    index = SearchIndex.load(path) if path else None
+    if index is None or index.n_docs != len(frame):
+        index = SearchIndex.build(frame)
+        if path:
+            index.save(path)
+    return index
+
+
+def render_people_view(people, df_full, display_positions):
+    """
+    Who is risky: ranked per-person rollup and a drill-down into one
+    person's emails (sidebar filters apply to the drill-down).
+    """
+    st.markdown('<h2 class="section-header">👥 People Risk Rollup</h2>', unsafe_allow_html=True)
+    rank_options = {
+        "Critical emails sent": "critical_sent",
+        "Critical emails received": "critical_received",
+        "Highest risk score": "max_score",
+        "Average risk score": "avg_score",
+        "Emails sent": "sent",
+        "Emails received": "received",
+    }
+    rank_col, size_col = st.columns([3, 1])
+    with rank_col:
+        rank_by = st.selectbox("Rank people by", list(rank_options), key="people_rank")
+    with size_col:
+        show = st.selectbox("Show", [25, 50, 100, 250], key="people_show")
+    ranked = people.top(show, by=rank_options[rank_by])
+    st.caption(f"{len(people.book):,} distinct addresses across {people.n_rows:,} emails")
+    st.dataframe(ranked.rename(columns={
+        "address": "Address", "emails": "Emails", "sent": "Sent", "received": "Received",
+        "critical_sent": "Critical Sent", "critical_received": "Critical Received", "max_score": "Max Score",
+        "avg_score": "Avg Score", "top_category": "Top Category",
+    }), width="stretch", height=400, hide_index=True,
+        column_config={"Max Score": st.column_config.NumberColumn(format="%.0f"),
+                       "Avg Score": st.column_config.NumberColumn(format="%.1f")})
+
+    pick_col, type_col, role_col = st.columns([2, 2, 1])
+    with pick_col:
+        picked = st.selectbox("Person", ranked["address"].tolist(), key="people_pick")
+    with type_col:
+        typed = st.text_input("…or any address", key="people_address", placeholder="e.g. trader@bank.com").strip()
+    with role_col:
+        role = st.selectbox("Emails", ["Sent & received", "Sent", "Received"], key="people_role")
+    address = typed or picked
+    person = people.person(address) if address else None
+    if person is None:
+        if address:
+            st.info(f"No emails from or to {address}")
+        return
+
+    cards = st.columns(6)
+    for col, (label, value) in zip(cards, [
+        ("Emails", f"{person['emails']:,}"), ("Sent", f"{person['sent']:,}"), ("Received", f"{person['received']:,}"),
+        ("Critical Sent", f"{person['critical_sent']:,}"), ("Critical Received", f"{person['critical_received']:,}"),
+        ("Max Score", f"{person['max_score']:.0f}"),
+    ]):
+        with col:
+            st.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-label">{label}</div>
+                    <div class="metric-value">{value}</div>
+                </div>
+            """, unsafe_allow_html=True)
+
+    mix_col, rows_col = st.columns([2, 3])
+    with mix_col:
+        mix = pd.DataFrame({"category": list(person["category_mix"]), "count": list(person["category_mix"].values())})
+        fig = px.bar(mix, x="count", y="category", orientation="h", title=f"Category mix — {person['address']}",
+                     text="count", color_discrete_sequence=["#60A5FA"])
+        fig.update_layout(showlegend=False, height=400, yaxis={"categoryorder": "total ascending"}, yaxis_title=None)
+        st.plotly_chart(fig, width="stretch", height=400)
+    with rows_col:
+        positions = people.rows(address, role={"Sent": "sent", "Received": "received"}.get(role))
+        positions = np.intersect1d(positions, display_positions, assume_unique=True)
+        emails = take_rows(df_full, positions, {}, ["unique_id", "from_email", "to_email", "subject", "category",
+                                                    "priority", "score"])
+        st.markdown(f"**📧 {len(emails):,} emails** (highest risk first)")
+        st.dataframe(emails.sort_values("score", ascending=False, kind="stable").rename(columns={
+            "unique_id": "Unique ID", "from_email": "From", "to_email": "To", "subject": "Subject",
+            "category": "Category", "priority": "Priority", "score": "Risk Score /100",
+        }), width="stretch", height=360, hide_index=True)
+
+
+def render_email_review(row):
+    """
+    Expander with the original email and its compliance analysis.
+    """
+    subject = safe_str(row['subject']) or "No Subject"
+    badge = get_priority_badge(row['priority'])
+    
+    priority_emoji = {
+        "Critical": "🔴",
+        "High": "🟠",
+        "Medium": "🟡",
+        "Low": "🟢"
+    }.get(row['priority'], "⚪")
+
+    with st.expander(f"📧 **{subject}** &nbsp;&nbsp; {priority_emoji} {row['priority']} &nbsp;&nbsp; `{row['category']}`"):
+        c1, c2 = st.columns(2, gap="large")
+        
+        with c1:
+            st.subheader("📩 Original Email")
+            st.write(f"**From:** {row['from_email']}")
+            st.write(f"**To:** {row['to_email']}")
+            st.write(f"**Subject:** {subject}")
+            st.text_area("Body", row["email_body"], height=300, disabled=True, label_visibility="collapsed",
+                         key=f"review_body_{row.name}")
+        
+        with c2:
+            st.subheader("🛡️ Compliance Analysis")
+            
+            source = row.get("source", "llm" if row.get('llm_success', True) else "rules")
+            source_text = {"llm": "AI (LLM)", "local": "Local model"}.get(source, "Rule-based fallback")
+            st.markdown(f"**Source:** {source_text}")
+            inherited_from = row.get("inherited_from")
+            if inherited_from is not None and pd.notna(inherited_from):
+                st.caption(f"♻️ Result reused from email #{int(inherited_from)} — same conversation or a near-duplicate "
+                           f"(no extra LLM call)")
+            
+            if source == "local":
+                st.info("🧠 Classified by the local model (confident prediction, no LLM call)")
+            elif row.get('llm_success', True):
+                st.success("✅ AI analysis successful")
+            else:
+                st.error("❌ AI analysis failed — using rule-based fallback")
+                st.caption("Possible causes: Invalid API key, network issue, rate limit, or model error")
+            
+            st.markdown(f"**Risk Category:** `{row['category']}`")
+            st.markdown(f"**Priority Level:** {badge}", unsafe_allow_html=True)
+
+            st.markdown("### 📊 Scoring Breakdown")
+            score = row.get("score", 0.0)
+            st.markdown(f"**Final Risk Score:** `{score}/100`")
+
+            col_a, col_b, col_c = st.columns(3)
+            with col_a:
+                st.metric("Category Weight", "60%")
+            with col_b:
+                st.metric("Confidence Weight", "30%")
+            with col_c:
+                st.metric("Language Risk Weight", "10%")
+
+            st.caption("Score = 100 × (0.60 × norm_category + 0.30 × confidence + 0.10 × language_risk)")
+
+            # TOKEN USAGE DISPLAY
+            if row.get('llm_success', True) and row.get('total_tokens', 0) > 0:
+                col_t1, col_t2, col_t3 = st.columns(3)
+                with col_t1:
+                    st.metric("Prompt Tokens", row['prompt_tokens'])
+                with col_t2:
+                    st.metric("Completion Tokens", row['completion_tokens'])
+                with col_t3:
+                    st.metric("Total Tokens", row['total_tokens'])
+                st.caption("Token usage for this email classification (cost monitoring)")
+            elif source == "rules":
+                st.caption("Token usage not available — AI analysis failed")
+
+            st.text_area("Cleaned Text", row["cleaned_text"], height=300, disabled=True, label_visibility="collapsed",
+                         key=f"review_cleaned_{row.name}")
+
+
 # --------------------------------------------------
 # HEADER
 # --------------------------------------------------
@@ -141,6 +492,8 @@ st.markdown('<p class="subtitle">Hybrid Rule-based + LLM-powered detection of co
 # SIDEBAR - FILTERS ALWAYS VISIBLE & STABLE
 # --------------------------------------------------
 with st.sidebar:
+    view = st.radio("View", ["📊 Analysis", "👥 People", "🕘 History"], horizontal=True, key="view")
+
     st.header("🔍 Filters")
 
     CATEGORY_OPTIONS = [
@@ -182,6 +535,14 @@ with st.sidebar:
     st.caption("Use the clear button to start over with a new dataset")
 
 
+# --------------------------------------------------
+# HISTORY (all stored runs, no upload needed)
+# --------------------------------------------------
+if view == "🕘 History":
+    render_history_view(category_filter, priority_filter)
+    st.stop()
+
+
 # --------------------------------------------------
 # FILE UPLOAD
 # --------------------------------------------------
@@ -196,8 +557,10 @@ if not uploaded:
     st.info("⬆️ Please upload an Excel file to begin analysis")
     st.stop()
 
-if "last_uploaded_filename" not in st.session_state or st.session_state.last_uploaded_filename != uploaded.name:
-    st.session_state.last_uploaded_filename = uploaded.name
+# Results are keyed by the file's content + pipeline/prompt version, not its name
+upload_key = cache_key(uploaded.getvalue(), pipeline_version(ANALYSIS_MODE))
+if st.session_state.get("upload_key") != upload_key:
+    st.session_state.upload_key = upload_key
     st.session_state.pop("processed_df", None)
 
 st.success(f"✅ Successfully loaded: **{uploaded.name}**")
@@ -207,72 +570,74 @@ st.success(f"✅ Successfully loaded: **{uploaded.name}**")
 # PROCESSING
 # --------------------------------------------------
 if "processed_df" not in st.session_state:
-    with st.spinner("🔄 Analyzing emails with Rules + AI intelligence..."):
-        df = pd.read_excel(uploaded).fillna("")
-
-        results = []
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        for i, row in df.iterrows():
-            status_text.text(f"Processing email {i + 1} of {len(df)}...")
-
-            raw_body = safe_str(row.get("Email Body (BEFORE Preprocessing – with Junk)"))
-            cleaned, junk = preprocess_text(raw_body)
-
-            rule_cat = detect_category(cleaned)
-            rule_pri = detect_priority(rule_cat)
-
-            # Default: assume success
-            llm_success = True
-            final_score = 0.0
-            prompt_tokens = 0
-            completion_tokens = 0
-            total_tokens = 0
-
-            try:
-                llm_result = classify_with_gpt(cleaned, rule_cat, rule_pri)
-                final_cat = llm_result.final_category
-                final_pri = llm_result.final_priority
-                final_score = llm_result.score
-                llm_success = llm_result.llm_success
-                prompt_tokens = llm_result.prompt_tokens
-                completion_tokens = llm_result.completion_tokens
-                total_tokens = llm_result.total_tokens
-            except Exception as e:
-                print(f"LLM failed for email {i+1}: {e}")
-                final_cat = rule_cat
-                final_pri = rule_pri
-                final_score = 0.0
-                llm_success = False
-                prompt_tokens = 0
-                completion_tokens = 0
-                total_tokens = 0
-
-            record = EmailOutput(
-                unique_id=int(row.get("Unique ID", 0)),
-                from_email=safe_str(row.get("From")),
-                to_email=safe_str(row.get("To")),
-                subject=safe_str(row.get("Subject")),
-                email_body=raw_body,
-                category=final_cat,
-                priority=final_pri,
-                junk_removed=junk,
-                cleaned_text=cleaned,
-                score=final_score,
-                llm_success=llm_success,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens
-            )
-            results.append(record.dict())
-            progress_bar.progress((i + 1) / len(df))
-
-        st.session_state.processed_df = pd.DataFrame(results)
-        status_text.empty()
-        progress_bar.empty()
+    result_cache = get_result_cache()
+    job_store = get_job_runner().store
+    job_id = st.session_state.get("job_id") if st.session_state.get("job_key") == upload_key else None
+    if job_id is None:
+        cached = result_cache.get(upload_key)
+        if cached is not None:
+            processed_df, st.session_state.run_stats = cached
+            st.session_state.served_from_cache = True
+        else:
+            # Queued for a worker process; this page only polls the job
+            job_id, created = job_store.submit(uploaded.getvalue(), upload_key, uploaded.name,
+                                               mode=ANALYSIS_MODE, llm_concurrency=LLM_CONCURRENCY)
+            st.session_state.job_id, st.session_state.job_key = job_id, upload_key
+            # Another session already submitted this file: its result counts as shared
+            st.session_state.served_from_cache = not created
+
+    if job_id is not None:
+        job = job_store.get(job_id)
+        if job["status"] in ACTIVE_STATES:
+            st.markdown('<h2 class="section-header">🔄 Analyzing emails with Rules + AI intelligence...</h2>',
+                        unsafe_allow_html=True)
+            render_job_progress(job_id)
+            st.stop()
+        if job["status"] != "done":
+            if job["status"] == "cancelled":
+                st.warning("✖️ Analysis cancelled. Emails finished before cancelling are kept and will not be re-analysed.")
+            else:
+                st.error(f"❌ Analysis failed: {job['error']}")
+            if st.button("🔁 Retry analysis", type="primary"):
+                job_store.retry(job_id)
+                st.rerun()
+            st.stop()
+        st.session_state.pop("job_id", None)
+        st.session_state.pop("job_key", None)
+        cached = result_cache.get(upload_key)
+        if cached is None:
+            # Result evicted since the job finished: queue the file again
+            st.rerun()
+        processed_df, st.session_state.run_stats = cached
+
+    # The dashboard's counts, token totals and distributions come from the
+    # run's aggregates (results cached before they existed: built once here)
+    run_aggregates = st.session_state.run_stats.get("aggregates")
+    st.session_state.run_aggregates = (RunningAggregates.from_dict(run_aggregates) if run_aggregates
+                                       else RunningAggregates.from_frame(processed_df))
+
+    st.session_state.search_index = load_search_index(result_cache, upload_key, processed_df)
+
+    # Session copy: categorical / downcast / Arrow columns, raw bodies
+    # compressed in a side store and only decoded for the rows on screen
+    compact_df, body_stores = compact_results(processed_df)
+    st.session_state.memory_report = memory_report(processed_df, compact_df, body_stores)
+    st.session_state.processed_df = compact_df
+    st.session_state.body_stores = body_stores
+    st.session_state.people_index = build_people_index(compact_df)
+    del processed_df
 
     st.success("🎉 Analysis Completed Successfully!")
+    if st.session_state.served_from_cache:
+        st.caption("⚡ This exact file was already analysed — results served from the shared cache (no LLM calls)")
+    if st.session_state.run_stats.get("threads"):
+        run_stats = st.session_state.run_stats
+        st.caption(f"🧵 {run_stats['threads']:,} conversations found ({run_stats['threaded']:,} emails) — each "
+                   f"classified once with its context, {run_stats['thread_calls_saved']:,} LLM calls saved")
+    if st.session_state.run_stats.get("resumed"):
+        st.caption(f"♻️ {st.session_state.run_stats['resumed']:,} emails reused from earlier checkpoints — only new or changed emails were analysed")
+    report = st.session_state.memory_report
+    st.caption(f"🗜️ Session memory: {report['after_bytes_per_row']:,.0f} bytes/email (was {report['before_bytes_per_row']:,.0f}, {report['ratio']:.1f}× smaller)")
     st.info("👆 Use the filters in the sidebar to explore specific risks")
     st.toast("✅ All emails classified successfully!", icon="✅")
     st.balloons()
@@ -281,16 +646,45 @@ if "processed_df" not in st.session_state:
 # --------------------------------------------------
 # DATA & FILTERING
 # --------------------------------------------------
-df_full = st.session_state.processed_df.copy()
-df_filtered = df_full.copy()
+# Results are treated as read-only: filters select row positions from an
+# index built once per result frame, nothing is copied per rerun
+df_full = st.session_state.processed_df
+filter_index = st.session_state.get("filter_index")
+if filter_index is None or not filter_index.is_for(df_full):
+    filter_index = FilterIndex(df_full)
+    st.session_state.filter_index = filter_index
+
+filter_key = FilterIndex.key(category_filter, priority_filter)
+show_full_warning = len(filter_index.positions(filter_key)) == 0 and bool(category_filter or priority_filter)
+if show_full_warning:
+    filter_key = FilterIndex.key([], [])
+display_positions = filter_index.positions(filter_key)
 
-if category_filter:
-    df_filtered = df_filtered[df_filtered["category"].isin(category_filter)]
-if priority_filter:
-    df_filtered = df_filtered[df_filtered["priority"].isin(priority_filter)]
 
-display_df = df_filtered if not df_filtered.empty else df_full
-show_full_warning = df_filtered.empty and (category_filter or priority_filter)
+def _selection_summary():
+    # Whole run: the pipeline's aggregates. Filtered: counts and score
+    # histogram from the filter index codes (no rows are read)
+    if len(display_positions) == len(df_full):
+        return st.session_state.run_aggregates.snapshot()
+    return filter_index.summary(filter_key)
+
+
+def _counts(counts: dict, name: str) -> pd.Series:
+    # Shaped like value_counts(): descending, named "count"
+    return pd.Series(counts, dtype="int64", name="count").rename_axis(name).sort_values(ascending=False,
+                                                                                         kind="stable")
+
+
+overview = filter_index.memo(FilterIndex.key([], []), "summary", st.session_state.run_aggregates.snapshot)
+display_summary = filter_index.memo(filter_key, "summary", _selection_summary)
+
+
+# --------------------------------------------------
+# PEOPLE (per-sender / per-recipient rollup of this analysis)
+# --------------------------------------------------
+if view == "👥 People":
+    render_people_view(st.session_state.people_index, df_full, display_positions)
+    st.stop()
 
 
 # --------------------------------------------------
@@ -367,12 +761,12 @@ show_full_warning = df_filtered.empty and (category_filter or priority_filter)
 # --------------------------------------------------
 st.markdown('<h2 class="section-header">📌 Compliance Overview</h2>', unsafe_allow_html=True)
 
-priority_counts = df_full["priority"].value_counts()
+priority_counts = _counts(overview["priority_counts"], "priority")
 
 # Calculate total token usage
-total_prompt = df_full["prompt_tokens"].sum()
-total_completion = df_full["completion_tokens"].sum()
-total_tokens_used = df_full["total_tokens"].sum()
+total_prompt = overview["tokens"]["prompt_tokens"]
+total_completion = overview["tokens"]["completion_tokens"]
+total_tokens_used = overview["tokens"]["total_tokens"]
 
 # First row: Total Emails + Total Tokens
 col_total, col_tokens = st.columns(2)
@@ -434,6 +828,49 @@ add_vertical_space(2)
 
 # Optional caption with token breakdown
 st.caption(f"Token breakdown: Prompt: {total_prompt:,} | Completion: {total_completion:,} | Total: {total_tokens_used:,}")
+score_q = overview["score"]["quantiles"]
+timing = f"Risk score: mean {overview['score']['mean']:.1f} · median {score_q['0.5']:.1f} · p90 {score_q['0.9']:.1f} · p99 {score_q['0.99']:.1f}"
+llm_call = overview["latencies"].get("llm_call")
+if llm_call:
+    call_q = llm_call["quantiles"]
+    timing += f" | LLM call latency: median {call_q['0.5']:.2f}s · p90 {call_q['0.9']:.2f}s · p99 {call_q['0.99']:.2f}s ({llm_call['count']:,} calls)"
+st.caption(timing)
+
+# --------------------------------------------------
+# WHAT-IF SCORING (no LLM calls: re-scores stored components)
+# --------------------------------------------------
+with st.expander("🧪 What-if Scoring — try different weights and thresholds"):
+    if "average_severity" not in df_full.columns:
+        st.info("These results were produced before score components were stored — re-run the analysis to enable what-if scoring.")
+    else:
+        w_col, t_col = st.columns(2, gap="large")
+        with w_col:
+            st.markdown("**Weights** (normalised to sum to 1)")
+            w_cat = st.slider("Category severity", 0.0, 1.0, WEIGHTS["category"], 0.05, key="whatif_w_category")
+            w_conf = st.slider("Model confidence", 0.0, 1.0, WEIGHTS["confidence"], 0.05, key="whatif_w_confidence")
+            w_lang = st.slider("Language risk", 0.0, 1.0, WEIGHTS["language_risk"], 0.05, key="whatif_w_language")
+        with t_col:
+            st.markdown("**Priority thresholds** (score ≥ threshold)")
+            default_thresholds = dict((pri, th) for th, pri in SCORE_TO_PRIORITY)
+            th_crit = st.slider("Critical", 0, 100, default_thresholds["Critical"], key="whatif_t_critical")
+            th_high = st.slider("High", 0, 100, default_thresholds["High"], key="whatif_t_high")
+            th_med = st.slider("Medium", 0, 100, default_thresholds["Medium"], key="whatif_t_medium")
+
+        total_w = (w_cat + w_conf + w_lang) or 1.0
+        what_if_scores, what_if_priorities = rescore_frame(
+            df_full,
+            weights={"category": w_cat / total_w, "confidence": w_conf / total_w, "language_risk": w_lang / total_w},
+            score_to_priority_table=[(th_crit, "Critical"), (th_high, "High"), (th_med, "Medium"), (0, "Low")],
+        )
+
+        comparison = pd.DataFrame({
+            "Current": priority_counts,
+            "What-if": what_if_priorities.value_counts(),
+        }).reindex(PRIORITY_OPTIONS).fillna(0).astype(int)
+        comparison["Change"] = comparison["What-if"] - comparison["Current"]
+        st.dataframe(comparison, width="stretch")
+        changed = int((what_if_priorities != df_full["priority"]).sum())
+        st.caption(f"{changed:,} of {len(df_full):,} emails would change priority · mean score {what_if_scores.mean():.1f} (current {overview['score']['mean']:.1f})")
 
 add_vertical_space(4)
 
@@ -445,22 +882,40 @@ st.markdown('<h2 class="section-header">📊 Risk Distribution</h2>', unsafe_all
 if show_full_warning:
     st.warning("⚠️ No emails match current filters — showing full dataset")
 
+def _category_figure():
+    cat_data = _counts(display_summary["category_counts"], "category").reset_index()
+    fig = px.bar(cat_data, x="category", y="count", title="Category Distribution", text="count", color_discrete_sequence=["#60A5FA"])
+    fig.update_traces(textposition="outside")
+    fig.update_layout(xaxis_tickangle=45, showlegend=False, height=600)
+    return fig
+
+
+def _priority_figure():
+    pri_data = _counts(display_summary["priority_counts"], "priority").reset_index()
+    fig = px.bar(pri_data, x="priority", y="count", title="Priority Distribution", text="count", color="priority", color_discrete_map=PRIORITY_COLORS)
+    fig.update_traces(textposition="outside")
+    fig.update_layout(showlegend=False, height=600)
+    return fig
+
+
+def _score_figure():
+    histogram = display_summary["score"]["histogram"]
+    score_data = pd.DataFrame({"score": [float(k) + 2.5 for k in histogram], "count": list(histogram.values())})
+    fig = px.bar(score_data, x="score", y="count", title="Risk Score Distribution", color_discrete_sequence=["#A78BFA"])
+    fig.update_traces(width=4.5)
+    fig.update_layout(xaxis_title="Risk score (5-point buckets)", showlegend=False, height=400)
+    return fig
+
+
 col1, col2 = st.columns(2)
 
 with col1:
-    cat_data = display_df["category"].value_counts().reset_index()
-    fig_cat = px.bar(cat_data, x="category", y="count", title="Category Distribution", text="count", color_discrete_sequence=["#60A5FA"])
-    fig_cat.update_traces(textposition="outside")
-    fig_cat.update_layout(xaxis_tickangle=45, showlegend=False, height=600)
-    st.plotly_chart(fig_cat, width="stretch", height=600)
+    st.plotly_chart(filter_index.memo(filter_key, "fig_category", _category_figure), width="stretch", height=600)
 
 with col2:
-    pri_data = display_df["priority"].value_counts().reset_index()
-    colors = {"Critical": "#EF4444", "High": "#F59E0B", "Medium": "#EAB308", "Low": "#22C55E"}
-    fig_pri = px.bar(pri_data, x="priority", y="count", title="Priority Distribution", text="count", color="priority", color_discrete_map=colors)
-    fig_pri.update_traces(textposition="outside")
-    fig_pri.update_layout(showlegend=False, height=600)
-    st.plotly_chart(fig_pri, width="stretch", height=600)
+    st.plotly_chart(filter_index.memo(filter_key, "fig_priority", _priority_figure), width="stretch", height=600)
+
+st.plotly_chart(filter_index.memo(filter_key, "fig_score", _score_figure), width="stretch", height=400)
 
 add_vertical_space(4)
 
@@ -470,83 +925,54 @@ add_vertical_space(4)
 # --------------------------------------------------
 st.markdown('<h2 class="section-header">🔍 Detailed Email Review</h2>', unsafe_allow_html=True)
 
-priority_display = display_df["priority"].value_counts()
+priority_display = display_summary["priority_counts"]
 
 st.markdown(f"""
-**Showing {len(display_df)} emails**  
+**Showing {len(display_positions)} emails**  
 🔴 {priority_display.get("Critical", 0)} Critical &nbsp; 
 🟠 {priority_display.get("High", 0)} High &nbsp; 
 🟡 {priority_display.get("Medium", 0)} Medium &nbsp; 
 🟢 {priority_display.get("Low", 0)} Low
 """)
 
-if display_df.empty:
+if len(display_positions) == 0:
     st.info("No emails to display.")
 else:
-    for _, row in display_df.iterrows():
-        subject = safe_str(row['subject']) or "No Subject"
-        badge = get_priority_badge(row['priority'])
-        
-        priority_emoji = {
-            "Critical": "🔴",
-            "High": "🟠",
-            "Medium": "🟡",
-            "Low": "🟢"
-        }.get(row['priority'], "⚪")
-
-        with st.expander(f"📧 **{subject}** &nbsp;&nbsp; {priority_emoji} {row['priority']} &nbsp;&nbsp; `{row['category']}`"):
-            c1, c2 = st.columns(2, gap="large")
-            
-            with c1:
-                st.subheader("📩 Original Email")
-                st.write(f"**From:** {row['from_email']}")
-                st.write(f"**To:** {row['to_email']}")
-                st.write(f"**Subject:** {subject}")
-                st.text_area("Body", row["email_body"], height=300, disabled=True, label_visibility="collapsed")
-            
-            with c2:
-                st.subheader("🛡️ Compliance Analysis")
-                
-                source_text = "AI (LLM)" if row.get('llm_success', True) else "Rule-based fallback"
-                st.markdown(f"**Source:** {source_text}")
-                
-                if row.get('llm_success', True):
-                    st.success("✅ AI analysis successful")
-                else:
-                    st.error("❌ AI analysis failed — using rule-based fallback")
-                    st.caption("Possible causes: Invalid API key, network issue, rate limit, or model error")
-                
-                st.markdown(f"**Risk Category:** `{row['category']}`")
-                st.markdown(f"**Priority Level:** {badge}", unsafe_allow_html=True)
-
-                st.markdown("### 📊 Scoring Breakdown")
-                score = row.get("score", 0.0)
-                st.markdown(f"**Final Risk Score:** `{score}/100`")
-
-                col_a, col_b, col_c = st.columns(3)
-                with col_a:
-                    st.metric("Category Weight", "60%")
-                with col_b:
-                    st.metric("Confidence Weight", "30%")
-                with col_c:
-                    st.metric("Language Risk Weight", "10%")
-
-                st.caption("Score = 100 × (0.60 × norm_category + 0.30 × confidence + 0.10 × language_risk)")
-
-                # TOKEN USAGE DISPLAY
-                if row.get('llm_success', True) and row.get('total_tokens', 0) > 0:
-                    col_t1, col_t2, col_t3 = st.columns(3)
-                    with col_t1:
-                        st.metric("Prompt Tokens", row['prompt_tokens'])
-                    with col_t2:
-                        st.metric("Completion Tokens", row['completion_tokens'])
-                    with col_t3:
-                        st.metric("Total Tokens", row['total_tokens'])
-                    st.caption("Token usage for this email classification (cost monitoring)")
-                elif not row.get('llm_success', True):
-                    st.caption("Token usage not available — AI analysis failed")
-
-                st.text_area("Cleaned Text", row["cleaned_text"], height=300, disabled=True, label_visibility="collapsed")
+    ctrl_search, ctrl_sort, ctrl_size = st.columns([3, 2, 1])
+    with ctrl_search:
+        review_query = st.text_input("Search subject, sender, recipients or text", key="review_query",
+                                     placeholder='e.g. "position trades" OR insider -newsletter',
+                                     help='Words must all match. Use "quotes" for phrases, OR, -word / NOT '
+                                          'to exclude, word* for prefixes and ( ) to group.')
+    with ctrl_sort:
+        review_sort = st.selectbox("Sort by", list(SORT_OPTIONS), key="review_sort")
+    with ctrl_size:
+        review_page_size = st.selectbox("Per page", [10, 25, 50, 100], index=1, key="review_page_size")
+
+    search_index = st.session_state.search_index
+    positions = review_positions(
+        df_full, query=review_query, sort_by=SORT_OPTIONS[review_sort], within=display_positions,
+        index=search_index,
+        fetch_rows=lambda rows: take_rows(df_full, rows, st.session_state.body_stores, search_index.fields),
+    )
+    n_pages = page_count(len(positions), review_page_size)
+
+    if len(positions) == 0:
+        st.info("No emails match this search.")
+    else:
+        # Keep the page in range when filters / search shrink the result set
+        if st.session_state.get("review_page", 1) > n_pages:
+            st.session_state.review_page = n_pages
+        review_page_number = st.number_input("Page", min_value=1, max_value=n_pages,
+                                             step=1, key="review_page")
+        page_df = take_rows(df_full, page_positions(positions, review_page_number, review_page_size),
+                            st.session_state.body_stores)
+        first = (review_page_number - 1) * review_page_size + 1
+        st.caption(f"Page {review_page_number:,} of {n_pages:,} · emails {first:,}–{first + len(page_df) - 1:,} of {len(positions):,} matching")
+
+        # Widgets are only built for the visible page
+        for _, row in page_df.iterrows():
+            render_email_review(row)
 
 add_vertical_space(4)
 
@@ -562,9 +988,7 @@ column_order = [
     "category", "priority", "score"
 ]
 
-display_table = display_df[column_order].copy()
-
-display_table = display_table.rename(columns={
+column_names = {
     "unique_id": "Unique ID",
     "from_email": "From",
     "to_email": "To",
@@ -575,26 +999,53 @@ display_table = display_table.rename(columns={
     "category": "Category",
     "priority": "Priority",
     "score": "Risk Score /100"
-})
+}
+
 
-display_table["Risk Score /100"] = display_table["Risk Score /100"].round(0).astype(int)
+def _results_table(columns, positions, stores) -> pd.DataFrame:
+    """
+    Rows at `positions` in table / export format; offloaded columns among
+    `columns` are decoded from `stores`. Takes no session state, so the
+    export can call it from the download worker thread.
+    """
+    table = take_rows(df_full, positions, stores, columns)
+    table = table.rename(columns=column_names)
+    table["Risk Score /100"] = table["Risk Score /100"].round(0).astype(int)
+    return table
+
+
+# The on-screen table leaves out the offloaded bodies: decoding them for
+# every filtered row would rebuild the uncompressed frame on each rerun.
+# Bodies are shown in the review pane and written to the export.
+body_stores = st.session_state.body_stores
+display_table = _results_table([c for c in column_order if c not in body_stores], display_positions, body_stores)
 
 st.dataframe(display_table, width="stretch", height=600)
+st.caption("Original bodies and junk summaries are shown in the review pane above and included in the download")
 
 add_vertical_space(3)
 
 st.markdown('<h2 class="section-header">📥 Export Results</h2>', unsafe_allow_html=True)
 
-buffer = BytesIO()
-with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-    display_table.to_excel(writer, index=False, sheet_name="Compliance Analysis")
-buffer.seek(0)
+# The workbook is only built when the button is clicked (streamed by
+# openpyxl in write-only mode), not on every rerun of the page
+report_stem = f"email_compliance_report_{pd.Timestamp.now().strftime('%Y%m%d_%H%M')}"
+if needs_bundle(display_table) or any(store.longer_than(display_positions, EXCEL_MAX_CELL_CHARS)
+                                      for column, store in body_stores.items() if column in column_order):
+    export_name, export_mime = f"{report_stem}.zip", "application/zip"
+    st.caption("Large report: delivered as a .zip with split workbooks and over-long texts in separate files")
+else:
+    export_name = f"{report_stem}.xlsx"
+    export_mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 st.download_button(
     label="📥 Download Full Results as Excel",
-    data=buffer,
-    file_name=f"email_compliance_report_{pd.Timestamp.now().strftime('%Y%m%d_%H%M')}.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    # Runs later on a worker thread without the script context:
+    # everything it needs is bound here instead of read from st.session_state
+    data=lambda stores=body_stores, pos=display_positions: export_bytes(
+        _results_table(column_order, pos, stores), export_name),
+    file_name=export_name,
+    mime=export_mime,
     width="stretch"
 )
 
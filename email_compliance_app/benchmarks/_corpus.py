@@ -0,0 +1,50 @@
+# email_compliance_app\benchmarks\_corpus.py
+
+import os
+import random
+import sys
+
+# Benchmarks are run as scripts (python benchmarks/bench_x.py); make the app
+# modules importable the same way they are for `streamlit run app.py`.
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import pandas as pd
+
+DATASET_PATH = os.path.join(APP_DIR, "data", "email dataset.xlsx")
+BODY_COLUMN = "Email Body (BEFORE Preprocessing – with Junk)"
+
+_NAMES = ["John Smith", "Priya Rao", "Chen Wei", "Maria Garcia", "Ahmed Khan", "Lena Müller"]
+_DOMAINS = ["bank.com", "ext.com", "hedgefund.com", "broker.net"]
+
+
+def load_seed_emails() -> pd.DataFrame:
+    return pd.read_excel(DATASET_PATH).fillna("")
+
+
+def _variant(body: str, rng: random.Random) -> str:
+    """
+    Templated copy of an email: different names, numbers and addresses.
+    """
+    out = body
+    for name in _NAMES:
+        if name in out:
+            out = out.replace(name, rng.choice(_NAMES))
+    out = out.replace("555-1234", f"{rng.randint(200, 999)}-{rng.randint(1000, 9999)}")
+    out = out.replace("$5,000,000", f"${rng.randint(1, 99) * 100_000:,}")
+    return out + f"\n\n{rng.choice(_NAMES)}\n{rng.choice(['Desk', 'Trader', 'Analyst'])} | {rng.choice(_DOMAINS)}"
+
+
+def synthetic_emails(n: int, seed: int = 7) -> pd.DataFrame:
+    """
+    n emails built from the seed dataset: each row is a templated variant of
+    a randomly chosen seed email, like a phishing wave or a mass notice.
+    """
+    rng = random.Random(seed)
+    seeds = load_seed_emails()
+    picks = [rng.randrange(len(seeds)) for _ in range(n)]
+    out = seeds.iloc[picks].reset_index(drop=True).copy()
+    out["Unique ID"] = range(1, n + 1)
+    out[BODY_COLUMN] = [_variant(b, rng) for b in out[BODY_COLUMN]]
+    return out
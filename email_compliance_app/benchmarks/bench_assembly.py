@@ -0,0 +1,91 @@
+# email_compliance_app\benchmarks\bench_assembly.py
+"""
+Result assembly benchmark: the original per-row loop (iterrows + safe_str +
+EmailOutput(...).dict() + DataFrame(list)) against the columnar
+pipeline.assemble_results. Cleaning and LLM results are precomputed so only
+the assembly cost is measured.
+
+Usage:
+    python benchmarks/bench_assembly.py --rows 100000
+"""
+
+import argparse
+import time
+import warnings
+
+import pandas as pd
+
+from _corpus import BODY_COLUMN, synthetic_emails
+
+from models.email_schema import EmailOutput
+from models.llm_schema import ResultRecord
+from pipeline import assemble_results, clean_all, safe_str
+
+
+def legacy_loop(df, cleaned_rows, results):
+    records = []
+    for i, row in df.iterrows():
+        raw_body = safe_str(row.get(BODY_COLUMN))
+        cleaned, junk = cleaned_rows[i][:2]
+        llm_result = results[i]
+        record = EmailOutput(
+            unique_id=int(row.get("Unique ID", 0)),
+            from_email=safe_str(row.get("From")),
+            to_email=safe_str(row.get("To")),
+            subject=safe_str(row.get("Subject")),
+            email_body=raw_body,
+            category=llm_result.final_category,
+            priority=llm_result.final_priority,
+            junk_removed=junk,
+            cleaned_text=cleaned,
+            score=llm_result.score,
+            average_severity=llm_result.average_severity,
+            model_confidence=llm_result.model_confidence,
+            language_risk=llm_result.language_risk,
+            detected_categories=" | ".join(llm_result.detected_categories),
+            llm_success=llm_result.llm_success,
+            prompt_tokens=llm_result.prompt_tokens,
+            completion_tokens=llm_result.completion_tokens,
+            total_tokens=llm_result.total_tokens,
+            source=llm_result.source,
+        )
+        records.append(record.dict())
+    return pd.DataFrame(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    seed = synthetic_emails(min(args.rows, 2_000))
+    df = pd.concat([seed] * (args.rows // len(seed) + 1), ignore_index=True).iloc[:args.rows]
+    df["Unique ID"] = range(1, len(df) + 1)
+
+    seed_clean = clean_all(seed[BODY_COLUMN].tolist())
+    cleaned_rows = [seed_clean[i % len(seed_clean)] for i in range(len(df))]
+    result = ResultRecord(final_category="Secrecy", final_priority="Critical", score=91.0, average_severity=5.0,
+                          model_confidence=0.9, language_risk=0.4, detected_categories=["Secrecy"], total_tokens=420)
+    results = [result] * len(df)
+    bodies = df[BODY_COLUMN].astype(str).str.strip().tolist()
+
+    t0 = time.perf_counter()
+    legacy = legacy_loop(df, cleaned_rows, results)
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    columnar = assemble_results(df, bodies, cleaned_rows, results, [None] * len(df))
+    t_columnar = time.perf_counter() - t0
+
+    assert list(columnar.columns) == list(EmailOutput.model_fields)
+    assert (legacy["priority"].to_numpy() == columnar["priority"].to_numpy()).all()
+
+    print(f"rows       : {len(df):,}")
+    print(f"legacy     : {t_legacy:.2f}s  ({len(df) / t_legacy:,.0f} rows/s)")
+    print(f"columnar   : {t_columnar:.2f}s  ({len(df) / t_columnar:,.0f} rows/s)")
+    print(f"speedup    : {t_legacy / t_columnar:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
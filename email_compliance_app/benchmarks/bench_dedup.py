@@ -0,0 +1,55 @@
+# email_compliance_app\benchmarks\bench_dedup.py
+"""
+Near-duplicate clustering benchmark.
+
+Reports cluster count, LLM call reduction and clustering time.
+No LLM calls are made.
+
+Usage:
+    python benchmarks/bench_dedup.py                 # seed dataset
+    python benchmarks/bench_dedup.py --synthetic 20000 --threshold 0.8
+"""
+
+import argparse
+import time
+
+from _corpus import BODY_COLUMN, load_seed_emails, synthetic_emails
+
+from preprocessing.cleaner import preprocess_text
+from preprocessing.dedup import NearDuplicateIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N templated emails instead of the seed dataset")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    df = synthetic_emails(args.synthetic) if args.synthetic else load_seed_emails()
+    bodies = df[BODY_COLUMN].astype(str).tolist()
+
+    t0 = time.perf_counter()
+    cleaned = [preprocess_text(b)[0] for b in bodies]
+    t_clean = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = NearDuplicateIndex(threshold=args.threshold)
+    for i, text in enumerate(cleaned):
+        index.add(i, text)
+    t_cluster = time.perf_counter() - t0
+
+    n = len(cleaned)
+    clusters = index.cluster_count
+    sizes = sorted((len(m) for m in index.clusters().values()), reverse=True)
+
+    print(f"emails            : {n:,}")
+    print(f"threshold         : {args.threshold} (bands={index.bands}, rows={index.rows})")
+    print(f"clusters          : {clusters:,}")
+    print(f"largest clusters  : {sizes[:5]}")
+    print(f"LLM calls         : {clusters:,} instead of {n:,}  ({100 * (1 - clusters / n):.1f}% fewer)")
+    print(f"cleaning time     : {t_clean:.2f}s")
+    print(f"clustering time   : {t_cluster:.2f}s  ({n / t_cluster:,.0f} emails/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# email_compliance_app\benchmarks\bench_export.py
+"""
+Excel export benchmark: the original in-memory export (pd.ExcelWriter into a
+BytesIO) against the streaming utils.excel_io.export_results. Reports wall
+time and peak memory for each, on a frame shaped like the app's display
+table. Each export runs in its own process so the peak RSS of one does not
+hide the other; memory is reported as growth over the process peak before
+the export started.
+
+Usage:
+    python benchmarks/bench_export.py --rows 1000000 --skip-legacy
+    python benchmarks/bench_export.py --rows 100000 --long 5
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+
+from _corpus import BODY_COLUMN, synthetic_emails
+
+from utils.excel_io import EXCEL_MAX_ROWS, export_results
+
+
+def display_frame(rows: int, long_bodies: int) -> pd.DataFrame:
+    seed = synthetic_emails(min(rows, 2_000))
+    df = pd.concat([seed] * (rows // len(seed) + 1), ignore_index=True).iloc[:rows]
+    body = df[BODY_COLUMN].astype(str)
+    frame = pd.DataFrame({
+        "Unique ID": range(1, rows + 1),
+        "From": df["From"].astype(str).to_numpy(),
+        "To": df["To"].astype(str).to_numpy(),
+        "Subject": df["Subject"].astype(str).to_numpy(),
+        "Email Body (BEFORE Preprocessing - with Junk)": body.to_numpy(),
+        "What Gets Removed (Junk Preprocessing)": "",
+        "Cleaned Text (AFTER Preprocessing)": body.str.slice(0, 400).to_numpy(),
+        "Category": "Secrecy",
+        "Priority": "High",
+        "Risk Score /100": 72,
+    })
+    if long_bodies:
+        column = "Email Body (BEFORE Preprocessing - with Junk)"
+        frame.loc[:long_bodies - 1, column] = "long thread " * 4_000
+    return frame
+
+
+def _peak_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def measure(method: str, rows: int, long_bodies: int):
+    frame = display_frame(rows, long_bodies)
+    before = _peak_mib()
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        if method == "legacy":
+            size, suffix = legacy_export(frame), ".xlsx"
+        else:
+            path = export_results(frame, os.path.join(tmp, "report.xlsx"))
+            size, suffix = os.path.getsize(path), os.path.splitext(path)[1]
+    return time.perf_counter() - t0, _peak_mib() - before, size, suffix
+
+
+def legacy_export(frame: pd.DataFrame) -> int:
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        frame.to_excel(writer, index=False, sheet_name="Compliance Analysis")
+    return buffer.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--long", type=int, default=0, help="Bodies made longer than the Excel cell limit")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the streaming export")
+    args = parser.parse_args()
+
+    print(f"rows       : {args.rows:,}")
+    methods = ["streaming"]
+    if not args.skip_legacy and args.rows < EXCEL_MAX_ROWS:
+        methods.insert(0, "legacy")
+
+    for method in methods:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            elapsed, peak, size, suffix = pool.submit(measure, method, args.rows, args.long).result()
+        print(f"{method:<10} : {elapsed:.1f}s  ({args.rows / elapsed:,.0f} rows/s)  "
+              f"peak +{peak:,.0f} MiB  file {size / 2 ** 20:,.1f} MiB {suffix}")
+
+
+if __name__ == "__main__":
+    main()
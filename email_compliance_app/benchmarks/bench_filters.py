@@ -0,0 +1,105 @@
+# email_compliance_app\benchmarks\bench_filters.py
+"""
+Dashboard filter benchmark: the original per-rerun path (two frame copies,
+isin filters, value_counts for cards and charts) against
+utils.filter_index.FilterIndex positions + summary() (what the dashboard
+reads for a filtered selection), cold (first time a filter key is seen)
+and warm (memoised). Only a results-shaped frame is needed, no cleaning or LLM.
+
+Usage:
+    python benchmarks/bench_filters.py --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from _corpus import synthetic_emails
+
+from utils.filter_index import FilterIndex
+
+CATEGORIES = ["Secrecy", "Market Manipulation", "Market Bribery", "Change in Communication", "Complaints",
+              "Employee Ethics", "Secrecy + Market Manipulation", "Market Bribery + Employee Ethics"]
+PRIORITIES = ["Critical", "High", "Medium", "Low"]
+
+FILTERS = [
+    ([], []),
+    (["Secrecy"], []),
+    ([], ["Critical"]),
+    (["Secrecy", "Complaints", "Market Bribery"], ["Critical", "High"]),
+    (["Employee Ethics"], ["Low"]),
+]
+
+
+def results_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    seed = synthetic_emails(min(rows, 2_000))
+    repeat = np.arange(rows) % len(seed)
+    return pd.DataFrame({
+        "unique_id": np.arange(1, rows + 1),
+        "from_email": seed["From"].astype(str).to_numpy()[repeat],
+        "subject": seed["Subject"].astype(str).to_numpy()[repeat],
+        "cleaned_text": seed["Email Body (BEFORE Preprocessing – with Junk)"].astype(str).to_numpy()[repeat],
+        "category": rng.choice(CATEGORIES, rows),
+        "priority": rng.choice(PRIORITIES, rows, p=[0.05, 0.15, 0.3, 0.5]),
+        "score": rng.uniform(0, 100, rows).round(1),
+        "prompt_tokens": rng.integers(100, 400, rows),
+        "completion_tokens": rng.integers(20, 80, rows),
+        "total_tokens": rng.integers(120, 480, rows),
+    })
+
+
+def legacy(processed_df, category_filter, priority_filter):
+    df_full = processed_df.copy()
+    df_filtered = df_full.copy()
+    if category_filter:
+        df_filtered = df_filtered[df_filtered["category"].isin(category_filter)]
+    if priority_filter:
+        df_filtered = df_filtered[df_filtered["priority"].isin(priority_filter)]
+    display_df = df_filtered if not df_filtered.empty else df_full
+    df_full["priority"].value_counts()
+    df_full["total_tokens"].sum()
+    display_df["category"].value_counts()
+    display_df["priority"].value_counts()
+    display_df["priority"].value_counts()
+    return len(display_df)
+
+
+def indexed(index, category_filter, priority_filter):
+    key = FilterIndex.key(category_filter, priority_filter)
+    positions = index.positions(key)
+    index.summary(key)
+    return len(positions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    frame = results_frame(args.rows)
+    t0 = time.perf_counter()
+    index = FilterIndex(frame)
+    print(f"rows          : {len(frame):,}")
+    print(f"index build   : {(time.perf_counter() - t0) * 1000:.0f} ms (once per result set)")
+    print(f"{'filter':<58} {'legacy':>9} {'cold':>9} {'warm':>9}")
+
+    for categories, priorities in FILTERS:
+        t0 = time.perf_counter()
+        n_legacy = legacy(frame, categories, priorities)
+        t_legacy = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        n_cold = indexed(index, categories, priorities)
+        t_cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        indexed(index, categories, priorities)
+        t_warm = time.perf_counter() - t0
+        assert n_legacy == n_cold or n_cold == 0
+        label = f"{'/'.join(categories) or 'all'} × {'/'.join(priorities) or 'all'}"
+        print(f"{label:<58} {t_legacy * 1000:>7.0f}ms {t_cold * 1000:>7.1f}ms {t_warm * 1000:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
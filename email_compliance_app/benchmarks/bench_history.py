@@ -0,0 +1,96 @@
+# email_compliance_app\benchmarks\bench_history.py
+"""
+History warehouse benchmark: appends `--runs` synthetic runs (spread over
+the last `--days` days) to a fresh utils.warehouse.Warehouse, then times
+the History view's queries, e.g. top senders by Critical count over the
+last 90 days.
+
+Usage:
+    python benchmarks/bench_history.py --runs 200 --rows-per-run 50000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from _corpus import APP_DIR  # noqa: F401  (puts the app modules on sys.path)
+
+from utils.warehouse import SECONDS_PER_DAY, Warehouse
+
+CATEGORIES = ["Secrecy", "Market Manipulation", "Market Bribery", "Change in Communication", "Complaints",
+              "Employee Ethics", "No Risk"]
+PRIORITIES = ["Critical", "High", "Medium", "Low"]
+
+
+def run_frame(rows: int, senders: int, rng: np.random.Generator) -> pd.DataFrame:
+    # Zipf-like sender activity: a few very busy mailboxes, a long tail
+    sender_ids = np.minimum(rng.zipf(1.3, rows), senders) - 1
+    score = rng.uniform(0, 100, rows).round(1)
+    priority = np.select([score >= 85, score >= 65, score >= 40], PRIORITIES[:3], PRIORITIES[3])
+    return pd.DataFrame({
+        "unique_id": np.arange(1, rows + 1),
+        "from_email": pd.Series(sender_ids).map(lambda i: f"user{i}@bank.com"),
+        "to_email": "desk@bank.com",
+        "subject": "Quarterly numbers",
+        "category": rng.choice(CATEGORIES, rows),
+        "priority": priority,
+        "score": score,
+        "source": "llm",
+        "total_tokens": rng.integers(200, 800, rows),
+    })
+
+
+def timed(label: str, fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<44} {best * 1000:8.1f} ms  ({len(result):,} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--rows-per-run", type=int, default=50_000)
+    parser.add_argument("--senders", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        warehouse = Warehouse(os.path.join(tmp, "history.sqlite"))
+        now = time.time()
+        t0 = time.perf_counter()
+        for run in range(args.runs):
+            run_at = now - (args.runs - run) / args.runs * args.days * SECONDS_PER_DAY
+            warehouse.append_run(f"run-{run}", run_frame(args.rows_per_run, args.senders, rng),
+                                 file_name=f"batch-{run}.xlsx", mode="llm", run_at=run_at)
+        t_load = time.perf_counter() - t0
+        total = warehouse.count()
+        size = os.path.getsize(warehouse.path) / 2 ** 20
+        print(f"stored     : {total:,} emails in {args.runs} runs ({size:,.0f} MiB), "
+              f"appended in {t_load:.1f}s ({total / t_load:,.0f} rows/s)")
+
+        print("queries (best of 3):")
+        timed("top senders by Critical count, 90 days", lambda: warehouse.top_senders(days=90))
+        timed("top senders, Secrecy + High/Critical, 365 d",
+              lambda: warehouse.top_senders(days=365, priorities=["Critical", "High"], categories=["Secrecy"]))
+        timed("daily counts by category, 90 days", lambda: warehouse.daily_counts(days=90, by="category"))
+        timed("summary, 365 days", lambda: [warehouse.summary(days=365)])
+        timed("top 200 Critical emails, 90 days",
+              lambda: warehouse.search(days=90, priorities=["Critical"]))
+        timed("top 200 Market Bribery emails, 30 days",
+              lambda: warehouse.search(days=30, categories=["Market Bribery"]))
+        timed("one sender's emails, 365 days",
+              lambda: warehouse.search(days=365, sender="user5@bank.com"))
+        timed("recent runs", lambda: warehouse.runs())
+        warehouse.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# email_compliance_app\benchmarks\bench_html.py
+"""
+HTML / MIME body normalization benchmark.
+
+Builds an HTML-heavy corpus (synthetic emails wrapped in newsletter-style
+HTML: <head> with a style block, table layout, inline styles, a hidden
+preheader, a footer and a tracking pixel; part of them as raw
+multipart/alternative MIME messages) and cleans it twice: raw bodies
+straight through preprocess_text, and preprocessing/markup.py's body_text
+first. Reports the bytes removed before cleaning, the cleaning time of
+both and the tokens left in the cleaned text. Then times html_to_text on
+bodies of hidden tags that are never closed (</td> and </p> may be
+omitted), at doubling sizes: the time should double with them, not grow
+fourfold. No LLM calls are made.
+
+Usage:
+    python benchmarks/bench_html.py --synthetic 20000 --html-share 0.8 --mime-share 0.3 --unclosed-kb 120
+"""
+
+import argparse
+import base64
+import random
+import time
+
+from _corpus import BODY_COLUMN, synthetic_emails
+
+from preprocessing.cleaner import preprocess_text
+from preprocessing.markup import body_text, html_to_text
+
+_STYLE = ("body{margin:0;padding:0;font-family:Arial,Helvetica,sans-serif;color:#333333}"
+          "table{border-collapse:collapse}td{padding:8px 16px;font-size:14px;line-height:20px}"
+          ".footer td{font-size:11px;color:#999999}a{color:#1a73e8;text-decoration:underline}") * 4
+
+
+def _html(body: str, rng: random.Random) -> str:
+    paragraphs = "".join(
+        f'<tr><td style="padding:4px 24px;font-size:14px;line-height:20px;color:#333333">'
+        f'<span style="font-family:Arial,sans-serif">{line.strip().replace("&", "&amp;").replace("<", "&lt;")}'
+        f'</span></td></tr>\n'
+        for line in body.splitlines() if line.strip()
+    )
+    token = rng.getrandbits(64)
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Message</title>'
+        f"<style>{_STYLE}</style></head>\n"
+        '<body style="margin:0;padding:0"><div style="display:none;max-height:0;overflow:hidden">'
+        + "&nbsp;&zwnj;" * 40 + "</div>\n"
+        '<!--[if mso]><table width="600"><tr><td><![endif]-->\n'
+        '<table role="presentation" width="100%" cellpadding="0" cellspacing="0" border="0">\n'
+        f"{paragraphs}"
+        '<tr><td style="padding:16px 24px">'
+        f'<a href="https://intranet.bank.com/messages/{token}?utm_source=mail&amp;utm_medium=email">'
+        "View this message online</a></td></tr>\n"
+        '</table><table class="footer" width="100%"><tr><td>You are receiving this because you are subscribed. '
+        f'<a href="https://mail.bank.com/unsubscribe?u={token}">Unsubscribe</a></td></tr></table>\n'
+        f'<img src="https://t.bank.com/open.gif?u={token}" width="1" height="1" alt="" style="display:block">\n'
+        "<!--[if mso]></td></tr></table><![endif]--></body></html>"
+    )
+
+
+def _mime(body: str, markup: str, rng: random.Random) -> str:
+    boundary = f"_000_{rng.getrandbits(48):x}_"
+    return (
+        "MIME-Version: 1.0\n"
+        f'Content-Type: multipart/alternative; boundary="{boundary}"\n\n'
+        f"--{boundary}\n"
+        'Content-Type: text/plain; charset="utf-8"\n'
+        "Content-Transfer-Encoding: base64\n\n"
+        f"{base64.encodebytes(body.encode('utf-8')).decode('ascii')}\n"
+        f"--{boundary}\n"
+        'Content-Type: text/html; charset="utf-8"\n\n'
+        f"{markup}\n"
+        f"--{boundary}--\n"
+    )
+
+
+def html_corpus(n: int, html_share: float, mime_share: float, seed: int = 7):
+    rng = random.Random(seed)
+    bodies = synthetic_emails(n, seed=seed)[BODY_COLUMN].astype(str).tolist()
+    out = []
+    for body in bodies:
+        if rng.random() >= html_share:
+            out.append(body)
+            continue
+        markup = _html(body, rng)
+        out.append(_mime(body, markup, rng) if rng.random() < mime_share else markup)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=20_000)
+    parser.add_argument("--html-share", type=float, default=0.8, help="Share of bodies that are HTML")
+    parser.add_argument("--mime-share", type=float, default=0.3, help="Share of HTML bodies sent as raw MIME")
+    parser.add_argument("--unclosed-kb", type=int, default=120,
+                        help="Largest body of unclosed hidden tags, in KB")
+    args = parser.parse_args()
+
+    bodies = html_corpus(args.synthetic, args.html_share, args.mime_share)
+    raw_bytes = sum(len(b.encode("utf-8")) for b in bodies)
+
+    t0 = time.perf_counter()
+    raw_cleaned = [preprocess_text(b)[0] for b in bodies]
+    raw_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    texts = [body_text(b) for b in bodies]
+    normalize_seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    cleaned = [preprocess_text(text)[0] for text, _ in texts]
+    clean_seconds = time.perf_counter() - t0
+
+    text_bytes = sum(len(text.encode("utf-8")) for text, _ in texts)
+    converted = sum(1 for _, removed in texts if removed)
+    raw_tokens = sum(len(c.split()) for c in raw_cleaned)
+    tokens = sum(len(c.split()) for c in cleaned)
+    total = normalize_seconds + clean_seconds
+
+    print(f"emails             : {len(bodies):,} ({converted:,} HTML / MIME)")
+    print(f"bytes before       : {raw_bytes:,}")
+    print(f"bytes after        : {text_bytes:,} ({raw_bytes - text_bytes:,} removed, "
+          f"{(raw_bytes - text_bytes) / raw_bytes:.1%})")
+    print(f"clean raw          : {raw_seconds:.2f}s ({raw_seconds / len(bodies) * 1e6:.0f} µs/email)")
+    print(f"normalize + clean  : {total:.2f}s ({normalize_seconds:.2f}s + {clean_seconds:.2f}s, "
+          f"{total / len(bodies) * 1e6:.0f} µs/email)")
+    print(f"speedup            : {raw_seconds / total:.1f}x")
+    print(f"cleaned tokens     : {raw_tokens:,} raw -> {tokens:,} normalized")
+
+    unclosed = '<span style="display:none">ab '
+    for kb in (args.unclosed_kb // 4, args.unclosed_kb // 2, args.unclosed_kb):
+        body = unclosed * (kb * 1000 // len(unclosed))
+        t0 = time.perf_counter()
+        html_to_text(body)
+        print(f"unclosed {kb:>5} KB  : {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# email_compliance_app\benchmarks\bench_memory.py
+"""
+Session memory benchmark: bytes per row of a processed results frame as
+produced by the pipeline, against utils.compact.compact_results (in-memory
+and spilled body store), plus the cost of decoding one review page, the
+on-screen table (bodies left out) and an export's bodies back from the
+store.
+
+Usage:
+    python benchmarks/bench_memory.py --rows 200000
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from _corpus import BODY_COLUMN, synthetic_emails
+
+from pipeline import assemble_results, clean_all
+from models.llm_schema import ResultRecord
+from utils.compact import compact_results, memory_report, take_rows
+
+
+def results_frame(rows: int) -> pd.DataFrame:
+    seed = synthetic_emails(min(rows, 5_000))
+    df = pd.concat([seed] * (rows // len(seed) + 1), ignore_index=True).iloc[:rows]
+    df["Unique ID"] = range(1, len(df) + 1)
+    seed_clean = clean_all(seed[BODY_COLUMN].tolist())
+    cleaned_rows = [seed_clean[i % len(seed_clean)] for i in range(len(df))]
+    result = ResultRecord(final_category="Secrecy", final_priority="Critical", score=91.0, average_severity=5.0,
+                          model_confidence=0.9, language_risk=0.4, detected_categories=["Secrecy"], total_tokens=420)
+    bodies = df[BODY_COLUMN].astype(str).str.strip().tolist()
+    return assemble_results(df, bodies, cleaned_rows, [result] * len(df), [None] * len(df))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    frame = results_frame(args.rows)
+    as_objects = frame.astype({c: object for c in frame.columns if pd.api.types.is_string_dtype(frame[c])})
+
+    t0 = time.perf_counter()
+    compact, stores = compact_results(frame)
+    t_compact = time.perf_counter() - t0
+    with tempfile.TemporaryDirectory() as tmp:
+        spilled, spilled_stores = compact_results(frame, spill_dir=tmp)
+        spilled_report = memory_report(frame, spilled, spilled_stores)
+
+    print(f"rows                    : {len(frame):,}")
+    print(f"object strings          : {memory_report(as_objects, as_objects)['before_bytes_per_row']:,.0f} B/row")
+    report = memory_report(frame, compact, stores)
+    print(f"pipeline output         : {report['before_bytes_per_row']:,.0f} B/row")
+    print(f"compact (bodies in RAM) : {report['after_bytes_per_row']:,.0f} B/row  ({report['ratio']:.1f}x, "
+          f"built in {t_compact:.2f}s)")
+    print(f"compact (bodies on disk): {spilled_report['after_bytes_per_row']:,.0f} B/row  ({spilled_report['ratio']:.1f}x)")
+
+    print("\nper column, B/row (before -> after):")
+    before = frame.memory_usage(deep=True, index=False) / len(frame)
+    after = compact.memory_usage(deep=True, index=False) / len(frame)
+    for column in frame.columns:
+        value = stores[column].nbytes / len(frame) if column in stores else after[column]
+        kind = "store" if column in stores else str(compact[column].dtype)
+        print(f"  {column:<20} {before[column]:>8.1f} -> {value:>7.1f}  {kind}")
+
+    page = np.sort(np.random.default_rng(1).choice(len(frame), 25, replace=False))
+    t0 = time.perf_counter()
+    take_rows(compact, page, stores)
+    t_page = time.perf_counter() - t0
+    everything = np.arange(len(frame))
+    t0 = time.perf_counter()
+    take_rows(compact, everything, stores, [c for c in compact.columns if c not in stores])
+    t_table = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    take_rows(compact, everything, stores)
+    t_all = time.perf_counter() - t0
+    print(f"\nreview page (25 random rows) : {t_page * 1000:.1f} ms")
+    print(f"table (no bodies)            : {t_table * 1000:.1f} ms")
+    print(f"all bodies (export)          : {t_all:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# email_compliance_app\benchmarks\bench_records.py
+"""
+Per-result record benchmark: the pydantic LLMResult the pipeline used for
+every email against models.llm_schema.ResultRecord. Measures building a
+record (as the local model / rules tiers do), copying one for a cluster
+member, and a pickle round trip of a batch (what a worker process would
+send back), per record.
+
+Usage:
+    python benchmarks/bench_records.py --records 200000
+"""
+
+import argparse
+import pickle
+import time
+
+from models.llm_schema import LLMResult, ResultRecord
+
+FIELDS = dict(final_category="Secrecy + Market Manipulation", final_priority="Critical", score=91.0,
+              average_severity=4.5, model_confidence=0.9, language_risk=0.4,
+              detected_categories=["Secrecy", "Market Manipulation"], llm_success=False, source="local")
+
+
+def _per_record(seconds: float, n: int) -> str:
+    return f"{seconds / n * 1e6:6.2f} µs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.records
+
+    print(f"records : {n:,}")
+    print(f"{'':<26} {'LLMResult':>12} {'ResultRecord':>14}")
+    built = {}
+    timings = {}
+    for name, cls in (("pydantic", LLMResult), ("record", ResultRecord)):
+        t0 = time.perf_counter()
+        records = [cls(**FIELDS) for _ in range(n)]
+        timings[name, "build"] = time.perf_counter() - t0
+        built[name] = records
+
+        t0 = time.perf_counter()
+        if cls is LLMResult:
+            [r.model_copy(update={"inherited": True, "total_tokens": 0}) for r in records]
+        else:
+            [r.replace(inherited=True, total_tokens=0) for r in records]
+        timings[name, "copy"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        data = pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+        timings[name, "dumps"] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        pickle.loads(data)
+        timings[name, "loads"] = time.perf_counter() - t0
+        timings[name, "bytes"] = len(data)
+
+    for step, label in (("build", "build"), ("copy", "member copy"), ("dumps", "pickle dumps"),
+                        ("loads", "pickle loads")):
+        print(f"{label:<26} {_per_record(timings['pydantic', step], n):>12} "
+              f"{_per_record(timings['record', step], n):>14}")
+    print(f"{'pickled bytes / record':<26} {timings['pydantic', 'bytes'] / n:>12.1f} "
+          f"{timings['record', 'bytes'] / n:>14.1f}")
+
+    # Same values either way
+    assert ResultRecord.from_model(built["pydantic"][0]) == built["record"][0]
+    assert built["record"][0].to_model() == built["pydantic"][0]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# email_compliance_app\benchmarks\bench_search.py
+"""
+Review search benchmark: the substring scan the review pane used
+(utils.review.search_positions) against utils.search_index.SearchIndex,
+including build, save and (memory-mapped) load times. Queries run over all
+rows and within a sidebar filter (Critical only). Only a results-shaped
+frame is needed, no cleaning or LLM.
+
+Usage:
+    python benchmarks/bench_search.py --rows 1000000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_filters import results_frame
+
+from utils.review import search_positions
+from utils.search_index import SearchIndex
+
+QUERIES = [
+    ("term", "confidential"),
+    ("and", "position trades"),
+    ("phrase", '"keep this between us"'),
+    ("or", "bribe OR kickback OR gift"),
+    ("not", "market -urgent"),
+    ("prefix", "price*"),
+    ("boolean", '(insider OR "non public") -newsletter'),
+]
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--skip-scan", action="store_true", help="Do not time the substring scan")
+    args = parser.parse_args()
+
+    frame = results_frame(args.rows)
+    # Reference numbers give the vocabulary a realistic long tail
+    refs = np.random.default_rng(5).integers(0, 500_000, len(frame)).astype(str)
+    frame["cleaned_text"] = frame["cleaned_text"].str.lower() + " ref" + refs
+    fetch_rows = frame.iloc.__getitem__
+    critical = np.flatnonzero(frame["priority"].to_numpy() == "Critical")
+
+    t0 = time.perf_counter()
+    index = SearchIndex.build(frame)
+    t_build = time.perf_counter() - t0
+    path = os.path.join(tempfile.mkdtemp(), "bench.search")
+    t0 = time.perf_counter()
+    index.save(path)
+    t_save = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    index = SearchIndex.load(path)
+    t_load = time.perf_counter() - t0
+    print(f"rows          : {len(frame):,}")
+    print(f"terms         : {len(index.vocab):,}  postings: {len(index.docs):,}  on disk: "
+          f"{_dir_bytes(path) / 1024 ** 2:.0f} MB")
+    print(f"build / save  : {t_build:.1f} s / {t_save * 1000:.0f} ms (once per run)")
+    print(f"load (mmap)   : {t_load * 1000:.0f} ms (once per session)")
+    print(f"{'query':<44} {'hits':>9} {'scan':>9} {'index':>9} {'critical':>9}")
+
+    for kind, query in QUERIES:
+        scan = "-"
+        if not args.skip_scan and kind in ("term", "and"):
+            # The scan only understands plain words
+            t0 = time.perf_counter()
+            search_positions(frame, query)
+            scan = f"{(time.perf_counter() - t0) * 1000:.0f}ms"
+        t0 = time.perf_counter()
+        hits, _ = index.search(query, fetch_rows=fetch_rows)
+        t_index = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index.search(query, within=critical, fetch_rows=fetch_rows)
+        t_within = time.perf_counter() - t0
+        print(f"{kind + ': ' + query:<44} {len(hits):>9,} {scan:>9} {t_index * 1000:>7.1f}ms "
+              f"{t_within * 1000:>7.1f}ms")
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# email_compliance_app\llm\client.py
+
+import asyncio
+import os
+import threading
+import weakref
+
+# --------------------------------------------------
+# LAZY, POOLED LLM CLIENTS
+# --------------------------------------------------
+# Nothing here touches the network stack at import time. The OpenAI SDK and
+# httpx are only imported the first time a client is requested, and the
+# resulting client (with its connection pool) is shared by every caller:
+#   - get_client()       -> one sync client, safe to share across threads
+#   - get_async_client() -> one async client per running event loop, shared
+#                           by all tasks on that loop
+#
+# Tunables (all optional, read from the environment / .env):
+#   LLM_BASE_URL              default: https://openrouter.ai/api/v1
+#   OPEN_ROUTER_API_KEY       API key
+#   LLM_MODEL                 default: gpt-4o-mini
+#   LLM_CONNECT_TIMEOUT       seconds, default 5
+#   LLM_READ_TIMEOUT          seconds, default 60
+#   LLM_MAX_CONNECTIONS       default 64
+#   LLM_MAX_KEEPALIVE         idle keep-alive connections kept, default 32
+#   LLM_KEEPALIVE_EXPIRY      seconds an idle connection is kept, default 30
+#   LLM_MAX_RETRIES           SDK-level retries, default 2
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MODEL = "gpt-4o-mini"
+
+_lock = threading.Lock()
+_settings = None
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def get_settings() -> dict:
+    """
+    Resolve client settings once (loads .env on first use, not on import).
+    """
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                from dotenv import load_dotenv
+                load_dotenv()
+                _settings = {
+                    "base_url": os.getenv("LLM_BASE_URL", DEFAULT_BASE_URL),
+                    "api_key": os.getenv("OPEN_ROUTER_API_KEY"),
+                    "model": os.getenv("LLM_MODEL", DEFAULT_MODEL),
+                    "connect_timeout": _env_float("LLM_CONNECT_TIMEOUT", 5.0),
+                    "read_timeout": _env_float("LLM_READ_TIMEOUT", 60.0),
+                    "max_connections": _env_int("LLM_MAX_CONNECTIONS", 64),
+                    "max_keepalive": _env_int("LLM_MAX_KEEPALIVE", 32),
+                    "keepalive_expiry": _env_float("LLM_KEEPALIVE_EXPIRY", 30.0),
+                    "max_retries": _env_int("LLM_MAX_RETRIES", 2),
+                }
+    return _settings
+
+
+def configure(**overrides) -> None:
+    """
+    Override settings (e.g. from a CLI) before the first client is built.
+    Existing clients are closed so the next call picks up the new values.
+    """
+    settings = dict(get_settings())
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    reset_clients()
+    global _settings
+    with _lock:
+        _settings = settings
+
+
+def _http_options(settings: dict) -> dict:
+    import httpx
+
+    return {
+        "timeout": httpx.Timeout(
+            settings["read_timeout"],
+            connect=settings["connect_timeout"],
+        ),
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+    }
+
+
+def get_client():
+    """
+    Return the process-wide sync OpenAI client, building it on first use.
+    """
+    global _client
+    if _client is None:
+        settings = get_settings()
+        with _lock:
+            if _client is None:
+                import httpx
+                from openai import OpenAI
+
+                options = _http_options(settings)
+                _client = OpenAI(
+                    base_url=settings["base_url"],
+                    api_key=settings["api_key"],
+                    max_retries=settings["max_retries"],
+                    timeout=options["timeout"],
+                    http_client=httpx.Client(**options),
+                )
+    return _client
+
+
+def get_async_client():
+    """
+    Return the async OpenAI client for the running event loop.
+    httpx async pools are bound to the loop they were created on, so one
+    client is kept per loop and dropped automatically when the loop goes away.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        settings = get_settings()
+        with _lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                import httpx
+                from openai import AsyncOpenAI
+
+                options = _http_options(settings)
+                client = AsyncOpenAI(
+                    base_url=settings["base_url"],
+                    api_key=settings["api_key"],
+                    max_retries=settings["max_retries"],
+                    timeout=options["timeout"],
+                    http_client=httpx.AsyncClient(**options),
+                )
+                _async_clients[loop] = client
+    return client
+
+
+def _close_async_client(loop, client) -> None:
+    # AsyncOpenAI.close() is a coroutine that must run on the client's loop
+    if loop.is_closed():
+        return  # nothing can run on it any more
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if loop is running:
+        loop.create_task(client.close())
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.close(), loop)
+    else:
+        loop.run_until_complete(client.close())
+
+
+def reset_clients() -> None:
+    """
+    Close and forget the cached clients (used after configure() and in forks).
+    """
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        async_clients = list(_async_clients.items())
+        _async_clients.clear()
+    # Closed outside the lock: closing may wait on the client's loop
+    for loop, client in async_clients:
+        _close_async_client(loop, client)
@@ -1,67 +1,24 @@
 # email_compliance_app\llm\gpt_classifier.py
 
 import json
-import os
-from openai import OpenAI
-from models.llm_schema import LLMResult
-from utils.normalizer import normalize_category, normalize_priority
-from dotenv import load_dotenv
-
-load_dotenv()
-
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPEN_ROUTER_API_KEY"),
+import time
+from models.llm_schema import LLMResult, ResultRecord
+from utils.normalizer import normalize_categories, normalize_category, normalize_priority
+from llm.client import get_client, get_settings
+from llm.scoring import (
+    WEIGHTS,
+    CATEGORY_SEVERITY,
+    SCORE_TO_PRIORITY,
+    score_to_priority,
+    calculate_weighted_score,
 )
 
-# --------------------------------------------------
-# CONFIGURATION
-# --------------------------------------------------
-WEIGHTS = {
-    "category": 0.60,
-    "confidence": 0.30,
-    "language_risk": 0.10
-}
-
-CATEGORY_SEVERITY = {
-    "Secrecy": 5,
-    "Market Manipulation": 4,
-    "Market Manipulation / Misconduct": 4,
-    "Market Bribery": 4,
-    "Change in Communication": 3,
-    "Complaints": 2,
-    "Employee Ethics": 1,
-}
-
-SCORE_TO_PRIORITY = [
-    (80, "Critical"),
-    (65, "High"),
-    (45, "Medium"),
-    (0, "Low")
-]
-
-def score_to_priority(score: float) -> str:
-    for threshold, pri in SCORE_TO_PRIORITY:
-        if score >= threshold:
-            return pri
-    return "Low"
-
-def calculate_weighted_score(category_score: float, confidence: float, language_risk: float) -> float:
-    norm_category = category_score / 5.0
-    weighted = (
-        WEIGHTS["category"] * norm_category +
-        WEIGHTS["confidence"] * confidence +
-        WEIGHTS["language_risk"] * language_risk
-    )
-    return round(100 * weighted, 2)
-
-
-def classify_with_gpt(cleaned_text: str, rule_category: str, rule_priority: str):
+
+def build_prompt(cleaned_text: str, rule_category: str, rule_priority: str) -> str:
     """
-    Uses few-shot prompting to make LLM follow the exact weighted scoring model.
+    Few-shot scoring prompt for one email.
     """
-    try:
-        prompt = f"""
+    return f"""
 You are a compliance risk scoring engine. You must return ONLY valid JSON in the exact format below.
 
 Email text:
@@ -76,6 +33,7 @@ SEVERITY MAPPING (use exactly these values):
 
 FORMULA:
 Score = 100 × (0.60 × (average_severity / 5) + 0.30 × model_confidence + 0.10 × language_risk)
+(language_risk is measured from the raw email by the system: do not return it)
 
 PRIORITY MAPPING:
 ≥80 → Critical
@@ -91,8 +49,6 @@ Detected: ["Secrecy"]
 Average severity: 5.0
 Normalized: 1.00
 Confidence: 0.90
-Language risk: 0.40
-Score: 100 × (0.60×1.00 + 0.30×0.90 + 0.10×0.40) = 91 → Critical
 
 Example 2:
 Email: Bribery offer + communication change
@@ -100,8 +56,6 @@ Detected: ["Market Bribery", "Change in Communication"]
 Average severity: (4 + 3)/2 = 3.5
 Normalized: 0.70
 Confidence: 0.80
-Language risk: 0.30
-Score: 100 × (0.60×0.70 + 0.30×0.80 + 0.10×0.30) = 69 → High
 
 Example 3:
 Email: General complaint
@@ -109,8 +63,6 @@ Detected: ["Complaints"]
 Average severity: 2.0
 Normalized: 0.40
 Confidence: 0.50
-Language risk: 0.10
-Score: 100 × (0.60×0.40 + 0.30×0.50 + 0.10×0.10) = 40 → Low
 
 Example 4:
 Email: Manipulation + Bribery
@@ -118,21 +70,37 @@ Detected: ["Market Manipulation", "Market Bribery"]
 Average severity: 4.0
 Normalized: 0.80
 Confidence: 0.95
-Language risk: 0.60
-Score: 100 × (0.60×0.80 + 0.30×0.95 + 0.10×0.60) = 83 → Critical
 
 NOW ANALYZE THE EMAIL ABOVE AND RETURN ONLY THIS JSON:
 {{
   "detected_categories": ["Category1", "Category2"],
   "average_severity": 3.5,
-  "model_confidence": 0.85,
-  "language_risk": 0.40
+  "model_confidence": 0.85
 }}
 No explanation. Only JSON.
 """
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+
+def prompt_fingerprint() -> str:
+    """
+    Short hash of the prompt template (incl. severity map). Part of result
+    cache keys so a prompt change never serves results from the old one.
+    """
+    import hashlib
+
+    return hashlib.sha256(build_prompt("", "", "").encode("utf-8")).hexdigest()[:12]
+
+
+def classify_with_gpt(cleaned_text: str, rule_category: str, rule_priority: str, language_risk: float = 0.0):
+    """
+    Uses few-shot prompting to make LLM follow the exact weighted scoring model.
+    language_risk is measured locally (preprocessing/intensity.py), not asked for.
+    """
+    try:
+        prompt = build_prompt(cleaned_text, rule_category, rule_priority)
+
+        response = get_client().chat.completions.create(
+            model=get_settings()["model"],
             temperature=0.0,
             max_tokens=300,
             messages=[{"role": "user", "content": prompt}]
@@ -160,32 +128,129 @@ No explanation. Only JSON.
         categories = result.get("detected_categories", [])
         avg_severity = float(result.get("average_severity", 0))
         confidence = float(result.get("model_confidence", 0.5))
-        lang_risk = float(result.get("language_risk", 0.0))
+        lang_risk = float(language_risk)
 
-        final_cat = categories[0] if categories else rule_category
-        final_cat = normalize_category(final_cat)
+        # First label the LLM gave that names a category; an unrecognised
+        # one falls back to the rules' suggestion, not to a default label
+        known = normalize_categories(categories)
+        final_cat = known[0] if known else normalize_category(rule_category)
 
         score = calculate_weighted_score(avg_severity, confidence, lang_risk)
         final_pri = score_to_priority(score)
 
-        return LLMResult(
+        # The LLM's answer is validated once, then travels as a plain record
+        return ResultRecord.from_model(LLMResult(
             final_category=final_cat,
             final_priority=normalize_priority(final_pri),
             score=score,
+            average_severity=avg_severity,
+            model_confidence=confidence,
+            language_risk=lang_risk,
+            detected_categories=[str(c) for c in categories],
             llm_success=True,
             prompt_tokens=prompt_tokens,
             completion_tokens=completion_tokens,
             total_tokens=total_tokens
-        )
+        ))
 
     except Exception as e:
         print(f"LLM classification failed: {e}")
-        return LLMResult(
+        return ResultRecord(
             final_category=normalize_category(rule_category),
             final_priority=normalize_priority(rule_priority),
             score=0.0,
+            language_risk=float(language_risk),
             llm_success=False,
+            source="rules",
             prompt_tokens=0,
             completion_tokens=0,
             total_tokens=0
-        )
\ No newline at end of file
+        )
+
+def member_result(rep_result: ResultRecord, rule_category: str, rule_priority: str) -> ResultRecord:
+    """
+    Result for a non-representative member of a near-duplicate cluster
+    (or of a conversation classified as one).
+    """
+    if not rep_result.llm_success:
+        # Representative fell back to rules -> members use their own rules
+        return ResultRecord(
+            final_category=normalize_category(rule_category),
+            final_priority=normalize_priority(rule_priority),
+            score=0.0,
+            llm_success=False,
+            source="rules",
+        )
+    return rep_result.replace(inherited=True, prompt_tokens=0, completion_tokens=0, total_tokens=0)
+
+
+def classify_deduplicated(cleaned_texts, rule_categories, rule_priorities, threshold: float = 0.8,
+                          on_progress=None, concurrency: int = 1, on_cluster_done=None, on_latency=None,
+                          risk=None, language_risks=None):
+    """
+    Classify only one representative per near-duplicate cluster and copy its
+    result to the other members (marked inherited, zero tokens).
+
+    Args:
+        cleaned_texts: Output of preprocess_text for each email
+        rule_categories / rule_priorities: Rule-based suggestions per email
+        threshold: Minimum similarity for two emails to share a result
+        on_progress: Optional callback(done, total) after each LLM call
+        concurrency: Number of LLM calls in flight (threads share one pooled client)
+        on_cluster_done: Optional callback(positions, results) with the final
+                         results of a whole cluster as soon as its LLM call returns
+        on_latency: Optional callback(seconds) with the duration of each LLM call
+        risk: Optional sort key per email (utils.scheduler.risk_keys); clusters
+              are sent most urgent first (by their most urgent member)
+              instead of in input order
+        language_risks: Optional measured language risk per email, used in the
+                        representative's score
+
+    Returns:
+        Tuple of (results, representatives) where representatives[i] is the
+        position of the email whose LLM call produced results[i]
+    """
+    from preprocessing.dedup import cluster_near_duplicates
+
+    representatives = cluster_near_duplicates(cleaned_texts, threshold=threshold)
+    members_of = {}
+    for i, rep in enumerate(representatives):
+        members_of.setdefault(rep, []).append(i)
+    rep_positions = sorted(members_of)
+    if risk is not None:
+        rep_positions.sort(key=lambda rep: min(risk[i] for i in members_of[rep]))
+
+    results = [None] * len(cleaned_texts)
+
+    def _timed(pos):
+        started = time.perf_counter()
+        result = classify_with_gpt(cleaned_texts[pos], rule_categories[pos], rule_priorities[pos],
+                                   language_risks[pos] if language_risks is not None else 0.0)
+        return result, time.perf_counter() - started
+
+    def _finish(rep, timed_result, done):
+        rep_result, seconds = timed_result
+        if on_latency:
+            on_latency(seconds)
+        positions = members_of[rep]
+        for i in positions:
+            results[i] = rep_result if i == rep else member_result(rep_result, rule_categories[i], rule_priorities[i])
+        if on_cluster_done:
+            on_cluster_done(positions, [results[i] for i in positions])
+        if on_progress:
+            on_progress(done, len(rep_positions))
+
+    if concurrency <= 1:
+        for done, pos in enumerate(rep_positions, 1):
+            _finish(pos, _timed(pos), done)
+    else:
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            # The pool starts submitted calls in order, so risk order holds
+            futures = {pool.submit(_timed, pos): pos for pos in rep_positions}
+            # Callbacks run in the calling thread (safe for Streamlit widgets / SQLite)
+            for done, future in enumerate(as_completed(futures), 1):
+                _finish(futures[future], future.result(), done)
+
+    return results, representatives
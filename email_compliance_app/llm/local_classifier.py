@@ -0,0 +1,340 @@
+# email_compliance_app\llm\local_classifier.py
+"""
+Local classifier tier: hashed TF-IDF features + linear model in NumPy.
+
+Trained on earlier runs' outputs (rows where the LLM succeeded), it predicts
+final_category, a confidence and language_risk for a batch of cleaned texts
+without any API call. Predictions below the confidence threshold are
+escalated to classify_with_gpt.
+
+Usage:
+    python -m llm.local_classifier train --input results.parquet [--output artifacts/local_classifier.npz]
+    python -m llm.local_classifier eval  --input results.parquet [--model artifacts/local_classifier.npz]
+"""
+
+import argparse
+import os
+import time
+import zlib
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from models.llm_schema import ResultRecord
+from llm.scoring import CATEGORY_SEVERITY, calculate_weighted_score, score_to_priority
+from utils.normalizer import normalize_category, normalize_category_column, normalize_priority
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH", os.path.join(APP_DIR, "artifacts", "local_classifier.npz"))
+DEFAULT_THRESHOLD = 0.85
+
+# Export column names -> processed_df column names
+_EXPORT_COLUMNS = {
+    "Cleaned Text (AFTER Preprocessing)": "cleaned_text",
+    "Category": "category",
+}
+
+
+# --------------------------------------------------
+# FEATURES
+# --------------------------------------------------
+_bucket_cache = {}
+
+
+def _bucket(token: str, n_features: int) -> int:
+    # crc32 is stable across processes (unlike hash()), so saved models stay valid
+    key = (token, n_features)
+    bucket = _bucket_cache.get(key)
+    if bucket is None:
+        bucket = zlib.crc32(token.encode("utf-8")) % n_features
+        if len(_bucket_cache) < 2_000_000:
+            _bucket_cache[key] = bucket
+    return bucket
+
+
+def _hashed_counts(texts: List[str], n_features: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    CSR-style (indptr, indices, counts) of hashed unigrams + bigrams.
+    """
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    indices: List[int] = []
+    counts: List[int] = []
+    for i, text in enumerate(texts):
+        words = text.split()
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        c = Counter(_bucket(g, n_features) for g in grams)
+        indices.extend(c.keys())
+        counts.extend(c.values())
+        indptr[i + 1] = len(indices)
+    return indptr, np.asarray(indices, dtype=np.int64), np.asarray(counts, dtype=np.float32)
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _category_severity(category: str) -> float:
+    """
+    Average severity of a (possibly combined "A + B") category.
+    """
+    parts = [CATEGORY_SEVERITY.get(p.strip(), 1) for p in category.split("+")]
+    return sum(parts) / len(parts)
+
+
+# --------------------------------------------------
+# MODEL
+# --------------------------------------------------
+class LocalClassifier:
+    """
+    Multinomial logistic regression over L2-normalised, sublinear TF-IDF
+    hashed features, plus a logistic head for language_risk.
+    """
+
+    def __init__(self, n_features: int = 2 ** 18):
+        self.n_features = n_features
+        self.classes = np.array([], dtype=str)
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.W = np.zeros((n_features, 0), dtype=np.float32)
+        self.b = np.zeros(0, dtype=np.float32)
+        self.v = np.zeros(n_features, dtype=np.float32)
+        self.c = np.float32(0.0)
+        self.has_language_risk = False
+
+    # ---------------- features ----------------
+    def _transform(self, texts: List[str]):
+        indptr, indices, counts = _hashed_counts(texts, self.n_features)
+        n = len(texts)
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        data = np.log1p(counts) * self.idf[indices]
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=n)).astype(np.float32)
+        norms[norms == 0] = 1.0
+        data = (data / norms[rows]).astype(np.float32)
+        return n, rows, indices, data
+
+    def _logits(self, n, rows, indices, data) -> np.ndarray:
+        out = np.empty((n, len(self.classes)), dtype=np.float32)
+        for k in range(len(self.classes)):
+            out[:, k] = np.bincount(rows, weights=data * self.W[indices, k], minlength=n)
+        return out + self.b
+
+    def _risk(self, n, rows, indices, data) -> np.ndarray:
+        if not self.has_language_risk:
+            return np.zeros(n, dtype=np.float32)
+        return _sigmoid(np.bincount(rows, weights=data * self.v[indices], minlength=n) + self.c)
+
+    # ---------------- training ----------------
+    def fit(self, texts: List[str], labels: List[str], language_risk: Optional[np.ndarray] = None,
+            epochs: int = 15, batch_size: int = 4096, lr: float = 0.5, l2: float = 1e-6, seed: int = 0):
+        texts = list(texts)
+        labels = np.asarray(labels)
+        self.classes, y = np.unique(labels, return_inverse=True)
+        n, K, F = len(texts), len(self.classes), self.n_features
+
+        # IDF from document frequencies
+        indptr, indices, _ = _hashed_counts(texts, F)
+        df = np.bincount(indices, minlength=F)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+        self.W = np.zeros((F, K), dtype=np.float32)
+        self.b = np.zeros(K, dtype=np.float32)
+        self.v = np.zeros(F, dtype=np.float32)
+        self.c = np.float32(0.0)
+        self.has_language_risk = language_risk is not None
+        risk = np.clip(np.asarray(language_risk, dtype=np.float32), 0, 1) if self.has_language_risk else None
+
+        # Adagrad keeps rare hashed features learning without per-feature tuning
+        gW = np.full_like(self.W, 1e-8)
+        gv = np.full_like(self.v, 1e-8)
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rng.permutation(n)
+            for start in range(0, n, batch_size):
+                batch = order[start:start + batch_size]
+                m, rows, idx, data = self._transform([texts[i] for i in batch])
+
+                P = _softmax(self._logits(m, rows, idx, data))
+                P[np.arange(m), y[batch]] -= 1.0
+                P /= m
+                grad = np.empty((F, K), dtype=np.float32)
+                for k in range(K):
+                    grad[:, k] = np.bincount(idx, weights=data * P[rows, k], minlength=F)
+                grad += l2 * self.W
+                gW += grad * grad
+                self.W -= lr * grad / np.sqrt(gW)
+                self.b -= lr * P.sum(axis=0)
+
+                if self.has_language_risk:
+                    err = (self._risk(m, rows, idx, data) - risk[batch]) / m
+                    gradv = np.bincount(idx, weights=data * err[rows], minlength=F).astype(np.float32) + l2 * self.v
+                    gv += gradv * gradv
+                    self.v -= lr * gradv / np.sqrt(gv)
+                    self.c -= np.float32(lr * err.sum())
+        return self
+
+    # ---------------- inference ----------------
+    def predict(self, texts: List[str], batch_size: int = 8192) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns:
+            (categories, confidence, language_risk) arrays, one entry per text
+        """
+        cats, confs, risks = [], [], []
+        for start in range(0, len(texts), batch_size):
+            feats = self._transform(list(texts[start:start + batch_size]))
+            P = _softmax(self._logits(*feats))
+            best = P.argmax(axis=1)
+            cats.append(self.classes[best])
+            confs.append(P[np.arange(len(best)), best])
+            risks.append(self._risk(*feats))
+        if not cats:
+            return np.array([], dtype=str), np.array([], dtype=np.float32), np.array([], dtype=np.float32)
+        return np.concatenate(cats), np.concatenate(confs), np.concatenate(risks)
+
+    def classify(self, cleaned_texts: List[str], threshold: float = DEFAULT_THRESHOLD,
+                 language_risks: Optional[List[float]] = None) -> List[Optional[ResultRecord]]:
+        """
+        Tier entry point: a ResultRecord (source="local") for every confident
+        prediction, None where the email should be escalated to the LLM.
+        language_risks (measured from the uncleaned bodies) replace the model's
+        own language risk estimate when given.
+        """
+        cats, confs, risks = self.predict(cleaned_texts)
+        if language_risks is not None:
+            risks = language_risks
+        results: List[Optional[ResultRecord]] = []
+        for cat, conf, risk in zip(cats, confs, risks):
+            if conf < threshold:
+                results.append(None)
+                continue
+            category = normalize_category(str(cat))
+            severity = _category_severity(category)
+            score = calculate_weighted_score(severity, float(conf), float(risk))
+            results.append(ResultRecord(
+                final_category=category,
+                final_priority=normalize_priority(score_to_priority(score)),
+                score=score,
+                average_severity=severity,
+                model_confidence=float(conf),
+                language_risk=float(risk),
+                detected_categories=[p.strip() for p in category.split("+")],
+                llm_success=False,
+                source="local",
+            ))
+        return results
+
+    # ---------------- persistence ----------------
+    def save(self, path: str = DEFAULT_MODEL_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            n_features=np.int64(self.n_features),
+            classes=self.classes.astype(str),
+            idf=self.idf, W=self.W, b=self.b, v=self.v, c=np.float32(self.c),
+            has_language_risk=np.bool_(self.has_language_risk),
+        )
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> "LocalClassifier":
+        with np.load(path, allow_pickle=False) as f:
+            model = cls(int(f["n_features"]))
+            model.classes = f["classes"]
+            model.idf, model.W, model.b, model.v = f["idf"], f["W"], f["b"], f["v"]
+            model.c = np.float32(f["c"])
+            model.has_language_risk = bool(f["has_language_risk"])
+        return model
+
+
+def load_local_classifier(path: str = DEFAULT_MODEL_PATH) -> Optional[LocalClassifier]:
+    """
+    Load the saved model if one has been trained, otherwise None (tier off).
+    """
+    return LocalClassifier.load(path) if os.path.exists(path) else None
+
+
+# --------------------------------------------------
+# TRAIN / EVAL COMMANDS
+# --------------------------------------------------
+def _load_labelled(path: str):
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    elif path.endswith(".csv"):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path)
+    df = df.rename(columns=_EXPORT_COLUMNS)
+
+    if "llm_success" in df.columns:
+        df = df[df["llm_success"].astype(bool)]
+    else:
+        print("warning: no llm_success column, treating every row as an LLM label")
+    df = df[df["cleaned_text"].fillna("").astype(str).str.len() > 0]
+    # Spelling variants are merged; rows with an unrecognised label are not trained on
+    labels = normalize_category_column(df["category"], default=None)
+    df = df[labels.notna().to_numpy()]
+    texts = df["cleaned_text"].astype(str).tolist()
+    labels = labels.dropna().tolist()
+    risk = df["language_risk"].to_numpy(dtype=np.float32) if "language_risk" in df.columns else None
+    return texts, labels, risk
+
+
+def _report(model: LocalClassifier, texts, labels, threshold: float) -> None:
+    t0 = time.perf_counter()
+    cats, confs, _ = model.predict(texts)
+    elapsed = time.perf_counter() - t0
+    labels = np.asarray(labels)
+    confident = confs >= threshold
+    print(f"rows          : {len(texts):,}")
+    print(f"accuracy      : {np.mean(cats == labels):.3f}")
+    print(f"coverage @{threshold:.2f}: {confident.mean():.3f} (rest escalated to the LLM)")
+    if confident.any():
+        print(f"accuracy @{threshold:.2f}: {np.mean(cats[confident] == labels[confident]):.3f}")
+    print(f"throughput    : {len(texts) / max(elapsed, 1e-9):,.0f} emails/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="Fit on past results and save the model artifact")
+    train.add_argument("--input", required=True, help="Past results (.parquet / .csv / .xlsx)")
+    train.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    train.add_argument("--epochs", type=int, default=15)
+    train.add_argument("--holdout", type=float, default=0.2, help="Fraction held out for evaluation")
+    train.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    ev = sub.add_parser("eval", help="Evaluate a saved model on labelled results")
+    ev.add_argument("--input", required=True)
+    ev.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    ev.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args()
+    texts, labels, risk = _load_labelled(args.input)
+
+    if args.command == "train":
+        order = np.random.default_rng(0).permutation(len(texts))
+        n_eval = int(len(texts) * args.holdout)
+        train_idx, eval_idx = order[n_eval:], order[:n_eval]
+        model = LocalClassifier().fit(
+            [texts[i] for i in train_idx],
+            [labels[i] for i in train_idx],
+            None if risk is None else risk[train_idx],
+            epochs=args.epochs,
+        )
+        model.save(args.output)
+        print(f"saved model to {args.output} ({len(train_idx):,} training rows, {len(model.classes)} classes)")
+        if n_eval:
+            _report(model, [texts[i] for i in eval_idx], [labels[i] for i in eval_idx], args.threshold)
+    else:
+        _report(LocalClassifier.load(args.model), texts, labels, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# email_compliance_app\llm\scoring.py
+
+# --------------------------------------------------
+# CONFIGURATION
+# --------------------------------------------------
+# Kept free of any network / SDK imports so the scoring helpers can be
+# imported (and unit-checked) offline without constructing an LLM client.
+WEIGHTS = {
+    "category": 0.60,
+    "confidence": 0.30,
+    "language_risk": 0.10
+}
+
+CATEGORY_SEVERITY = {
+    "Secrecy": 5,
+    "Market Manipulation": 4,
+    "Market Manipulation / Misconduct": 4,
+    "Market Bribery": 4,
+    "Change in Communication": 3,
+    "Complaints": 2,
+    "Employee Ethics": 1,
+}
+
+SCORE_TO_PRIORITY = [
+    (80, "Critical"),
+    (65, "High"),
+    (45, "Medium"),
+    (0, "Low")
+]
+
+
+def score_to_priority(score: float) -> str:
+    for threshold, pri in SCORE_TO_PRIORITY:
+        if score >= threshold:
+            return pri
+    return "Low"
+
+
+def calculate_weighted_score(category_score: float, confidence: float, language_risk: float) -> float:
+    norm_category = category_score / 5.0
+    weighted = (
+        WEIGHTS["category"] * norm_category +
+        WEIGHTS["confidence"] * confidence +
+        WEIGHTS["language_risk"] * language_risk
+    )
+    return round(100 * weighted, 2)
+
+
+# --------------------------------------------------
+# VECTORIZED RE-SCORING
+# --------------------------------------------------
+def severity_from_categories(detected_categories, category_severity=None):
+    """
+    Average severity per row from ' | '-joined detected category strings.
+    Each distinct string is evaluated once, then broadcast with factorize.
+    """
+    import numpy as np
+    import pandas as pd
+
+    severity_map = CATEGORY_SEVERITY if category_severity is None else category_severity
+    codes, uniques = pd.factorize(pd.Series(detected_categories, dtype=object).fillna(""))
+    per_unique = np.empty(len(uniques), dtype=np.float64)
+    for i, value in enumerate(uniques):
+        parts = [severity_map.get(c.strip(), 0) for c in value.split("|") if c.strip()]
+        per_unique[i] = sum(parts) / len(parts) if parts else np.nan
+    return per_unique[codes] if len(codes) else np.zeros(0)
+
+
+def rescore(average_severity, model_confidence, language_risk, weights=None, score_to_priority_table=None):
+    """
+    Recompute scores and priorities for whole columns at once.
+
+    Same formula as calculate_weighted_score; priorities are assigned with
+    one searchsorted over the ascending thresholds instead of a Python loop.
+
+    Returns:
+        Tuple of (scores ndarray, priorities ndarray of str)
+    """
+    import numpy as np
+
+    w = WEIGHTS if weights is None else weights
+    table = SCORE_TO_PRIORITY if score_to_priority_table is None else score_to_priority_table
+
+    severity = np.asarray(average_severity, dtype=np.float64)
+    confidence = np.asarray(model_confidence, dtype=np.float64)
+    risk = np.asarray(language_risk, dtype=np.float64)
+    scores = np.round(100 * (
+        w["category"] * (severity / 5.0) +
+        w["confidence"] * confidence +
+        w["language_risk"] * risk
+    ), 2)
+
+    ordered = sorted(table)  # ascending thresholds
+    thresholds = np.array([t for t, _ in ordered], dtype=np.float64)
+    labels = np.array([p for _, p in ordered], dtype=object)
+    idx = np.searchsorted(thresholds, scores, side="right") - 1
+    priorities = labels[np.clip(idx, 0, len(labels) - 1)]
+    return scores, priorities
+
+
+def rescore_frame(df, weights=None, category_severity=None, score_to_priority_table=None):
+    """
+    Return (score, priority) Series for a processed results frame under new
+    weights / severity map / thresholds. Rows labelled by the rule fallback
+    have no components and keep their current score and priority.
+    """
+    import numpy as np
+    import pandas as pd
+
+    severity = df["average_severity"].to_numpy(dtype=np.float64)
+    if category_severity is not None and "detected_categories" in df.columns:
+        remapped = severity_from_categories(df["detected_categories"].to_numpy(), category_severity)
+        severity = np.where(np.isnan(remapped), severity, remapped)
+
+    scores, priorities = rescore(
+        severity,
+        df["model_confidence"].to_numpy(),
+        df["language_risk"].to_numpy(),
+        weights=weights,
+        score_to_priority_table=score_to_priority_table,
+    )
+    keep = (df["source"] == "rules").to_numpy() if "source" in df.columns else ~df["llm_success"].to_numpy(dtype=bool)
+    scores = np.where(keep, df["score"].to_numpy(dtype=np.float64), scores)
+    priorities = np.where(keep, df["priority"].to_numpy(dtype=object), priorities)
+    return pd.Series(scores, index=df.index, name="score"), pd.Series(priorities, index=df.index, name="priority")
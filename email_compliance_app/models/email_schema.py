@@ -1,7 +1,7 @@
 # email_compliance_app\models\email_schema.py
 
-from pydantic import BaseModel, Field
-from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Literal, Optional
 
 class EmailOutput(BaseModel):
     """
@@ -18,14 +18,58 @@ class EmailOutput(BaseModel):
     category: str = Field(..., description="Final compliance risk category")
     priority: Literal["Critical", "High", "Medium", "Low"] = Field(..., description="Final risk priority level")
     score: float = Field(0.0, description="Weighted risk score (0-100) from formula")  # ← NEW: Risk Score
+    average_severity: float = Field(0.0, description="Average severity (0-5) of the detected categories")
+    model_confidence: float = Field(0.0, description="Classifier confidence (0-1)")
+    language_risk: float = Field(0.0, description="Language risk / intensity (0-1)")
+    detected_categories: str = Field("", description="All detected categories, ' | ' separated")
     llm_success: bool = True
     prompt_tokens: int = 0
     completion_tokens: int = 0
     total_tokens: int = 0
+    source: Literal["llm", "local", "rules"] = Field("llm", description="Tier that produced the label: LLM, local model or rule fallback")
+    inherited_from: Optional[int] = Field(None, description="Unique ID of the email (same conversation or near-duplicate) whose LLM result was reused")
 
-
-    class Config:
+    model_config = ConfigDict(
         # Allows extra fields if needed in future
-        extra = "forbid"
+        extra="forbid",
         # Nice field names in JSON/Excel
-        allow_population_by_field_name = True
\ No newline at end of file
+        populate_by_name=True,
+    )
+
+# --------------------------------------------------
+# BATCH VALIDATION (columnar pipeline boundary)
+# --------------------------------------------------
+def validate_result_frame(frame):
+    """
+    Validate a whole result frame against EmailOutput at once instead of
+    building one model per row: exact column set/order, dtypes coerced to
+    the field types, and Literal fields checked with a single isin().
+
+    Raises:
+        ValueError: On missing/extra columns or invalid Literal values
+    """
+    import pandas as pd
+    from typing import get_args, get_origin
+
+    expected = list(EmailOutput.model_fields)
+    missing = [c for c in expected if c not in frame.columns]
+    extra = [c for c in frame.columns if c not in expected]
+    if missing or extra:
+        raise ValueError(f"Result frame does not match EmailOutput (missing={missing}, extra={extra})")
+    frame = frame[expected]
+
+    for name, field in EmailOutput.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) is Literal:
+            allowed = set(get_args(annotation))
+            bad = ~frame[name].isin(allowed)
+            if bad.any():
+                rows = frame.index[bad][:5].tolist()
+                raise ValueError(f"Invalid {name} values at rows {rows}: {frame.loc[bad, name].unique()[:5].tolist()}")
+        elif annotation is int and frame[name].dtype != "int64":
+            frame[name] = pd.to_numeric(frame[name], errors="raise").astype("int64")
+        elif annotation is float and frame[name].dtype != "float64":
+            frame[name] = pd.to_numeric(frame[name], errors="raise").astype("float64")
+        elif annotation is bool and frame[name].dtype != "bool":
+            frame[name] = frame[name].astype(bool)
+    return frame
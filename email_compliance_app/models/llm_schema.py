@@ -1,7 +1,9 @@
 # email_compliance_app\models\llm_schema.py
 
+from operator import attrgetter
+
 from pydantic import BaseModel
-from typing import Literal
+from typing import List, Literal, Sequence
 
 class LLMResult(BaseModel):
     final_category: Literal[
@@ -16,7 +18,91 @@ class LLMResult(BaseModel):
     ]
     final_priority: Literal["Critical", "High", "Medium", "Low"]
     score: float = 0.0  # ← New field: the calculated risk score (0–100)
+    # Raw score components, kept so scores can be recomputed without the LLM
+    average_severity: float = 0.0
+    model_confidence: float = 0.0
+    language_risk: float = 0.0
+    detected_categories: List[str] = []
     llm_success: bool = True
     prompt_tokens: int = 0
     completion_tokens: int = 0
-    total_tokens: int = 0 
\ No newline at end of file
+    total_tokens: int = 0
+    source: Literal["llm", "local", "rules"] = "llm"  # which tier produced the label
+    inherited: bool = False  # copied from a near-duplicate representative (no LLM call)
+
+
+# --------------------------------------------------
+# PIPELINE RECORD
+# --------------------------------------------------
+# LLMResult validates on every construction, which is most of its cost when
+# the local model or the rules label hundreds of thousands of emails, and a
+# pydantic object pickles as a full field dict. Inside the pipeline every
+# result is a ResultRecord instead: the same fields in __slots__, no
+# validation (values come from normalize_category / normalize_priority or
+# from a validated LLMResult) and a positional pickle form for worker
+# processes. LLMResult stays the schema of the LLM's answer; the export
+# boundary is the result frame (models/email_schema.validate_result_frame).
+
+class ResultRecord:
+    """
+    One email's classification inside the pipeline (LLMResult's fields).
+    """
+
+    # Same fields and order as LLMResult
+    __slots__ = tuple(LLMResult.model_fields)
+
+    def __init__(self, final_category: str, final_priority: str, score: float = 0.0,
+                 average_severity: float = 0.0, model_confidence: float = 0.0, language_risk: float = 0.0,
+                 detected_categories: Sequence[str] = (), llm_success: bool = True, prompt_tokens: int = 0,
+                 completion_tokens: int = 0, total_tokens: int = 0, source: str = "llm", inherited: bool = False):
+        self.final_category = final_category
+        self.final_priority = final_priority
+        self.score = score
+        self.average_severity = average_severity
+        self.model_confidence = model_confidence
+        self.language_risk = language_risk
+        self.detected_categories = tuple(detected_categories)
+        self.llm_success = llm_success
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = total_tokens
+        self.source = source
+        self.inherited = inherited
+
+    def astuple(self) -> tuple:
+        return _record_values(self)
+
+    def replace(self, **changes) -> "ResultRecord":
+        """
+        Copy with some fields changed (like LLMResult.model_copy(update=...)).
+        """
+        record = ResultRecord(*_record_values(self))
+        for name, value in changes.items():
+            setattr(record, name, value)
+        return record
+
+    def __reduce__(self):
+        # Pickled as (class, field values): no per-field names or state dict
+        return ResultRecord, _record_values(self)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ResultRecord) and self.astuple() == other.astuple()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ResultRecord({fields})"
+
+    @classmethod
+    def from_model(cls, model: LLMResult) -> "ResultRecord":
+        return cls(*(getattr(model, name) for name in cls.__slots__))
+
+    def to_model(self) -> LLMResult:
+        """
+        Validated LLMResult with the same values.
+        """
+        values = dict(zip(self.__slots__, self.astuple()))
+        values["detected_categories"] = list(self.detected_categories)
+        return LLMResult(**values)
+
+
+_record_values = attrgetter(*ResultRecord.__slots__)
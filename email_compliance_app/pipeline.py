@@ -0,0 +1,564 @@
+# email_compliance_app\pipeline.py
+"""
+Email compliance processing pipeline, shared by the Streamlit app and the
+headless CLI (run.py).
+
+    raw rows -> HTML / MIME to text -> clean + rules -> [local model] -> [conversation threading]
+    -> [LLM, one call per near-duplicate cluster of conversations]
+    -> result frame (EmailOutput columns)
+"""
+
+import queue
+import threading
+import time
+from operator import attrgetter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.cleaner import preprocess_text
+from preprocessing.intensity import language_risk_scores
+from preprocessing.markup import HTML_LABEL, MIME_LABEL, body_text
+from preprocessing.rules import detect_category, detect_priority
+from models.email_schema import validate_result_frame
+from models.llm_schema import ResultRecord
+from llm.scoring import calculate_weighted_score, score_to_priority
+from utils.normalizer import normalize_category, normalize_priority
+from utils.aggregates import RunningAggregates
+from utils.checkpoint import CheckpointStore, CheckpointWriter, body_hashes
+from utils.excel_io import BODY_COLUMN, INPUT_COLUMNS
+from utils.review import PRIORITY_RANK
+from utils.scheduler import risk_keys, unit_risk_key
+
+# Bump when a change to cleaning / rules / assembly changes the output
+PIPELINE_VERSION = "7"
+
+MODES = ("rules", "llm", "tiered")
+
+# Emails whose cleaned text is at least this similar share one LLM call
+DEDUP_THRESHOLD = 0.8
+# Local model predictions below this confidence are escalated to the LLM
+LOCAL_MODEL_THRESHOLD = 0.85
+
+# on_progress(stage, done, total) with stage in {"clean", "local", "llm"}
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def pipeline_version(mode: str = "tiered") -> str:
+    """
+    Everything besides the input that determines the results: pipeline code
+    version, mode, prompt template, LLM model, scoring config and the local
+    model artifact. Used in result cache and checkpoint keys.
+    """
+    import json
+    import os
+    from llm.client import get_settings
+    from llm.gpt_classifier import prompt_fingerprint
+    from llm.local_classifier import DEFAULT_MODEL_PATH
+    from llm.scoring import WEIGHTS, SCORE_TO_PRIORITY
+
+    local_model = os.path.getmtime(DEFAULT_MODEL_PATH) if mode == "tiered" and os.path.exists(DEFAULT_MODEL_PATH) else 0
+    parts = [
+        PIPELINE_VERSION, mode, prompt_fingerprint(), get_settings()["model"],
+        json.dumps(WEIGHTS, sort_keys=True), json.dumps(SCORE_TO_PRIORITY), str(local_model),
+    ]
+    return "|".join(parts)
+
+
+def safe_str(value):
+    return "" if value is None or pd.isna(value) else str(value).strip()
+
+
+# --------------------------------------------------
+# STAGE 1: CLEANING + RULES
+# --------------------------------------------------
+CleanedRow = Tuple[str, str, str, str, str]
+
+
+def clean_and_rule(raw_body: str) -> CleanedRow:
+    """
+    Returns:
+        (cleaned_text, junk_removed, rule_category, rule_priority, body_text)
+        body_text is the raw body with HTML / MIME reduced to its readable
+        text (preprocessing/markup.py), the raw body itself if plain.
+    """
+    text, markup = body_text(raw_body)
+    cleaned, junk = preprocess_text(text)
+    if markup:
+        labels = set(markup.split(", ")) | (set() if junk == "none" else set(junk.split(", ")))
+        junk = ", ".join(sorted(labels))
+    rule_cat = detect_category(cleaned)
+    rule_pri = detect_priority(rule_cat)
+    return cleaned, junk, rule_cat, rule_pri, text
+
+
+def _clean_chunk(bodies: List[str]) -> List[CleanedRow]:
+    return [clean_and_rule(b) for b in bodies]
+
+
+def clean_all(bodies: List[str], workers: int = 1, chunk_size: int = 500,
+              on_progress: Optional[ProgressCallback] = None) -> List[CleanedRow]:
+    """
+    Run cleaning + rules over every body, in worker processes when workers > 1
+    (the regex work is CPU-bound, so threads would not help).
+    """
+    total = len(bodies)
+    chunks = [bodies[i:i + chunk_size] for i in range(0, total, chunk_size)]
+    out: List[CleanedRow] = []
+
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            out.extend(_clean_chunk(chunk))
+            if on_progress:
+                on_progress("clean", len(out), total)
+        return out
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_clean_chunk, chunks):
+            out.extend(part)
+            if on_progress:
+                on_progress("clean", len(out), total)
+    return out
+
+
+def rule_result(rule_cat: str, rule_pri: str, language_risk: float = 0.0) -> ResultRecord:
+    return ResultRecord(
+        final_category=normalize_category(rule_cat),
+        final_priority=normalize_priority(rule_pri),
+        score=0.0,
+        language_risk=language_risk,
+        llm_success=False,
+        source="rules",
+    )
+
+
+def with_language_risk(result: ResultRecord, language_risk: float) -> ResultRecord:
+    """
+    Result with an email's own language risk; an LLM score (and the
+    priority derived from it) is recomputed with it. Emails sharing one LLM
+    call share severity and confidence, not language risk.
+    """
+    if result.language_risk == language_risk:
+        return result
+    if not result.llm_success:
+        return result.replace(language_risk=language_risk)
+    score = calculate_weighted_score(result.average_severity, result.model_confidence, language_risk)
+    return result.replace(language_risk=language_risk, score=score,
+                          final_priority=normalize_priority(score_to_priority(score)))
+
+
+# --------------------------------------------------
+# PIPELINE
+# --------------------------------------------------
+def run_pipeline(df: pd.DataFrame, mode: str = "tiered", workers: int = 1, llm_concurrency: int = 8,
+                 dedup_threshold: float = DEDUP_THRESHOLD, local_threshold: float = LOCAL_MODEL_THRESHOLD,
+                 local_model=None, on_progress: Optional[ProgressCallback] = None,
+                 checkpoint: Optional[CheckpointStore] = None,
+                 on_rows: Optional[Callable[[pd.DataFrame], None]] = None,
+                 aggregates: Optional[RunningAggregates] = None, threads: bool = True) -> Tuple[pd.DataFrame, dict]:
+    """
+    Process an input frame (Unique ID, From, To, Subject, body column).
+
+    Args:
+        mode: "rules" (no model calls), "llm" (rules + LLM) or
+              "tiered" (rules + local model + LLM for low-confidence emails)
+        workers: Processes used for cleaning
+        llm_concurrency: LLM requests in flight
+        local_model: LocalClassifier for the tiered mode (loaded from the
+                     default artifact path when None)
+        checkpoint: Optional CheckpointStore; rows already stored for the same
+                    (Unique ID, body) are reused and new results are written
+                    to it as they finish
+        on_rows: Optional callback(frame) with finished rows (EmailOutput
+                 columns) in batches while the run is in progress; resumed
+                 rows are reported first
+        aggregates: RunningAggregates to update with every finished row and
+                    LLM call latency (a new one when None). Updated batch by
+                    batch when on_rows or a checkpoint is attached, otherwise
+                    once from the final frame; its state is returned in
+                    stats["aggregates"]
+        threads: Group emails going to the LLM into conversations
+                 (preprocessing/threads.py) and classify each conversation
+                 once; members get its result (inherited_from = the
+                 conversation's first email)
+
+    LLM calls are made most likely risky first (rule priority, then keyword
+    evidence), so Critical emails are answered early in a long run.
+
+    Returns:
+        Tuple of (results frame with EmailOutput columns, run stats dict)
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+
+    started = time.perf_counter()
+    all_bodies = _text_column(df, BODY_COLUMN).tolist()
+    all_ids = _id_column(df)
+
+    # Resume: skip rows whose (id, body) result is already stored for this
+    # pipeline version (mode, prompt, model, ...); their input columns are
+    # taken from this upload, not the store
+    hashes = body_hashes(all_bodies) if checkpoint is not None else []
+    version = pipeline_version(mode) if checkpoint is not None else ""
+    stored = None
+    if checkpoint is not None:
+        stored = checkpoint.fetch(all_ids.tolist(), hashes, version, retry_rule_fallbacks=(mode != "rules"))
+        stored = _with_input_columns(df.iloc[stored.index], [all_bodies[i] for i in stored.index], stored)
+    done = set(stored.index) if stored is not None else set()
+    pending = [i for i in range(len(df)) if i not in done]
+
+    sub = df.iloc[pending]
+    bodies = [all_bodies[i] for i in pending]
+    sub_ids = all_ids[pending]
+    sub_hashes = [hashes[i] for i in pending] if checkpoint is not None else []
+
+    def _build_checkpoint_rows(positions, position_results, inherited_ids):
+        frame = assemble_results(sub.iloc[positions], [bodies[p] for p in positions],
+                                 [cleaned_rows[p] for p in positions], position_results, inherited_ids)
+        return frame, [sub_hashes[p] for p in positions] if sub_hashes else []
+
+    aggregates = RunningAggregates() if aggregates is None else aggregates
+    live = on_rows is not None or checkpoint is not None
+
+    def _on_rows(rows):
+        aggregates.update(rows)
+        if on_rows is not None:
+            on_rows(rows)
+
+    # With a live view attached, partial results are also flushed every second
+    writer = CheckpointWriter(checkpoint, _build_checkpoint_rows, version=version,
+                              on_flush=_on_rows if live else None,
+                              flush_seconds=1.0 if on_rows is not None else None)
+    if live and stored is not None and len(stored):
+        _on_rows(stored)
+
+    cleaned_rows = clean_all(bodies, workers=workers, on_progress=on_progress)
+    # Email text before cleaning (markup removed), the input of the language
+    # risk features (cleaning strips capitals, "!!!" and emojis) and threading
+    texts = [r[4] for r in cleaned_rows]
+    language_risks = language_risk_scores(texts).tolist()
+    clean_seconds = time.perf_counter() - started
+    markup_rows = [i for i, r in enumerate(cleaned_rows) if HTML_LABEL in r[1] or MIME_LABEL in r[1]]
+
+    results: List[Optional[ResultRecord]] = [None] * len(cleaned_rows)
+    inherited_from: List[Optional[int]] = [None] * len(cleaned_rows)
+
+    if mode == "rules":
+        results = [rule_result(r[2], r[3], risk) for r, risk in zip(cleaned_rows, language_risks)]
+
+    if mode == "tiered":
+        if local_model is None:
+            from llm.local_classifier import load_local_classifier
+            local_model = load_local_classifier()
+        if local_model is not None:
+            results = local_model.classify([r[0] for r in cleaned_rows], threshold=local_threshold,
+                                           language_risks=language_risks)
+            if on_progress:
+                on_progress("local", len(results), len(results))
+
+    answered = [i for i, r in enumerate(results) if r is not None]
+    writer.add(answered, [results[i] for i in answered], [None] * len(answered))
+
+    llm_started = time.perf_counter()
+    escalated = [i for i, r in enumerate(results) if r is None]
+    llm_calls = 0
+    thread_info = {"threads": 0, "threaded": 0}
+    if escalated:
+        from llm.gpt_classifier import classify_deduplicated, member_result
+
+        if threads:
+            from preprocessing.threads import build_conversations
+            units, unit_texts, thread_info = build_conversations(
+                _text_column(sub, "Subject").iloc[escalated].tolist(),
+                _text_column(sub, "From").iloc[escalated].tolist(),
+                _text_column(sub, "To").iloc[escalated].tolist(),
+                [texts[i] for i in escalated],
+                [cleaned_rows[i][0] for i in escalated],
+            )
+        else:
+            units, unit_texts = [[p] for p in range(len(escalated))], [cleaned_rows[i][0] for i in escalated]
+        units = [[escalated[p] for p in unit] for unit in units]
+        # A conversation is suggested the rules of its most severe email
+        unit_rules = [min((cleaned_rows[i][2:4] for i in unit), key=lambda r: PRIORITY_RANK.get(r[1], 4))
+                      for unit in units]
+        # Likely-Critical conversations go to the LLM first (utils/scheduler.py)
+        email_keys = dict(zip(escalated, risk_keys([cleaned_rows[i][3] for i in escalated],
+                                                   [cleaned_rows[i][0] for i in escalated])))
+        unit_keys = [unit_risk_key(email_keys[p] for p in unit) for unit in units]
+
+        def _on_cluster_done(cluster_units, cluster_results):
+            # Leader clustering: the first unit's first email made the call
+            rep_id = int(sub_ids[units[cluster_units[0]][0]])
+            positions, fanned = [], []
+            for u, r in zip(cluster_units, cluster_results):
+                for k, p in enumerate(units[u]):
+                    positions.append(p)
+                    own = r if k == 0 and r.llm_success else member_result(r, cleaned_rows[p][2], cleaned_rows[p][3])
+                    fanned.append(with_language_risk(own, language_risks[p]))
+            ids = [rep_id if r.inherited else None for r in fanned]
+            for p, r, inh in zip(positions, fanned, ids):
+                results[p], inherited_from[p] = r, inh
+            writer.add(positions, fanned, ids)
+
+        _, representatives = classify_deduplicated(
+            unit_texts,
+            [r[0] for r in unit_rules],
+            [r[1] for r in unit_rules],
+            threshold=dedup_threshold,
+            concurrency=llm_concurrency,
+            on_progress=(lambda n_done, total: on_progress("llm", n_done, total)) if on_progress else None,
+            on_cluster_done=_on_cluster_done,
+            on_latency=lambda seconds: aggregates.add_latency("llm_call", seconds),
+            risk=unit_keys,
+            language_risks=[max(language_risks[p] for p in unit) for unit in units],
+        )
+        llm_calls = len(set(representatives))
+    writer.flush()
+    llm_seconds = time.perf_counter() - llm_started
+
+    frame = assemble_results(sub, bodies, cleaned_rows, results, inherited_from)
+    if stored is not None and len(stored):
+        frame.index = pending
+        frame = validate_result_frame(pd.concat([stored, frame]).sort_index().reset_index(drop=True))
+    if not live:
+        aggregates.update(frame)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "mode": mode,
+        "emails": len(frame),
+        "resumed": len(done),
+        "elapsed_seconds": elapsed,
+        "clean_seconds": clean_seconds,
+        "markup_emails": len(markup_rows),
+        "markup_chars_removed": sum(len(bodies[i]) - len(texts[i]) for i in markup_rows),
+        "llm_seconds": llm_seconds,
+        "llm_calls": llm_calls,
+        "threads": thread_info["threads"],
+        "threaded": thread_info["threaded"],
+        "thread_calls_saved": len(escalated) - (len(units) if escalated else 0),
+        "inherited": int(sum(1 for r in results if r.inherited)),
+        "local": int(sum(1 for r in results if r.source == "local")),
+        "rules": int(sum(1 for r in results if r.source == "rules")),
+        "total_tokens": int(frame["total_tokens"].sum()) if len(frame) else 0,
+        "aggregates": aggregates.to_dict(),
+    }
+    return frame, stats
+
+
+_SUMMED_STATS = ("emails", "resumed", "clean_seconds", "markup_emails", "markup_chars_removed", "llm_seconds",
+                 "llm_calls", "threads", "threaded", "thread_calls_saved", "inherited", "local", "rules",
+                 "total_tokens")
+
+
+def _prefetch(chunks: Iterable[pd.DataFrame], depth: int):
+    """
+    Iterate `chunks` from a reader thread that stays up to `depth` chunks
+    ahead, so parsing the next chunk overlaps processing the current one.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+    done = object()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read():
+        try:
+            for chunk in chunks:
+                if not _put(chunk):
+                    return
+            _put(done)
+        except BaseException as exc:  # surfaced in the consumer
+            _put(exc)
+
+    reader = threading.Thread(target=_read, name="input-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def run_pipeline_chunks(chunks: Iterable[pd.DataFrame], prefetch: int = 2,
+                        on_chunk: Optional[Callable[[int, pd.DataFrame, dict], None]] = None,
+                        risk_first: bool = False, **kwargs) -> Tuple[pd.DataFrame, dict]:
+    """
+    run_pipeline over an input that arrives in chunks (utils.excel_io.
+    iter_input_chunks): each chunk is processed as soon as it is parsed
+    while the next one is read in the background.
+
+    Near-duplicate sharing of LLM results and conversation threading work
+    within a chunk, not across chunks; the checkpoint store (if any) is shared by all chunks.
+
+    Args:
+        on_chunk: Optional callback(chunk_number, chunk_results, chunk_stats)
+                  after each chunk
+        risk_first: Read all chunks (still in the background) and process
+                    them as one: the rules pass covers every row before the
+                    first LLM call, which then goes to the riskiest emails of
+                    the whole input rather than of the first chunk. Holds
+                    the whole input in memory; results arrive as one chunk
+        **kwargs: Passed to run_pipeline; one RunningAggregates (given as
+                  `aggregates` or created here) is shared by all chunks and
+                  also records each chunk's processing time
+
+    Returns:
+        Tuple of (results frame for all rows, combined run stats)
+    """
+    started = time.perf_counter()
+    aggregates = kwargs.get("aggregates") or RunningAggregates()
+    kwargs["aggregates"] = aggregates
+    frames, stats = [], None
+    chunks = _prefetch(chunks, prefetch)
+    if risk_first:
+        parts = list(chunks)
+        chunks = [pd.concat(parts, ignore_index=True)] if parts else []
+    for number, chunk in enumerate(chunks, 1):
+        frame, chunk_stats = run_pipeline(chunk.reset_index(drop=True), **kwargs)
+        aggregates.add_latency("chunk", chunk_stats["elapsed_seconds"])
+        frames.append(frame)
+        if stats is None:
+            stats = dict(chunk_stats)
+        else:
+            for key in _SUMMED_STATS:
+                stats[key] += chunk_stats[key]
+        if on_chunk:
+            on_chunk(number, frame, chunk_stats)
+
+    if stats is None:
+        return run_pipeline(pd.DataFrame(columns=list(INPUT_COLUMNS)), **kwargs)
+    stats["chunks"] = len(frames)
+    stats["elapsed_seconds"] = time.perf_counter() - started
+    stats["aggregates"] = aggregates.to_dict()
+    frame = frames[0] if len(frames) == 1 else validate_result_frame(pd.concat(frames, ignore_index=True))
+    return frame, stats
+
+
+def _id_column(df: pd.DataFrame) -> np.ndarray:
+    if "Unique ID" not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    return pd.to_numeric(df["Unique ID"], errors="coerce").fillna(0).astype("int64").to_numpy()
+
+
+def _text_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """
+    Vectorised safe_str over one input column ("" when missing / NaN).
+    """
+    if name not in df.columns:
+        return pd.Series([""] * len(df), index=df.index, dtype=object)
+    col = df[name]
+    return col.where(col.notna(), "").astype(str).str.strip()
+
+
+_LLM_FIELDS = (
+    "final_category", "final_priority", "score", "average_severity", "model_confidence",
+    "language_risk", "detected_categories", "llm_success", "prompt_tokens",
+    "completion_tokens", "total_tokens", "source",
+)
+
+
+def _input_frame(df: pd.DataFrame, bodies: List[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "unique_id": _id_column(df),
+        "from_email": _text_column(df, "From").to_numpy(),
+        "to_email": _text_column(df, "To").to_numpy(),
+        "subject": _text_column(df, "Subject").to_numpy(),
+        "email_body": list(bodies),
+    })
+
+
+def _with_input_columns(df: pd.DataFrame, bodies: List[str], stored: pd.DataFrame) -> pd.DataFrame:
+    """
+    Full result rows from stored results (utils.checkpoint.STORED_COLUMNS)
+    and the input rows they belong to.
+    """
+    inputs = _input_frame(df, bodies).set_axis(stored.index)
+    return validate_result_frame(pd.concat([inputs, stored], axis=1))
+
+
+def assemble_results(df: pd.DataFrame, bodies: List[str], cleaned_rows, results: List[ResultRecord],
+                     inherited_from: List[Optional[int]]) -> pd.DataFrame:
+    """
+    Build the result frame column by column (no per-row model objects) and
+    validate it once against the EmailOutput schema.
+    """
+    n = len(bodies)
+
+    if n:
+        cleaned, junk, *_ = zip(*cleaned_rows)
+        (category, priority, score, severity, confidence, risk, detected, llm_success,
+         prompt_tokens, completion_tokens, total_tokens, source) = zip(*(
+            attrgetter(*_LLM_FIELDS)(r) for r in results
+        ))
+    else:
+        cleaned = junk = category = priority = score = severity = confidence = risk = ()
+        detected = llm_success = prompt_tokens = completion_tokens = total_tokens = source = ()
+
+    frame = _input_frame(df, bodies).assign(**{
+        "junk_removed": list(junk),
+        "cleaned_text": list(cleaned),
+        "category": list(category),
+        "priority": list(priority),
+        "score": pd.array(score, dtype="float64"),
+        "average_severity": pd.array(severity, dtype="float64"),
+        "model_confidence": pd.array(confidence, dtype="float64"),
+        "language_risk": pd.array(risk, dtype="float64"),
+        "detected_categories": [" | ".join(d) for d in detected],
+        "llm_success": pd.array(llm_success, dtype="bool"),
+        "prompt_tokens": pd.array(prompt_tokens, dtype="int64"),
+        "completion_tokens": pd.array(completion_tokens, dtype="int64"),
+        "total_tokens": pd.array(total_tokens, dtype="int64"),
+        "source": list(source),
+        "inherited_from": pd.array(list(inherited_from), dtype=object),
+    })
+    return validate_result_frame(frame)
+
+
+def format_summary(stats: dict) -> str:
+    """
+    Human-readable throughput summary of a run.
+    """
+    n = stats["emails"]
+    elapsed = max(stats["elapsed_seconds"], 1e-9)
+    lines = [
+        f"mode            : {stats['mode']}",
+        f"emails          : {n:,}",
+        f"resumed         : {stats.get('resumed', 0):,} (already in checkpoint store)",
+        f"elapsed         : {elapsed:.2f}s  ({n / elapsed:,.1f} emails/s)",
+        f"cleaning        : {stats['clean_seconds']:.2f}s",
+        f"html / mime     : {stats.get('markup_emails', 0):,} emails reduced to text "
+        f"({stats.get('markup_chars_removed', 0):,} characters of markup removed)",
+        f"llm stage       : {stats['llm_seconds']:.2f}s  ({stats['llm_calls']:,} calls)",
+        f"local model     : {stats['local']:,} emails",
+        f"threads         : {stats.get('threads', 0):,} conversations, {stats.get('threaded', 0):,} emails "
+        f"({stats.get('thread_calls_saved', 0):,} llm calls saved)",
+        f"inherited       : {stats['inherited']:,} emails (conversation members / near-duplicates)",
+        f"rule fallback   : {stats['rules']:,} emails",
+        f"tokens          : {stats['total_tokens']:,}",
+    ]
+    if stats.get("aggregates"):
+        summary = RunningAggregates.from_dict(stats["aggregates"]).snapshot(score_bin=None)
+        q = summary["score"]["quantiles"]
+        lines.append(f"score           : mean {summary['score']['mean']:.1f}, "
+                     f"p50 {q['0.5']:.1f}, p90 {q['0.9']:.1f}, p99 {q['0.99']:.1f}")
+        call = summary["latencies"].get("llm_call")
+        if call:
+            q = call["quantiles"]
+            lines.append(f"llm latency     : p50 {q['0.5']:.2f}s, p90 {q['0.9']:.2f}s, p99 {q['0.99']:.2f}s, "
+                         f"max {call['max']:.2f}s")
+    return "\n".join(lines)
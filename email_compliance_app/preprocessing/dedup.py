@@ -0,0 +1,156 @@
+# email_compliance_app\preprocessing\dedup.py
+
+import zlib
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# --------------------------------------------------
+# NEAR-DUPLICATE INDEX (MinHash + LSH banding)
+# --------------------------------------------------
+# Templated mail (phishing waves, mass-forwarded notices, trading templates)
+# collapses to almost identical `cleaned_text` once preprocess_text has
+# replaced names/numbers. Each text is reduced to a MinHash signature over
+# word shingles; LSH bands find candidate matches in ~O(1) per email.
+#
+# Clustering is "leader" style: a new text joins the most similar existing
+# representative (if above threshold), otherwise it becomes a representative
+# itself. Every member is therefore similar to the email that was actually
+# sent to the LLM, and clusters cannot drift through chains of neighbours.
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows == num_perm whose LSH S-curve
+    midpoint (1/b) ** (1/r) is closest to, but not above, the threshold.
+    Erring low favours recall; false candidates are dropped by the exact
+    signature comparison afterwards.
+    """
+    best = (num_perm, 1)
+    best_err = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1.0 / bands) ** (1.0 / rows)
+        if midpoint > threshold:
+            continue
+        err = threshold - midpoint
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Incremental near-duplicate index over cleaned email text.
+
+    Args:
+        threshold: Minimum estimated Jaccard similarity to join a cluster
+        num_perm: MinHash signature length
+        shingle_size: Words per shingle
+        seed: Seed for the MinHash permutations (fixed for reproducibility)
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing on uint64 (wrap-around is intended)
+        self._mul = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._add = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[int]]] = [dict() for _ in range(self.bands)]
+        self._rep_keys: List[Hashable] = []
+        self._rep_sigs: List[np.ndarray] = []
+        self._members: Dict[Hashable, List[Hashable]] = {}
+        self._assignment: Dict[Hashable, Hashable] = {}
+
+    # ---------------- signatures ----------------
+    def _shingles(self, text: str) -> np.ndarray:
+        words = text.split()
+        k = self.shingle_size
+        if len(words) <= k:
+            grams = [" ".join(words)]
+        else:
+            grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+        unique = set(grams)
+        return np.fromiter(
+            (zlib.crc32(g.encode("utf-8")) for g in unique),
+            dtype=np.uint64,
+            count=len(unique),
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash signature (num_perm uint64 values) of a cleaned text.
+        """
+        hashes = self._shingles(text)
+        with np.errstate(over="ignore"):
+            permuted = hashes[:, None] * self._mul[None, :] + self._add[None, :]
+        return permuted.min(axis=0)
+
+    def similarity(self, sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        return float(np.mean(sig_a == sig_b))
+
+    # ---------------- clustering ----------------
+    def add(self, key: Hashable, text: str) -> Hashable:
+        """
+        Insert a text and return the key of its cluster representative
+        (the key itself when it starts a new cluster).
+        """
+        sig = self.signature(text)
+        band_keys = [sig[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(band_key, ()))
+
+        best_rep: Optional[int] = None
+        best_sim = self.threshold
+        for rep_idx in candidates:
+            sim = self.similarity(sig, self._rep_sigs[rep_idx])
+            if sim >= best_sim:
+                best_rep, best_sim = rep_idx, sim
+
+        if best_rep is not None:
+            rep_key = self._rep_keys[best_rep]
+            self._members[rep_key].append(key)
+            self._assignment[key] = rep_key
+            return rep_key
+
+        rep_idx = len(self._rep_keys)
+        self._rep_keys.append(key)
+        self._rep_sigs.append(sig)
+        self._members[key] = [key]
+        self._assignment[key] = key
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(rep_idx)
+        return key
+
+    def representative(self, key: Hashable) -> Hashable:
+        return self._assignment[key]
+
+    def clusters(self) -> Dict[Hashable, List[Hashable]]:
+        """
+        Mapping of representative key -> member keys (representative first).
+        """
+        return self._members
+
+    @property
+    def cluster_count(self) -> int:
+        return len(self._rep_keys)
+
+
+def cluster_near_duplicates(texts: List[str], threshold: float = 0.8, **kwargs) -> List[int]:
+    """
+    Cluster a list of cleaned texts.
+
+    Returns:
+        List where element i is the position of text i's representative
+    """
+    index = NearDuplicateIndex(threshold=threshold, **kwargs)
+    return [index.add(i, text) for i, text in enumerate(texts)]
@@ -0,0 +1,96 @@
+# email_compliance_app\preprocessing\intensity.py
+
+import re
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from preprocessing.rules import CATEGORY_KEYWORDS
+
+# --------------------------------------------------
+# LANGUAGE RISK (INTENSITY FEATURES)
+# --------------------------------------------------
+# The cleaner strips exactly what signals intensity (capitals, "!!!",
+# emojis), so language_risk is measured here from the uncleaned body text
+# (HTML / MIME already reduced to text by preprocessing/markup.py, so tags
+# and entities do not count as words) instead of being guessed by the LLM
+# from the cleaned text. Every feature is one vectorised Arrow pass over
+# all bodies (RE2 counts, no Python loop per email); language_risk is a
+# weighted sum of the features, each scaled to 0-1 and capped at its
+# saturation point. The same body always gets the same value, and the LLM
+# no longer has to produce it.
+
+URGENCY_WORDS = [
+    "urgent", "urgently", "immediately", "asap", "right now", "right away", "as soon as possible",
+    "time sensitive", "act now", "hurry", "before announcement", "before it's too late",
+]
+SECRECY_PHRASES = [k for category, words in CATEGORY_KEYWORDS if category == "Secrecy" for k in words]
+
+# feature: (weight, value at which it counts fully); weights sum to 1
+INTENSITY_WEIGHTS: Dict[str, Tuple[float, float]] = {
+    "uppercase_ratio": (0.20, 0.20),       # share of words in capitals
+    "exclamation_density": (0.15, 0.05),   # "!" per word
+    "repeated_punctuation": (0.10, 2.0),   # runs like "!!" or "?!"
+    "emojis": (0.05, 3.0),
+    "urgency_hits": (0.25, 2.0),
+    "secrecy_hits": (0.25, 2.0),
+}
+
+
+def _phrases(phrases: Sequence[str]) -> str:
+    return r"\b(?:" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + r")\b"
+
+
+_PATTERNS = {
+    "uppercase_words": (r"\b[A-Z]{2,}\b", False),
+    "repeated_punctuation": (r"[!?]{2,}", False),
+    "emojis": (r"[\x{1F000}-\x{1FAFF}\x{2600}-\x{27BF}]", False),
+    "urgency_hits": (_phrases(URGENCY_WORDS), True),
+    "secrecy_hits": (_phrases(SECRECY_PHRASES), True),
+}
+
+
+def _count(bodies: pa.Array, pattern: str, ignore_case: bool) -> np.ndarray:
+    counts = pc.count_substring_regex(bodies, pattern, ignore_case=ignore_case)
+    return counts.fill_null(0).to_numpy(zero_copy_only=False).astype(np.float64)
+
+
+def intensity_features(bodies: Sequence[str]) -> pd.DataFrame:
+    """
+    Intensity features of uncleaned email bodies, one row per body.
+    """
+    array = pa.array([b if isinstance(b, str) else "" for b in bodies], pa.large_string())
+    counts = {name: _count(array, pattern, ignore_case) for name, (pattern, ignore_case) in _PATTERNS.items()}
+    exclamations = pc.count_substring(array, "!").fill_null(0).to_numpy(zero_copy_only=False)
+    # Words as whitespace-separated tokens (a regex count of every word is ~5x slower)
+    tokens = pc.ascii_split_whitespace(pc.ascii_trim_whitespace(array))
+    words = np.maximum(pc.list_value_length(tokens).fill_null(0).to_numpy(zero_copy_only=False), 1.0)
+    return pd.DataFrame({
+        "uppercase_ratio": counts["uppercase_words"] / words,
+        "exclamation_density": exclamations / words,
+        "repeated_punctuation": counts["repeated_punctuation"],
+        "emojis": counts["emojis"],
+        "urgency_hits": counts["urgency_hits"],
+        "secrecy_hits": counts["secrecy_hits"],
+    })
+
+
+def risk_from_features(features: pd.DataFrame, weights: Dict[str, Tuple[float, float]] = None) -> np.ndarray:
+    """
+    language_risk (0-1) per row of intensity_features().
+    """
+    weights = INTENSITY_WEIGHTS if weights is None else weights
+    risk = np.zeros(len(features))
+    for name, (weight, saturation) in weights.items():
+        risk += weight * np.clip(features[name].to_numpy() / saturation, 0.0, 1.0)
+    return np.round(np.clip(risk, 0.0, 1.0), 3)
+
+
+def language_risk_scores(bodies: Sequence[str]) -> np.ndarray:
+    """
+    language_risk of each uncleaned email body.
+    """
+    return risk_from_features(intensity_features(bodies))
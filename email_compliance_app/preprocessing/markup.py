@@ -0,0 +1,250 @@
+# email_compliance_app\preprocessing\markup.py
+
+import binascii
+import html
+import re
+from typing import List, Optional, Sequence, Tuple
+
+# --------------------------------------------------
+# HTML / MIME BODY NORMALIZATION
+# --------------------------------------------------
+# Much real mail arrives as HTML (tables, inline styles, tracking pixels)
+# or as a raw MIME message. Run through preprocess_text as is, the markup
+# is shredded into noise tokens ("td", "nbsp", "font", "px") that reach
+# the rules and the LLM, and every cleaner regex pays for its bytes. So
+# before cleaning, a body is reduced to the text a reader would see:
+#   - MIME: the text/plain part is used (quoted-printable / base64 and the
+#     charset decoded), else the text/html part
+#   - HTML: one linear pass over the tags drops comments, <head>, <style>,
+#     <script> and similar blocks with their content, hidden elements
+#     (display:none preheaders) and every tag; block tags become line
+#     breaks, link text is kept (the href is not), entities are decoded
+#     and invisible padding (&nbsp;, zero-width characters) is collapsed
+# Plain-text bodies are detected with a cheap check and returned unchanged.
+
+# Tags whose content is never shown
+DROPPED_BLOCKS = ("head", "style", "script", "noscript", "template", "title", "xml", "svg")
+# Tags that start a new line of text
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "center", "dd", "div", "dl", "dt", "footer",
+    "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "ol", "p", "pre",
+    "section", "table", "tbody", "tfoot", "thead", "tr", "ul",
+})
+# Tags separated from their neighbours by a space
+CELL_TAGS = frozenset({"td", "th"})
+# Tags whose content is skipped when styled display:none (preheaders)
+HIDDEN_TAGS = frozenset({"div", "span", "p", "td", "table"})
+# Tags closed by the next opening tag of the same name (<td>x<td>y)
+IMPLIED_END_TAGS = frozenset({"p", "td", "th", "li", "tr"})
+# Tags that never have content or a closing tag
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr",
+})
+
+_LIKELY_HTML = re.compile(
+    r"<(?:!doctype|html|head|body|div|p|br|hr|table|tr|td|th|span|a|font|img|style|script|b|i|u|strong|em|"
+    r"center|ul|ol|li|h[1-6])(?:\s[^<>]*)?/?>",
+    re.IGNORECASE,
+)
+# Block contents are matched as "[^<]*(?:<(?!/name)[^<]*)*" rather than a
+# lazy ".*?", which would retry the closing tag at every character; an
+# unclosed block ends the text (\Z), so no match scans the input twice.
+# Hidden elements are not matched here: they nest and are often left
+# unclosed (</td>, </p>), so the tags are followed by _hidden_skipper
+_TOKEN = re.compile(
+    r"<!--[^-]*(?:-(?!->)[^-]*)*(?:-->|\Z)"
+    r"|<(" + "|".join(DROPPED_BLOCKS) + r")\b[^>]*>[^<]*(?:<(?!/\1\b)[^<]*)*(?:</\1\s*>|\Z)"
+    r"|<(/?)([a-zA-Z][a-zA-Z0-9:-]*)([^>]*)>"
+    r"|<[!?][^>]*>",
+    re.IGNORECASE,
+)
+_DISPLAY_NONE = re.compile(r"display\s*:\s*none", re.IGNORECASE)
+# Text between the markers _hidden_skipper puts around a hidden element
+_HIDDEN_TEXT = re.compile(r"\x01[^\x02]*(?:\x02|\Z)")
+# Whitespace in the HTML source (not a line break in the text), &nbsp; and
+# zero-width preheader padding
+_SPACES = re.compile(r"[\s\xa0\u034f\u200b-\u200d\u2060\ufeff]+")
+_BREAKS = re.compile(r" ?\x00[\x00 ]*")
+
+_MIME_HEADERS = re.compile(
+    r"\A\s*(?:[\w-]+:[^\n]*\n(?:[ \t][^\n]*\n)*)*?(?:mime-version|content-type)\s*:", re.IGNORECASE)
+# Multipart content exported without the message headers
+_MIME_BOUNDARY = re.compile(r"^--([^\s\"]+)\s*\n(?:[\w-]+:[^\n]*\n)*?content-type\s*:", re.IGNORECASE | re.MULTILINE)
+_CONTENT_TYPE = re.compile(r"^content-type\s*:\s*([\w.+-]+)/([\w.+-]+)((?:[^\n]*)(?:\n[ \t][^\n]*)*)",
+                           re.IGNORECASE | re.MULTILINE)
+_BOUNDARY_PARAM = re.compile(r'boundary\s*=\s*(?:"([^"]+)"|([^\s;]+))', re.IGNORECASE)
+_CHARSET_PARAM = re.compile(r'charset\s*=\s*"?([\w.:-]+)', re.IGNORECASE)
+_TRANSFER_ENCODING = re.compile(r"^content-transfer-encoding\s*:\s*([\w-]+)", re.IGNORECASE | re.MULTILINE)
+_ATTACHMENT = re.compile(r"^content-disposition\s*:\s*attachment", re.IGNORECASE | re.MULTILINE)
+# Nested multiparts followed at most this deep
+MAX_MIME_DEPTH = 5
+
+# Removed-items labels (same register as preprocess_text's summary)
+HTML_LABEL = "HTML markup"
+MIME_LABEL = "MIME headers"
+
+
+def _tag_text(name: str) -> str:
+    if name in BLOCK_TAGS:
+        return "\x00"
+    return " " if name in CELL_TAGS else ""
+
+
+def looks_like_html(text: str) -> bool:
+    return "<" in text and _LIKELY_HTML.search(text) is not None
+
+
+def _hidden_skipper():
+    """
+    re.sub callback replacing each token with its text, which also tracks
+    display:none elements: "\x01" marks where one starts and "\x02" where
+    it ends (closed, closed with its parent, or followed by a sibling).
+    """
+    # Elements open inside the hidden element (itself first), with a
+    # count per tag name
+    hidden: List[str] = []
+    counts = {}
+
+    def tag_text(match: "re.Match") -> str:
+        slash, name, attrs = match.group(2, 3, 4)
+        if name is None:  # comment, dropped block, doctype
+            return ""
+        name = name.lower()
+        if not hidden:
+            if (slash or name not in HIDDEN_TAGS or "none" not in attrs.lower()
+                    or not _DISPLAY_NONE.search(attrs)):
+                return _tag_text(name)
+            if attrs.endswith("/"):
+                return ""
+            hidden.append(name)
+            counts[name] = 1
+            return "\x01"
+        if slash:
+            if not counts.get(name):
+                # Closes an element around the hidden one, which ends with it
+                hidden.clear()
+                counts.clear()
+                return "\x02" + _tag_text(name)
+            # Closes this element and any left open inside it
+            while True:
+                inner = hidden.pop()
+                counts[inner] -= 1
+                if inner == name:
+                    return "" if hidden else "\x02"
+        if name in IMPLIED_END_TAGS and hidden[-1] == name:
+            if len(hidden) == 1:  # a visible sibling of the hidden element
+                hidden.clear()
+                counts.clear()
+                return "\x02" + _tag_text(name)
+        elif name not in VOID_TAGS and not attrs.endswith("/"):
+            hidden.append(name)
+            counts[name] = counts.get(name, 0) + 1
+        return ""
+
+    return tag_text
+
+
+def html_to_text(markup: str) -> str:
+    """
+    Visible text of an HTML document or fragment, one line per block.
+    """
+    markup = markup.replace("\x00", "").replace("\x01", "").replace("\x02", "")
+    text = _TOKEN.sub(_hidden_skipper(), markup)
+    if "\x01" in text:
+        text = _HIDDEN_TEXT.sub("", text)
+    text = _SPACES.sub(" ", html.unescape(text))
+    return _BREAKS.sub("\n", text).strip()
+
+
+def _decode(body: str, headers: str) -> str:
+    encoding = _TRANSFER_ENCODING.search(headers)
+    encoding = encoding.group(1).lower() if encoding else ""
+    if encoding not in ("base64", "quoted-printable"):
+        return body
+    data = body.encode("ascii", errors="ignore")
+    data = binascii.a2b_base64(data) if encoding == "base64" else binascii.a2b_qp(data)
+    charset = _CHARSET_PARAM.search(headers)
+    try:
+        return data.decode(charset.group(1) if charset else "utf-8", errors="replace")
+    except LookupError:  # unknown charset
+        return data.decode("utf-8", errors="replace")
+
+
+def _sections(body: str, boundary: str) -> List[str]:
+    delimiter = "\n--" + boundary
+    sections = ("\n" + body).split(delimiter)[1:]
+    out = []
+    for section in sections:
+        if section.startswith("--"):  # closing delimiter
+            break
+        out.append(section.partition("\n")[2])
+    return out
+
+
+def _text_parts(entity: str, depth: int = 0):
+    """
+    (subtype, text) of each text/plain and text/html part, in order.
+    """
+    headers, _, body = entity.partition("\n\n")
+    content_type = _CONTENT_TYPE.search(headers)
+    maintype, subtype, params = content_type.groups() if content_type else ("text", "plain", "")
+    maintype, subtype = maintype.lower(), subtype.lower()
+    if maintype == "multipart":
+        boundary = _BOUNDARY_PARAM.search(params)
+        if boundary and depth < MAX_MIME_DEPTH:
+            for section in _sections(body, boundary.group(1) or boundary.group(2)):
+                yield from _text_parts(section, depth + 1)
+    elif maintype == "text" and subtype in ("plain", "html") and not _ATTACHMENT.search(headers):
+        yield subtype, _decode(body, headers)
+
+
+def mime_body(text: str) -> Optional[Tuple[str, bool]]:
+    """
+    (body, is_html) of the best text part of a raw MIME message, or None
+    if `text` is not one. A non-empty text/plain part wins over text/html.
+    """
+    text = text.replace("\r\n", "\n")
+    if _MIME_HEADERS.match(text):
+        parts = list(_text_parts(text.lstrip()))
+    else:
+        boundary = _MIME_BOUNDARY.search(text) if text.count("\n--") >= 2 else None
+        if boundary is None:
+            return None
+        parts = [p for section in _sections(text, boundary.group(1)) for p in _text_parts(section, 1)]
+    found = {}
+    for subtype, body in parts:
+        if body.strip():
+            found.setdefault(subtype, body)
+    if "plain" in found:
+        return found["plain"], False
+    if "html" in found:
+        return found["html"], True
+    return "", False
+
+
+def body_text(raw_body: str) -> Tuple[str, str]:
+    """
+    (text, removed) for one raw email body: the readable text and what was
+    stripped ("MIME headers", "HTML markup", both or ""). Plain text is
+    returned as is.
+    """
+    text = raw_body or ""
+    removed = []
+    mime = mime_body(text) if ":" in text else None
+    if mime is not None:
+        text, is_html = mime
+        removed.append(MIME_LABEL)
+    else:
+        is_html = looks_like_html(text)
+    if is_html:
+        text = html_to_text(text)
+        removed.append(HTML_LABEL)
+    return text, ", ".join(removed)
+
+
+def body_texts(raw_bodies: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """
+    body_text over many bodies: (texts, removed per body).
+    """
+    pairs = [body_text(b) for b in raw_bodies]
+    return [p[0] for p in pairs], [p[1] for p in pairs]
@@ -0,0 +1,197 @@
+# email_compliance_app\preprocessing\threads.py
+
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from preprocessing.cleaner import preprocess_text
+from utils.people import split_addresses
+
+# --------------------------------------------------
+# CONVERSATION THREADING
+# --------------------------------------------------
+# The input has no Message-ID / In-Reply-To headers, so conversations are
+# rebuilt from what every email does have:
+#   - subject: a reply / forward ("RE: Fwd[2]: x") is linked to the first
+#     email with the same stripped subject ("x") that shares a participant.
+#     Two emails without a prefix are never linked by subject alone: a
+#     weekly report or a mass mailing is a series, not a conversation
+#   - quoted content: a reply that quotes another email's own (new) lines
+#     is linked to it, even if the subject was changed
+# Links are merged with union-find, so a conversation is every email
+# reachable through them. Each conversation is then classified once, on
+# the cleaned new content of its emails (quotes dropped, repeated messages
+# once), and the result is copied to every member.
+
+# Characters of conversation text per LLM call; longer threads are split
+MAX_CONVERSATION_CHARS = 4000
+# Shorter quoted lines ("Thanks", "See below") are too common to link on
+MIN_QUOTE_LINE_CHARS = 20
+
+_REPLY_PREFIX = re.compile(r"^\s*(?:(?:re|fw|fwd|aw|wg|sv|tr)\s*(?:\[\d+\]|\(\d+\))?\s*:\s*)+", re.IGNORECASE)
+_QUOTE_START = re.compile(
+    r"^(?:-{2,}\s*(?:original message|forwarded message)\s*-{2,}|begin forwarded message:|on\s.{0,200}\bwrote:)$",
+    re.IGNORECASE,
+)
+_HEADER_FIELD = re.compile(r"^(?:sent|date|to|subject):", re.IGNORECASE)
+_QUOTE_MARKS = re.compile(r"^(?:\s*>)+\s?")
+_NON_WORD = re.compile(r"\W+")
+
+
+def normalize_subject(subject: str) -> str:
+    """
+    Subject without reply / forward prefixes, lowercased, whitespace collapsed.
+    """
+    return " ".join(_REPLY_PREFIX.sub("", str(subject or "")).lower().split())
+
+
+def is_reply(subject: str) -> bool:
+    return bool(_REPLY_PREFIX.match(str(subject or "")))
+
+
+def split_reply(body: str) -> Tuple[str, str]:
+    """
+    (new content, quoted content) of an email body. Quoted content is any
+    "> " line and everything from a reply / forward header ("On ... wrote:",
+    "-----Original Message-----", a "From:" line followed by "Sent:" etc.) on.
+    """
+    lines = str(body or "").splitlines()
+    new, quoted = [], []
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if _QUOTE_START.match(stripped) or (
+            stripped.lower().startswith("from:") and any(_HEADER_FIELD.match(l.strip()) for l in lines[i + 1:i + 4])
+        ):
+            quoted.extend(_QUOTE_MARKS.sub("", l) for l in lines[i + 1:])
+            break
+        if stripped.startswith(">"):
+            quoted.append(_QUOTE_MARKS.sub("", line))
+        else:
+            new.append(line)
+    return "\n".join(new).strip(), "\n".join(quoted).strip()
+
+
+def _line_keys(text: str) -> set:
+    keys = set()
+    for line in text.splitlines():
+        line = _NON_WORD.sub(" ", line.lower()).strip()
+        if len(line) >= MIN_QUOTE_LINE_CHARS:
+            keys.add(zlib.crc32(line.encode("utf-8")))
+    return keys
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # The earlier email stays the root, so roots are thread starters
+            self.parent[max(a, b)] = min(a, b)
+
+
+def find_threads(subjects: Sequence[str], senders: Sequence[str], recipients: Sequence[str],
+                 bodies: Sequence[str]) -> List[int]:
+    """
+    Thread of every email, as the position of the thread's first email.
+    """
+    n = len(subjects)
+    threads = _UnionFind(n)
+
+    # Replies / forwards: same normalised subject + a shared participant
+    first_with: Dict[Tuple[str, str], int] = {}
+    for i in range(n):
+        subject = normalize_subject(subjects[i])
+        if not subject:
+            continue
+        reply = is_reply(subjects[i])
+        for address in split_addresses(senders[i]) + split_addresses(recipients[i]):
+            j = first_with.setdefault((subject, address), i)
+            if j != i and reply:
+                threads.union(i, j)
+
+    # Quoted lines that are another email's own lines. A line written in
+    # several emails (templates, mass mail) identifies none of them.
+    parts = [split_reply(b) for b in bodies]
+    new_keys = [_line_keys(new) for new, _ in parts]
+    writers = Counter(k for keys in new_keys for k in keys)
+    owner = {k: i for i, keys in enumerate(new_keys) for k in keys if writers[k] == 1}
+    for i, (_, quoted) in enumerate(parts):
+        for key in _line_keys(quoted) if quoted else ():
+            j = owner.get(key)
+            if j is not None and j != i:
+                threads.union(i, j)
+    return [threads.find(i) for i in range(n)]
+
+
+def conversation_texts(bodies: Sequence[str], cleaned_texts: Sequence[str],
+                       max_chars: int = MAX_CONVERSATION_CHARS) -> List[Tuple[List[int], str]]:
+    """
+    Split one conversation (bodies in order) into LLM-sized parts.
+    cleaned_texts (preprocess_text of the whole bodies) are reused for
+    members that quote nothing.
+
+    Returns:
+        List of (member positions, text): the cleaned new content of each
+        member, repeated messages once, each text at most ~max_chars.
+        Members with nothing new (bare forwards) join the current part.
+    """
+    parts: List[Tuple[List[int], List[str]]] = [([], [])]
+    seen = set()
+    for i, body in enumerate(bodies):
+        new, quoted = split_reply(body)
+        cleaned = preprocess_text(new)[0] if quoted else cleaned_texts[i]
+        members, texts = parts[-1]
+        if cleaned and cleaned not in seen:
+            seen.add(cleaned)
+            if texts and sum(len(t) + 1 for t in texts) + len(cleaned) > max_chars:
+                parts.append(([], []))
+                members, texts = parts[-1]
+            texts.append(cleaned)
+        members.append(i)
+    return [(members, "\n".join(texts)) for members, texts in parts]
+
+
+def build_conversations(subjects: Sequence[str], senders: Sequence[str], recipients: Sequence[str],
+                        bodies: Sequence[str], cleaned_texts: Sequence[str],
+                        max_chars: int = MAX_CONVERSATION_CHARS) -> Tuple[List[List[int]], List[str], dict]:
+    """
+    Group emails into units classified with one LLM call each.
+
+    Args:
+        cleaned_texts: preprocess_text output per email, used as is for
+                       emails that are not part of a conversation
+
+    Returns:
+        (units, texts, info): member positions of each unit (first member
+        first), the text to classify per unit, and {"threads": conversations
+        with 2+ emails, "threaded": emails in them}
+    """
+    members: Dict[int, List[int]] = {}
+    for i, root in enumerate(find_threads(subjects, senders, recipients, bodies)):
+        members.setdefault(root, []).append(i)
+
+    units, texts = [], []
+    info = {"threads": 0, "threaded": 0}
+    for root in sorted(members):
+        positions = members[root]
+        if len(positions) == 1:
+            units.append(positions)
+            texts.append(cleaned_texts[positions[0]])
+            continue
+        info["threads"] += 1
+        info["threaded"] += len(positions)
+        for part, text in conversation_texts([bodies[p] for p in positions], [cleaned_texts[p] for p in positions],
+                                             max_chars=max_chars):
+            units.append([positions[p] for p in part])
+            # A thread of bare forwards has no new text of its own
+            texts.append(text or cleaned_texts[positions[part[0]]])
+    return units, texts, info
@@ -0,0 +1,106 @@
+# email_compliance_app\run.py
+"""
+Headless batch run of the email compliance pipeline (e.g. nightly cron).
+
+Usage (from the repository root or from inside email_compliance_app/):
+    python -m email_compliance_app.run --input emails.xlsx --output results.parquet \
+        --workers 8 --llm-concurrency 32 --mode tiered
+"""
+
+import argparse
+import os
+import sys
+import uuid
+
+# The app modules use top-level imports (preprocessing, llm, ...), exactly as
+# when started with `streamlit run app.py` from this directory.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import pandas as pd
+
+from pipeline import MODES, DEDUP_THRESHOLD, LOCAL_MODEL_THRESHOLD, run_pipeline_chunks, format_summary
+from utils.checkpoint import DEFAULT_CHECKPOINT_PATH, CheckpointStore
+from utils.excel_io import INPUT_CHUNK_ROWS, export_results, iter_input_chunks
+from utils.normalizer import unknown_labels
+from utils.warehouse import DEFAULT_WAREHOUSE_PATH, Warehouse
+
+
+def write_output(df: pd.DataFrame, path: str) -> str:
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    elif lower.endswith(".csv"):
+        df.to_csv(path, index=False)
+    elif lower.endswith(".xlsx"):
+        # Streams rows; becomes a .zip when the data needs splitting
+        path = export_results(df, path)
+    else:
+        raise ValueError(f"Unsupported output format: {path} (use .parquet, .csv or .xlsx)")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, help="Input workbook (.xlsx) or .csv")
+    parser.add_argument("--output", required=True, help="Results file (.parquet, .csv or .xlsx)")
+    parser.add_argument("--mode", choices=MODES, default="tiered")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for cleaning")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="LLM requests in flight")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD)
+    parser.add_argument("--local-threshold", type=float, default=LOCAL_MODEL_THRESHOLD)
+    parser.add_argument("--no-threads", action="store_true",
+                        help="Classify emails one by one instead of once per conversation")
+    parser.add_argument("--chunk-size", type=int, default=INPUT_CHUNK_ROWS,
+                        help="Input rows per chunk; processing starts while later chunks are still being read")
+    parser.add_argument("--risk-first", action="store_true",
+                        help="Apply the rules to the whole input before any LLM call, then send the riskiest "
+                             "emails first (holds the whole input in memory)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH,
+                        help="SQLite store of finished emails; a rerun only processes new or changed rows")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Process every row, store nothing")
+    parser.add_argument("--warehouse", default=DEFAULT_WAREHOUSE_PATH,
+                        help="SQLite history of all runs, shown in the app's History view")
+    parser.add_argument("--no-warehouse", action="store_true", help="Do not add this run to the history")
+    args = parser.parse_args(argv)
+
+    if args.mode != "rules":
+        from llm.client import configure
+        # Keep enough pooled keep-alive connections for the requested concurrency
+        configure(max_connections=max(args.llm_concurrency, 1), max_keepalive=max(args.llm_concurrency, 1))
+
+    def on_progress(stage, done, total):
+        print(f"\r[{stage}] {done:,}/{total:,}", end="", file=sys.stderr, flush=True)
+        if done == total:
+            print(file=sys.stderr)
+
+    results, stats = run_pipeline_chunks(
+        iter_input_chunks(args.input, chunk_size=args.chunk_size),
+        mode=args.mode,
+        workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        dedup_threshold=args.dedup_threshold,
+        local_threshold=args.local_threshold,
+        threads=not args.no_threads,
+        risk_first=args.risk_first,
+        on_progress=on_progress,
+        checkpoint=None if args.no_checkpoint else CheckpointStore(args.checkpoint),
+    )
+    output_path = write_output(results, args.output)
+    if not args.no_warehouse:
+        warehouse = Warehouse(args.warehouse)
+        warehouse.append_run(f"cli-{uuid.uuid4().hex[:12]}", results, file_name=os.path.basename(args.input),
+                             mode=args.mode)
+        warehouse.close()
+
+    print(format_summary(stats))
+    for kind, values in unknown_labels().items():
+        if values:
+            # Labels the LLM returned that name no category / priority
+            print(f"unknown {kind:<8}: " + ", ".join(f"{v!r} ×{n}" for v, n in values.items()))
+    print(f"output          : {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# email_compliance_app\utils\aggregates.py
+
+import heapq
+import itertools
+import math
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# INCREMENTAL AGGREGATES OF A RUN
+# --------------------------------------------------
+# Fed with each batch of finished rows (pipeline on_rows / aggregates) and
+# with timings as they are measured. Every update costs O(batch), and a
+# snapshot costs O(categories + buckets + kept items), so neither the live
+# view nor the dashboard ever rescans the rows themselves.
+#
+# Distributions are kept in fixed-bucket histograms: two histograms with the
+# same buckets merge by adding counts, so aggregates of chunks, worker
+# processes and runs combine exactly (merge()) and survive a JSON round trip
+# (to_dict() / from_dict()).
+#   - score: linear 0.5-point buckets over 0-100 -> quantiles within 0.25
+#   - latencies: log buckets growing 10% per step -> within ~5% relative
+
+CRITICAL_ITEMS_KEPT = 50
+_ITEM_COLUMNS = ("unique_id", "subject", "from_email", "category", "score")
+TOKEN_COLUMNS = ("prompt_tokens", "completion_tokens", "total_tokens")
+SNAPSHOT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """
+    Mergeable fixed-bucket histogram with approximate quantiles.
+
+    Args:
+        bounds: Increasing bucket edges; values outside them land in the
+                first / last bucket (min and max are tracked exactly)
+    """
+
+    def __init__(self, bounds: Iterable[float]):
+        self.bounds = np.asarray(list(bounds), dtype=np.float64)
+        self.counts = np.zeros(len(self.bounds) - 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def linear(cls, low: float, high: float, width: float) -> "Histogram":
+        return cls(np.linspace(low, high, int(round((high - low) / width)) + 1))
+
+    @classmethod
+    def log(cls, low: float, high: float, growth: float = 1.1) -> "Histogram":
+        steps = int(math.ceil(math.log(high / low) / math.log(growth)))
+        return cls(np.concatenate(([0.0], low * growth ** np.arange(steps + 1))))
+
+    def add(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        buckets = np.clip(np.searchsorted(self.bounds, values, side="right") - 1, 0, len(self.counts) - 1)
+        self.counts += np.bincount(buckets, minlength=len(self.counts))
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: "Histogram") -> None:
+        if not np.array_equal(self.bounds, other.bounds):
+            raise ValueError("Only histograms with the same buckets can be merged")
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        Approximate q-quantile (linear within the bucket it falls in).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = np.cumsum(self.counts)
+        b = int(np.searchsorted(cumulative, rank, side="left"))
+        b = min(b, len(self.counts) - 1)
+        before = cumulative[b - 1] if b else 0
+        low, high = self.bounds[b], self.bounds[b + 1]
+        value = low + (high - low) * ((rank - before) / self.counts[b] if self.counts[b] else 0.0)
+        return float(min(max(value, self.min), self.max))
+
+    def rebinned(self, width: float) -> pd.Series:
+        """
+        Counts regrouped into buckets of `width` (for charts), indexed by
+        bucket start. Only meaningful for linear histograms.
+        """
+        starts = np.floor(self.bounds[:-1] / width) * width
+        return pd.Series(self.counts, index=starts).groupby(level=0).sum()
+
+    def to_dict(self) -> dict:
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "bounds": [float(self.bounds[0]), float(self.bounds[-1]), len(self.counts)],
+            "edges": None if self._is_regular() else self.bounds.tolist(),
+            "buckets": {int(i): int(self.counts[i]) for i in nonzero},
+            "count": self.count, "total": self.total,
+            "min": self.min if self.count else None, "max": self.max if self.count else None,
+        }
+
+    def _is_regular(self) -> bool:
+        return bool(np.allclose(np.diff(self.bounds), self.bounds[1] - self.bounds[0]))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        if data["edges"] is not None:
+            hist = cls(data["edges"])
+        else:
+            low, high, n = data["bounds"]
+            hist = cls(np.linspace(low, high, n + 1))
+        for i, c in data["buckets"].items():
+            hist.counts[int(i)] = c
+        hist.count, hist.total = data["count"], data["total"]
+        if data["count"]:
+            hist.min, hist.max = data["min"], data["max"]
+        return hist
+
+
+def score_histogram() -> Histogram:
+    return Histogram.linear(0.0, 100.0, 0.5)
+
+
+def latency_histogram() -> Histogram:
+    # 1 ms .. 10 min
+    return Histogram.log(0.001, 600.0, 1.1)
+
+
+class RunningAggregates:
+    """
+    Thread-safe running aggregates over finished result rows.
+
+    Args:
+        max_critical: Highest-scoring Critical emails kept for display
+    """
+
+    def __init__(self, max_critical: int = CRITICAL_ITEMS_KEPT):
+        self.max_critical = max_critical
+        self._lock = threading.Lock()
+        self.emails = 0
+        self.tokens: Counter = Counter()
+        self.priority_counts: Counter = Counter()
+        self.category_counts: Counter = Counter()
+        self.source_counts: Counter = Counter()
+        self.score = score_histogram()
+        self.latencies: Dict[str, Histogram] = {}
+        # min-heap of (score, unique_id, seq, item); seq breaks ties so two
+        # items with the same score and id never compare their dicts
+        self._critical: List[tuple] = []
+        self._seq = itertools.count()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.tokens["total_tokens"]
+
+    @classmethod
+    def from_frame(cls, rows: pd.DataFrame, **kwargs) -> "RunningAggregates":
+        aggregates = cls(**kwargs)
+        aggregates.update(rows)
+        return aggregates
+
+    def update(self, rows: pd.DataFrame) -> None:
+        """
+        Add a batch of finished rows (EmailOutput columns).
+        """
+        if rows.empty:
+            return
+        priorities = rows["priority"].value_counts()
+        categories = rows["category"].value_counts()
+        sources = rows["source"].value_counts() if "source" in rows.columns else pd.Series(dtype="int64")
+        tokens = {c: int(rows[c].sum()) for c in TOKEN_COLUMNS if c in rows.columns}
+        scores = rows["score"].to_numpy(dtype=np.float64, na_value=np.nan)
+        critical = rows.loc[rows["priority"] == "Critical", [c for c in _ITEM_COLUMNS if c in rows.columns]]
+
+        with self._lock:
+            self.emails += len(rows)
+            self.tokens.update(tokens)
+            self.priority_counts.update({k: int(v) for k, v in priorities.items() if v})
+            self.category_counts.update({k: int(v) for k, v in categories.items() if v})
+            self.source_counts.update({k: int(v) for k, v in sources.items() if v})
+            self.score.add(scores)
+            for item in critical.to_dict("records"):
+                self._keep_critical(item)
+
+    def _keep_critical(self, item: dict) -> None:
+        entry = (float(item.get("score", 0.0)), int(item.get("unique_id", 0)), next(self._seq), item)
+        if len(self._critical) < self.max_critical:
+            heapq.heappush(self._critical, entry)
+        elif entry[:2] > self._critical[0][:2]:
+            heapq.heapreplace(self._critical, entry)
+
+    def add_latency(self, stage: str, seconds) -> None:
+        """
+        Record one or more measured durations of a stage (e.g. "llm_call").
+        """
+        with self._lock:
+            if stage not in self.latencies:
+                self.latencies[stage] = latency_histogram()
+            self.latencies[stage].add(seconds)
+
+    def merge(self, other: "RunningAggregates") -> None:
+        """
+        Add another aggregate (another chunk, worker or run) into this one.
+        """
+        state = other.to_dict()
+        merged = RunningAggregates.from_dict(state, max_critical=self.max_critical)
+        with self._lock:
+            self.emails += merged.emails
+            self.tokens.update(merged.tokens)
+            self.priority_counts.update(merged.priority_counts)
+            self.category_counts.update(merged.category_counts)
+            self.source_counts.update(merged.source_counts)
+            self.score.merge(merged.score)
+            for stage, hist in merged.latencies.items():
+                if stage in self.latencies:
+                    self.latencies[stage].merge(hist)
+                else:
+                    self.latencies[stage] = hist
+            for *_, item in merged._critical:
+                self._keep_critical(item)
+
+    def to_dict(self) -> dict:
+        """
+        Complete, JSON-serialisable state (see from_dict()).
+        """
+        with self._lock:
+            return {
+                "emails": self.emails,
+                "tokens": dict(self.tokens),
+                "priority_counts": dict(self.priority_counts),
+                "category_counts": dict(self.category_counts),
+                "source_counts": dict(self.source_counts),
+                "score": self.score.to_dict(),
+                "latencies": {stage: hist.to_dict() for stage, hist in self.latencies.items()},
+                "critical_items": [item for *_, item in self._critical],
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict, **kwargs) -> "RunningAggregates":
+        aggregates = cls(**kwargs)
+        aggregates.emails = data["emails"]
+        aggregates.tokens.update(data["tokens"])
+        aggregates.priority_counts.update(data["priority_counts"])
+        aggregates.category_counts.update(data["category_counts"])
+        aggregates.source_counts.update(data["source_counts"])
+        aggregates.score = Histogram.from_dict(data["score"])
+        aggregates.latencies = {stage: Histogram.from_dict(h) for stage, h in data["latencies"].items()}
+        for item in data["critical_items"]:
+            aggregates._keep_critical(item)
+        return aggregates
+
+    def snapshot(self, score_bin: Optional[float] = 5.0) -> dict:
+        """
+        Consistent, display-ready copy of the current aggregates:
+        critical_items sorted by score (highest first), score and latency
+        quantiles, and the score distribution in `score_bin`-point buckets.
+        """
+        with self._lock:
+            score = self.score
+            return {
+                "emails": self.emails,
+                "total_tokens": self.tokens["total_tokens"],
+                "tokens": {c: self.tokens[c] for c in TOKEN_COLUMNS},
+                "priority_counts": dict(self.priority_counts),
+                "category_counts": dict(self.category_counts),
+                "source_counts": dict(self.source_counts),
+                "score": {
+                    "mean": score.mean,
+                    "quantiles": {str(q): score.quantile(q) for q in SNAPSHOT_QUANTILES},
+                    "histogram": ({str(k): int(v) for k, v in score.rebinned(score_bin).items()}
+                                  if score_bin else None),
+                },
+                "latencies": {
+                    stage: {"count": h.count, "mean": h.mean, "max": h.max if h.count else 0.0,
+                            "quantiles": {str(q): h.quantile(q) for q in SNAPSHOT_QUANTILES}}
+                    for stage, h in self.latencies.items()
+                },
+                "critical_items": [item for *_, item in sorted(self._critical, key=lambda e: e[:2], reverse=True)],
+            }
@@ -0,0 +1,191 @@
+# email_compliance_app\utils\checkpoint.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from models.email_schema import EmailOutput
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(APP_DIR, "artifacts", "checkpoints.sqlite"))
+
+# --------------------------------------------------
+# RESUMABLE RESULT STORE
+# --------------------------------------------------
+# Finished records are written to SQLite as soon as they are known, keyed by
+# (version, Unique ID, hash of the raw body). A restarted run - or a
+# re-upload of the same workbook with appended / edited rows - only
+# processes rows whose (id, body) pair is not stored yet for its version,
+# then merges them with the stored ones. Only what the pipeline derived is
+# stored; the input fields (From, To, Subject, body) always come from the
+# current upload, so editing a Subject never brings back the old one.
+# `version` is pipeline.pipeline_version(mode) (code version, mode, prompt,
+# model, scoring config), so a rules-only or local-model result is never
+# reused by an LLM run, and a new prompt or cleaning stage re-processes
+# every body instead of resuming results it would no longer produce.
+
+_COLUMNS = list(EmailOutput.model_fields)
+INPUT_FIELDS = ("unique_id", "from_email", "to_email", "subject", "email_body")
+STORED_COLUMNS = [c for c in _COLUMNS if c not in INPUT_FIELDS]
+_SQL_TYPES = {int: "INTEGER", float: "REAL", bool: "INTEGER", Optional[int]: "INTEGER"}
+
+
+def body_hash(body: str) -> str:
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def body_hashes(bodies: List[str]) -> List[str]:
+    return [body_hash(b) for b in bodies]
+
+
+def _version_key(version: str) -> str:
+    # pipeline_version() strings are long; rows store a fixed-size digest
+    return hashlib.blake2b(version.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class CheckpointStore:
+    """
+    SQLite-backed store of finished result rows (EmailOutput columns).
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(
+            f"{name} {_SQL_TYPES.get(EmailOutput.model_fields[name].annotation, 'TEXT')}"
+            for name in STORED_COLUMNS
+        )
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS records (version TEXT NOT NULL, unique_id INTEGER NOT NULL, "
+            f"body_hash TEXT NOT NULL, {columns}, PRIMARY KEY (version, unique_id, body_hash))"
+        )
+        self._conn.commit()
+
+    def fetch(self, unique_ids: List[int], hashes: List[str], version: str,
+              retry_rule_fallbacks: bool = True) -> pd.DataFrame:
+        """
+        Stored results (STORED_COLUMNS) of the given (id, hash) pairs under
+        `version`, indexed by position in the input lists. Rows that only got
+        the rule fallback are left out when retry_rule_fallbacks is set, so a
+        failed LLM call is retried.
+        """
+        wanted = {(int(uid), h): pos for pos, (uid, h) in enumerate(zip(unique_ids, hashes))}
+        if not wanted:
+            return pd.DataFrame(columns=STORED_COLUMNS)
+
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (unique_id INTEGER, body_hash TEXT)")
+            self._conn.execute("DELETE FROM wanted")
+            self._conn.executemany("INSERT INTO wanted VALUES (?, ?)", list(wanted))
+            query = (
+                f"SELECT r.unique_id, r.body_hash, r.{', r.'.join(STORED_COLUMNS)} FROM records r "
+                f"JOIN wanted w ON r.unique_id = w.unique_id AND r.body_hash = w.body_hash "
+                f"WHERE r.version = ?"
+            )
+            if retry_rule_fallbacks:
+                query += " AND r.source != 'rules'"
+            rows = self._conn.execute(query, (_version_key(version),)).fetchall()
+
+        stored = pd.DataFrame(rows, columns=["unique_id", "body_hash"] + STORED_COLUMNS)
+        stored.index = [wanted[(int(u), h)] for u, h in zip(stored["unique_id"], stored["body_hash"])]
+        stored = stored.drop(columns=["unique_id", "body_hash"]).sort_index()
+        stored["llm_success"] = stored["llm_success"].astype(bool)
+        stored["inherited_from"] = pd.array(
+            [None if pd.isna(v) else int(v) for v in stored["inherited_from"]], dtype=object
+        )
+        return stored
+
+    def save(self, frame: pd.DataFrame, hashes: List[str], version: str) -> None:
+        """
+        Upsert the results of finished rows (EmailOutput columns) with their
+        body hashes under `version`.
+        """
+        if frame.empty:
+            return
+        values = frame[STORED_COLUMNS].astype(object).where(frame[STORED_COLUMNS].notna(), None)
+        key = _version_key(version)
+        rows = [(key, int(uid), h) + tuple(r) for uid, h, r in
+                zip(frame["unique_id"], hashes, values.itertuples(index=False, name=None))]
+        placeholders = ", ".join("?" * (len(STORED_COLUMNS) + 3))
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO records (version, unique_id, body_hash, {', '.join(STORED_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CheckpointWriter:
+    """
+    Buffers finished records and flushes them to a CheckpointStore in
+    batches, so a crash loses at most `flush_every` records and the result
+    frame is assembled once per batch rather than once per cluster.
+
+    Args:
+        store: Target store (None disables checkpointing)
+        build: Callable(positions, results, inherited_ids) -> (frame, hashes)
+        version: Key the rows are stored under (see CheckpointStore.fetch)
+        flush_every: Records buffered before a write
+        on_flush: Optional callback(frame) with every assembled batch, e.g.
+                  to show partial results while the run continues
+        flush_seconds: Also flush when the oldest buffered record has waited
+                       this long (None = count-based only)
+    """
+
+    def __init__(self, store: Optional[CheckpointStore], build: Callable, version: str = "",
+                 flush_every: int = 500, on_flush: Optional[Callable[[pd.DataFrame], None]] = None,
+                 flush_seconds: Optional[float] = None):
+        self.store = store
+        self.build = build
+        self.version = version
+        self.flush_every = flush_every
+        self.on_flush = on_flush
+        self.flush_seconds = flush_seconds
+        self._since = 0.0
+        self._positions: list = []
+        self._results: list = []
+        self._inherited: list = []
+
+    @property
+    def active(self) -> bool:
+        return self.store is not None or self.on_flush is not None
+
+    def add(self, positions: list, results: list, inherited_ids: list) -> None:
+        if not self.active:
+            return
+        if not self._positions:
+            self._since = time.monotonic()
+        self._positions.extend(positions)
+        self._results.extend(results)
+        self._inherited.extend(inherited_ids)
+        if len(self._positions) >= self.flush_every or (
+                self.flush_seconds is not None and time.monotonic() - self._since >= self.flush_seconds):
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.active or not self._positions:
+            return
+        frame, hashes = self.build(self._positions, self._results, self._inherited)
+        if self.store is not None:
+            self.store.save(frame, hashes, self.version)
+        if self.on_flush is not None:
+            self.on_flush(frame)
+        self._positions, self._results, self._inherited = [], [], []
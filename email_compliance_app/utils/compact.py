@@ -0,0 +1,190 @@
+# email_compliance_app\utils\compact.py
+
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# COMPACT SESSION LAYOUT FOR RESULT FRAMES
+# --------------------------------------------------
+# Every browser session holds its own processed_df, so its per-row cost
+# decides how many analysts a server can carry. compact_results():
+#   - low-cardinality text (category, priority, source, senders, ...) -> category
+#   - integer columns -> smallest integer type that fits
+#   - remaining text -> Arrow-backed strings
+#   - raw bodies (email_body, junk_removed) -> a BodyStore of zlib-compressed
+#     blocks, optionally spilled to disk, decompressed only for the rows the
+#     review pane / search / export actually show
+
+OFFLOAD_COLUMNS = ("email_body", "junk_removed")
+CATEGORY_MAX_RATIO = 0.5   # use category when unique values <= this share of rows
+
+
+class BodyStore:
+    """
+    Texts compressed in blocks of `block_size` rows.
+
+    Args:
+        texts: One text per row position
+        block_size: Rows per compressed block (larger = better ratio,
+                    more work to fetch a single row)
+        path: If set, compressed blocks are written to this file and only
+              their offsets are kept in memory
+    """
+
+    def __init__(self, texts: Sequence[str], block_size: int = 64, level: int = 6, path: Optional[str] = None):
+        self.block_size = block_size
+        self.path = path
+        self._lengths = np.empty(len(texts), dtype=np.uint32)
+        blocks: List[bytes] = []
+        for start in range(0, len(texts), block_size):
+            encoded = [str(t).encode("utf-8") for t in texts[start:start + block_size]]
+            self._lengths[start:start + len(encoded)] = [len(e) for e in encoded]
+            blocks.append(zlib.compress(b"".join(encoded), level))
+
+        self._blocks: Optional[List[bytes]] = None
+        self._offsets = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+            with open(path, "wb") as f:
+                for i, block in enumerate(blocks):
+                    f.write(block)
+                    self._offsets[i + 1] = self._offsets[i] + len(block)
+        else:
+            self._blocks = blocks
+        self._last: Tuple[int, Optional[List[str]]] = (-1, None)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held in memory (compressed blocks + row lengths).
+        """
+        held = self._lengths.nbytes
+        if self._blocks is not None:
+            held += sum(len(b) for b in self._blocks)
+        else:
+            held += self._offsets.nbytes
+        return held
+
+    def _block(self, b: int) -> List[str]:
+        if self._last[0] == b:
+            return self._last[1]
+        if self._blocks is not None:
+            raw = zlib.decompress(self._blocks[b])
+        else:
+            with open(self.path, "rb") as f:
+                f.seek(self._offsets[b])
+                raw = zlib.decompress(f.read(self._offsets[b + 1] - self._offsets[b]))
+        start = b * self.block_size
+        ends = np.cumsum(self._lengths[start:start + self.block_size], dtype=np.int64)
+        texts = [raw[s:e].decode("utf-8") for s, e in zip(np.concatenate(([0], ends[:-1])), ends)]
+        self._last = (b, texts)
+        return texts
+
+    def get(self, position: int) -> str:
+        return self._block(position // self.block_size)[position % self.block_size]
+
+    def take(self, positions: Iterable[int]) -> List[str]:
+        """
+        Texts at the given positions, decompressing each needed block once.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        out: List[str] = [""] * len(positions)
+        blocks = positions // self.block_size
+        # Visit rows block by block; _block() keeps the last block decoded
+        for i in np.argsort(blocks, kind="stable"):
+            out[i] = self._block(int(blocks[i]))[positions[i] % self.block_size]
+        return out
+
+    def longer_than(self, positions: Iterable[int], limit: int) -> bool:
+        """
+        True if any text at `positions` has more than `limit` characters.
+        Only rows over `limit` UTF-8 bytes (a character is at least one) are
+        decompressed.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        candidates = positions[self._lengths[positions] > limit]
+        return any(len(text) > limit for text in self.take(candidates))
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == object or pd.api.types.is_string_dtype(series)
+
+
+def _arrow_string_dtype():
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype("pyarrow")
+    except ImportError:
+        return object
+
+
+def compact_results(df: pd.DataFrame, offload: Sequence[str] = OFFLOAD_COLUMNS,
+                    spill_dir: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, BodyStore]]:
+    """
+    Compact copy of a results frame plus the stores of its offloaded text
+    columns (which are dropped from the frame; see take_rows()).
+    """
+    stores = {}
+    for column in offload:
+        if column in df.columns:
+            path = os.path.join(spill_dir, f"{column}.bin") if spill_dir else None
+            stores[column] = BodyStore(df[column].astype(str).tolist(), path=path)
+
+    columns = {}
+    for column in df.columns:
+        if column in stores:
+            continue
+        series = df[column]
+        if column == "inherited_from":
+            values = pd.to_numeric(series, errors="coerce")
+            fits_32 = values.dropna().abs().max() < 2 ** 31 if values.notna().any() else True
+            columns[column] = values.astype("Int32" if fits_32 else "Int64")
+        elif pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            columns[column] = pd.to_numeric(series, downcast="integer")
+        elif _is_text(series):
+            if len(series) and series.nunique(dropna=False) <= CATEGORY_MAX_RATIO * len(series):
+                columns[column] = series.astype("category")
+            else:
+                columns[column] = series.astype(_arrow_string_dtype())
+        else:
+            columns[column] = series
+    return pd.DataFrame(columns, index=df.index), stores
+
+
+def take_rows(frame: pd.DataFrame, positions: np.ndarray, stores: Dict[str, BodyStore],
+              columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Rows at `positions` with offloaded columns filled back in from their
+    stores. `columns` selects (and orders) the output columns.
+    """
+    columns = list(columns) if columns is not None else list(frame.columns) + [c for c in stores if c not in frame]
+    present = [c for c in columns if c in frame.columns]
+    rows = frame.iloc[positions, [frame.columns.get_loc(c) for c in present]]
+    restored = {c: stores[c].take(positions) for c in columns if c in stores and c not in frame.columns}
+    if restored:
+        rows = rows.assign(**restored)
+    return rows[columns]
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame,
+                  stores: Optional[Dict[str, BodyStore]] = None) -> dict:
+    """
+    In-memory bytes per row of a frame before and after compact_results().
+    """
+    n = max(len(before), 1)
+    before_bytes = int(before.memory_usage(deep=True).sum())
+    after_bytes = int(after.memory_usage(deep=True).sum()) + sum(s.nbytes for s in (stores or {}).values())
+    return {
+        "rows": len(before),
+        "before_bytes_per_row": before_bytes / n,
+        "after_bytes_per_row": after_bytes / n,
+        "ratio": before_bytes / max(after_bytes, 1),
+    }
@@ -1,9 +1,257 @@
 # email_compliance_app\utils\excel_io.py
 
+import os
+import re
+import tempfile
+import zipfile
+from typing import Iterator, List, Optional, Sequence
+
 import pandas as pd
 
-def read_excel(path):
-    return pd.read_excel(path)
+# --------------------------------------------------
+# EXCEL LIMITS
+# --------------------------------------------------
+EXCEL_MAX_ROWS = 1_048_576          # per sheet, including the header row
+EXCEL_MAX_CELL_CHARS = 32_767
+REF_COLUMN = "Full Text Ref"
+TRUNCATION_MARK = " …[truncated — full text in bundle, see Full Text Ref]"
+
+# Control characters openpyxl refuses to write
+_ILLEGAL_CHARS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+
+# --------------------------------------------------
+# STREAMING INPUT
+# --------------------------------------------------
+# Only the columns the pipeline reads are kept, and rows are handed over in
+# fixed-size chunks as they are parsed (openpyxl read-only mode / pandas CSV
+# chunks), so work can start before the whole file has been read.
+
+BODY_COLUMN = "Email Body (BEFORE Preprocessing – with Junk)"
+INPUT_COLUMNS = ("Unique ID", "From", "To", "Subject", BODY_COLUMN)
+INPUT_CHUNK_ROWS = 5_000
+
+
+def _is_csv(source) -> bool:
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    return str(name).lower().endswith(".csv")
+
+
+def iter_input_chunks(source, chunk_size: int = INPUT_CHUNK_ROWS,
+                      columns: Sequence[str] = INPUT_COLUMNS) -> Iterator[pd.DataFrame]:
+    """
+    Yield the input as DataFrames of at most `chunk_size` rows, projected to
+    `columns` (those present in the file) with missing values as "".
+
+    Args:
+        source: Path or file-like object (e.g. a Streamlit upload) of an
+                .xlsx workbook (first sheet) or a .csv file
+    """
+    if _is_csv(source):
+        for chunk in pd.read_csv(source, usecols=lambda c: c in columns, chunksize=chunk_size,
+                                 dtype=str, keep_default_na=False):
+            yield chunk
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        keep = [(i, name) for i, name in enumerate(header) if name in columns]
+        names = [name for _, name in keep]
+        batch = []
+        chunks = 0
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            batch.append([row[i] if i < len(row) else None for i, _ in keep])
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=names).fillna("")
+                batch = []
+                chunks += 1
+        # A sheet without data rows still yields one empty frame with its
+        # columns, as the CSV reader does
+        if batch or not chunks:
+            yield pd.DataFrame(batch, columns=names).fillna("")
+    finally:
+        workbook.close()
+
+
+def read_excel(path, columns: Sequence[str] = INPUT_COLUMNS):
+    return pd.concat(list(iter_input_chunks(path, columns=columns)), ignore_index=True)
+
 
 def write_excel(df, path):
     df.to_excel(path, index=False)
+
+
+# --------------------------------------------------
+# STREAMING EXPORT
+# --------------------------------------------------
+# openpyxl's write-only mode streams rows to disk instead of building the
+# whole workbook in memory. Rows beyond one sheet continue on a new sheet;
+# beyond `max_sheets_per_file` sheets a new workbook is started and all
+# parts are bundled in a zip. Cells longer than Excel's limit are truncated
+# and their full text is stored in the zip, referenced from REF_COLUMN.
+
+
+def _is_text(series: pd.Series) -> bool:
+    return (series.dtype == object or pd.api.types.is_string_dtype(series)
+            or isinstance(series.dtype, pd.CategoricalDtype))
+
+
+def _long_cell_mask(df: pd.DataFrame) -> pd.DataFrame:
+    text_columns = [c for c in df.columns if _is_text(df[c])]
+    return pd.DataFrame(
+        {c: df[c].astype(str).str.len().to_numpy() > EXCEL_MAX_CELL_CHARS for c in text_columns},
+        index=df.index,
+    )
+
+
+def needs_bundle(df: pd.DataFrame, max_rows_per_sheet: int = EXCEL_MAX_ROWS - 1,
+                 max_sheets_per_file: int = 4) -> bool:
+    """
+    True when the export cannot be a single .xlsx (too many rows for one
+    workbook, or cells over the Excel character limit) and will be a .zip.
+    """
+    if len(df) > max_rows_per_sheet * max_sheets_per_file:
+        return True
+    mask = _long_cell_mask(df)
+    return bool(mask.to_numpy().any()) if not mask.empty else False
+
+
+def _sanitize(chunk: pd.DataFrame, long_mask: pd.DataFrame, row_offset: int):
+    """
+    Clean one chunk for Excel. Returns (rows, {zip path: full text}).
+    """
+    chunk = chunk.copy()
+    offloaded = {}
+    refs = [[] for _ in range(len(chunk))]
+    for column in long_mask.columns:
+        hits = long_mask[column].to_numpy()
+        if not hits.any():
+            continue
+        values = chunk[column].astype(str).to_numpy(dtype=object)
+        for i in hits.nonzero()[0]:
+            ref = f"long_cells/row_{row_offset + i + 1:08d}_{re.sub(r'[^A-Za-z0-9]+', '_', str(column)).strip('_')}.txt"
+            offloaded[ref] = values[i]
+            refs[i].append(ref)
+            values[i] = values[i][:EXCEL_MAX_CELL_CHARS - len(TRUNCATION_MARK)] + TRUNCATION_MARK
+        chunk[column] = values
+
+    for column in long_mask.columns:
+        # Vectorised check; only the (rare) dirty cells are rewritten
+        dirty = chunk[column].astype(str).str.contains(_ILLEGAL_CHARS).to_numpy()
+        if dirty.any():
+            values = chunk[column].to_numpy(dtype=object)
+            values[dirty] = [_ILLEGAL_CHARS.sub("", str(v)) for v in values[dirty]]
+            chunk[column] = values
+
+    if REF_COLUMN in chunk.columns:
+        chunk[REF_COLUMN] = ["; ".join(r) for r in refs]
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    return chunk.itertuples(index=False, name=None), offloaded
+
+
+def export_results(df: pd.DataFrame, path: str, sheet_name: str = "Compliance Analysis",
+                   max_rows_per_sheet: int = EXCEL_MAX_ROWS - 1, max_sheets_per_file: int = 4,
+                   chunk_size: int = 5_000) -> str:
+    """
+    Stream a results frame to Excel with constant writer memory.
+
+    Args:
+        path: Target path; its extension is replaced by .zip when the data
+              has to be split across files or has over-long cells
+        max_rows_per_sheet: Data rows per sheet (Excel maximum by default)
+        max_sheets_per_file: Sheets per workbook before starting a new file
+
+    Returns:
+        Path of the file actually written (.xlsx or .zip)
+    """
+    from openpyxl import Workbook
+
+    long_mask = _long_cell_mask(df)
+    has_long = bool(long_mask.to_numpy().any()) if not long_mask.empty else False
+    if has_long:
+        df = df.assign(**{REF_COLUMN: ""})
+    header = [str(c) for c in df.columns]
+
+    rows_per_file = max_rows_per_sheet * max_sheets_per_file
+    bundle = has_long or len(df) > rows_per_file
+    base, _ = os.path.splitext(path)
+    out_path = base + (".zip" if bundle else ".xlsx")
+
+    work_dir = tempfile.mkdtemp(prefix="export_")
+    parts: List[str] = []
+    # Full texts go straight into the zip so they are never all held at once
+    bundle_zip = zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) if bundle else None
+
+    workbook: Optional[Workbook] = None
+    sheet = None
+    rows_in_sheet = sheets_in_file = 0
+
+    def _save_file():
+        part_path = os.path.join(work_dir, f"{os.path.basename(base)}_part{len(parts) + 1}.xlsx")
+        workbook.save(part_path)
+        parts.append(part_path)
+
+    def _new_file():
+        nonlocal workbook, sheets_in_file
+        if workbook is not None:
+            _save_file()
+        workbook = Workbook(write_only=True)
+        sheets_in_file = 0
+
+    def _new_sheet():
+        nonlocal sheet, rows_in_sheet, sheets_in_file
+        sheets_in_file += 1
+        title = sheet_name if sheets_in_file == 1 else f"{sheet_name} ({sheets_in_file})"
+        sheet = workbook.create_sheet(title[:31])
+        sheet.append(header)
+        rows_in_sheet = 0
+
+    try:
+        _new_file()
+        _new_sheet()
+        for start in range(0, len(df), chunk_size):
+            rows, offloaded = _sanitize(
+                df.iloc[start:start + chunk_size], long_mask.iloc[start:start + chunk_size], start
+            )
+            for ref, text in offloaded.items():
+                bundle_zip.writestr(ref, text)
+            for row in rows:
+                if rows_in_sheet >= max_rows_per_sheet:
+                    if sheets_in_file >= max_sheets_per_file:
+                        _new_file()
+                    _new_sheet()
+                sheet.append(row)
+                rows_in_sheet += 1
+        _save_file()
+
+        if bundle_zip is None:
+            os.replace(parts[0], out_path)
+        else:
+            for part in parts:
+                arcname = os.path.basename(part) if len(parts) > 1 else os.path.basename(base) + ".xlsx"
+                bundle_zip.write(part, arcname=arcname)
+        return out_path
+    finally:
+        if bundle_zip is not None:
+            bundle_zip.close()
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+        os.rmdir(work_dir)
+
+
+def export_bytes(df: pd.DataFrame, file_name: str, **kwargs) -> bytes:
+    """
+    export_results() into a temporary directory, returned as bytes - used as
+    a deferred download so the workbook is only built when requested.
+    """
+    with tempfile.TemporaryDirectory(prefix="export_") as tmp:
+        written = export_results(df, os.path.join(tmp, file_name), **kwargs)
+        with open(written, "rb") as f:
+            return f.read()
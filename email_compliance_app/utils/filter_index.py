@@ -0,0 +1,140 @@
+# email_compliance_app\utils\filter_index.py
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import score_histogram
+
+# --------------------------------------------------
+# INDEXED FILTERS FOR THE DASHBOARD
+# --------------------------------------------------
+# Built once per result frame: category, priority and score bucket become
+# integer codes, and the row positions of every category / priority are
+# precomputed. A sidebar filter is then answered by concatenating a few
+# position lists (cost proportional to the rows selected) instead of
+# copying the frame and running isin over every row. The counts and score
+# histogram of a selection are bincounts of its codes, in the shape of the
+# run aggregates' snapshot; they, and anything built from them (figures),
+# are memoised per filter key.
+
+FilterKey = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def _grouped_positions(codes: np.ndarray, n_groups: int) -> list:
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(n_groups + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_groups)]
+
+
+class FilterIndex:
+    """
+    Category / priority index over a results frame.
+
+    Args:
+        df: Results frame (EmailOutput columns); kept by reference, not copied
+        max_cached: Filter keys whose results are memoised (LRU)
+    """
+
+    def __init__(self, df: pd.DataFrame, max_cached: int = 32):
+        self.source = df
+        self.n_rows = len(df)
+        self.max_cached = max_cached
+        self._memo: "OrderedDict[Tuple[FilterKey, str], object]" = OrderedDict()
+
+        categories = pd.Categorical(df["category"].fillna("").astype(str))
+        priorities = pd.Categorical(df["priority"].fillna("").astype(str))
+        self.categories = list(categories.categories)
+        self.priorities = list(priorities.categories)
+        self.category_codes = categories.codes
+        self.priority_codes = priorities.codes
+        self.category_rows: Dict[str, np.ndarray] = dict(
+            zip(self.categories, _grouped_positions(self.category_codes, len(self.categories)))
+        )
+        self.priority_rows: Dict[str, np.ndarray] = dict(
+            zip(self.priorities, _grouped_positions(self.priority_codes, len(self.priorities)))
+        )
+        # Bucket of the run aggregates' score histogram per row (-1 = no score)
+        bounds = score_histogram().bounds
+        scores = pd.to_numeric(df["score"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan) \
+            if "score" in df.columns else np.full(self.n_rows, np.nan)
+        buckets = np.clip(np.searchsorted(bounds, scores, side="right") - 1, 0, len(bounds) - 2)
+        self.score_buckets = np.where(np.isnan(scores), -1, buckets).astype(np.int16)
+
+    def is_for(self, df: pd.DataFrame) -> bool:
+        return self.source is df
+
+    @staticmethod
+    def key(categories: Iterable[str], priorities: Iterable[str]) -> FilterKey:
+        return tuple(sorted(categories)), tuple(sorted(priorities))
+
+    def memo(self, key: FilterKey, name: str, build: Callable[[], object]):
+        """
+        Value of build() for this filter key, computed at most once while
+        the key stays among the `max_cached` most recently used.
+        """
+        slot = (key, name)
+        if slot in self._memo:
+            self._memo.move_to_end(slot)
+            return self._memo[slot]
+        value = build()
+        self._memo[slot] = value
+        while len(self._memo) > self.max_cached * 4:
+            self._memo.popitem(last=False)
+        return value
+
+    def positions(self, key: FilterKey) -> np.ndarray:
+        """
+        Sorted row positions matching the filter (empty selection = all).
+        """
+        return self.memo(key, "positions", lambda: self._positions(*key))
+
+    def _positions(self, categories: Tuple[str, ...], priorities: Tuple[str, ...]) -> np.ndarray:
+        if not categories and not priorities:
+            return np.arange(self.n_rows)
+        # Start from the smaller side's lists, check the other side by code
+        if categories and (not priorities or self._size(self.category_rows, categories)
+                           <= self._size(self.priority_rows, priorities)):
+            positions = self._union(self.category_rows, categories)
+            other_codes, other_names, other_values = self.priority_codes, self.priorities, priorities
+        else:
+            positions = self._union(self.priority_rows, priorities)
+            other_codes, other_names, other_values = self.category_codes, self.categories, categories
+        if other_values:
+            allowed = np.zeros(len(other_names), dtype=bool)
+            allowed[[other_names.index(v) for v in other_values if v in other_names]] = True
+            positions = positions[allowed[other_codes[positions]]]
+        return positions
+
+    @staticmethod
+    def _size(rows: Dict[str, np.ndarray], names: Tuple[str, ...]) -> int:
+        return sum(len(rows[n]) for n in names if n in rows)
+
+    @staticmethod
+    def _union(rows: Dict[str, np.ndarray], names: Tuple[str, ...]) -> np.ndarray:
+        parts = [rows[n] for n in names if n in rows]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+
+    def summary(self, key: FilterKey, score_bin: float = 5.0) -> dict:
+        """
+        emails, priority_counts, category_counts and score histogram of the
+        filter, with the same keys and layout as RunningAggregates.snapshot().
+        """
+        return self.memo(key, "selection", lambda: self._summary(self.positions(key), score_bin))
+
+    def _summary(self, positions: np.ndarray, score_bin: float) -> dict:
+        full = len(positions) == self.n_rows
+        out = {"emails": int(len(positions))}
+        for name, labels, codes in (("category_counts", self.categories, self.category_codes),
+                                    ("priority_counts", self.priorities, self.priority_codes)):
+            counts = np.bincount(codes if full else codes[positions], minlength=len(labels))
+            out[name] = {label: int(c) for label, c in zip(labels, counts) if c}
+        buckets = self.score_buckets if full else self.score_buckets[positions]
+        histogram = score_histogram()
+        histogram.counts = np.bincount(buckets[buckets >= 0], minlength=len(histogram.counts)).astype(np.int64)
+        out["score"] = {"histogram": {str(k): int(v) for k, v in histogram.rebinned(score_bin).items()}}
+        return out
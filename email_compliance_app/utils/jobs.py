@@ -0,0 +1,472 @@
+# email_compliance_app\utils\jobs.py
+"""
+Local job queue for uploads: a SQLite job table plus worker processes.
+
+    python -m utils.jobs --workers 2      # run workers without the app
+    python -m utils.jobs --run <job_id>   # worker process for one job
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_JOBS_PATH = os.getenv("JOBS_PATH", os.path.join(APP_DIR, "artifacts", "jobs.sqlite"))
+DEFAULT_MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+# A queued upload pauses a running job when its risk (share of likely
+# Critical rows) is higher by at least this much
+PREEMPT_JOBS = os.getenv("PREEMPT_JOBS", "1") == "1"
+PREEMPT_RISK_MARGIN = float(os.getenv("PREEMPT_RISK_MARGIN", "0.05"))
+
+# --------------------------------------------------
+# JOB QUEUE
+# --------------------------------------------------
+# Each upload becomes a row in a SQLite job table. A JobRunner (one per
+# server, started by the app) claims queued jobs and runs each in its own
+# worker process, at most `max_concurrent` at a time. Workers write progress
+# and the running aggregates back to the row; pages only poll it, so a job
+# keeps going when the tab that submitted it is closed. Cancelling
+# terminates the worker; finished emails are already checkpointed, so a
+# retried or requeued job resumes instead of starting over.
+#
+# The queue is risk-first (utils/scheduler.py): a background scan scores
+# every upload by its share of likely-Critical rows, queued jobs start in
+# risk order (then oldest first), and when every worker is busy a clearly
+# riskier upload pauses the least risky running job. The paused job goes
+# back to the queue and later resumes from its checkpoint.
+
+ACTIVE_STATES = ("queued", "running")
+FINAL_STATES = ("done", "failed", "cancelled")
+PROGRESS_EVERY_SECONDS = 0.5
+
+_COLUMNS = (
+    "job_id", "upload_key", "file_name", "input_path", "mode", "llm_concurrency", "status",
+    "created_at", "started_at", "finished_at", "pid", "stage", "stage_done", "stage_total",
+    "chunk", "live", "error", "cancel_requested", "risk", "preempted",
+)
+# Riskiest first; unscored jobs count as risk 0 until their scan finishes
+_QUEUE_ORDER = "COALESCE(risk, 0) DESC, created_at"
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite job table shared by the app and the worker processes.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOBS_PATH):
+        self.path = path
+        self.input_dir = os.path.join(os.path.dirname(path) or ".", "job_inputs")
+        os.makedirs(self.input_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, upload_key TEXT NOT NULL, file_name TEXT, input_path TEXT, "
+            "mode TEXT, llm_concurrency INTEGER, status TEXT NOT NULL, created_at REAL, started_at REAL, "
+            "finished_at REAL, pid INTEGER, stage TEXT, stage_done INTEGER DEFAULT 0, "
+            "stage_total INTEGER DEFAULT 0, chunk INTEGER DEFAULT 1, live TEXT, error TEXT, "
+            "cancel_requested INTEGER DEFAULT 0, risk REAL, preempted INTEGER DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_upload ON jobs (upload_key, status)")
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def submit(self, data: bytes, upload_key: str, file_name: str, mode: str,
+               llm_concurrency: int = 8) -> Tuple[str, bool]:
+        """
+        Queue an upload. An active job for the same content is reused.
+
+        Returns:
+            (job_id, created) - created is False when an existing job was reused
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE upload_key = ? AND status IN ('queued', 'running') "
+                "ORDER BY created_at LIMIT 1", (upload_key,)
+            ).fetchone()
+            if row:
+                return row[0], False
+            job_id = uuid.uuid4().hex[:12]
+            suffix = ".csv" if file_name.lower().endswith(".csv") else ".xlsx"
+            input_path = os.path.join(self.input_dir, job_id + suffix)
+            with open(input_path, "wb") as f:
+                f.write(data)
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, upload_key, file_name, input_path, mode, llm_concurrency, status, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, upload_key, file_name, input_path, mode, llm_concurrency, time.time()),
+            )
+            self._conn.commit()
+            return job_id, True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?",
+                                     (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["live"] = json.loads(job["live"]) if job["live"] else None
+        return job
+
+    def queue_position(self, job_id: str) -> int:
+        """
+        Queued jobs ahead of this one (0 = next to start).
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs AS other, jobs AS this WHERE this.job_id = ? "
+                "AND other.status = 'queued' AND (COALESCE(other.risk, 0) > COALESCE(this.risk, 0) OR "
+                "(COALESCE(other.risk, 0) = COALESCE(this.risk, 0) AND other.created_at < this.created_at))",
+                (job_id,)
+            ).fetchone()[0]
+
+    def next_queued(self) -> Optional[dict]:
+        """
+        The job claim_next would start, without claiming it.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY {_QUEUE_ORDER} LIMIT 1"
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def claim_next(self) -> Optional[dict]:
+        """
+        Atomically move the riskiest (then oldest) queued job to running.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                f"SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY {_QUEUE_ORDER} LIMIT 1"
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, cancel_requested = 0, preempted = 0 "
+                    "WHERE job_id = ?",
+                    (time.time(), row[0]),
+                )
+            self._conn.commit()
+        return self.get(row[0]) if row else None
+
+    def set_pid(self, job_id: str, pid: int) -> None:
+        self._execute("UPDATE jobs SET pid = ? WHERE job_id = ?", (pid, job_id))
+
+    def set_risk(self, job_id: str, risk: float) -> None:
+        self._execute("UPDATE jobs SET risk = ? WHERE job_id = ?", (risk, job_id))
+
+    def unscored(self) -> List[dict]:
+        """
+        Active jobs whose risk has not been estimated yet, queued ones first.
+        """
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN ('queued', 'running') AND risk IS NULL "
+                "ORDER BY status = 'running', created_at"
+            )]
+        return [self.get(i) for i in ids]
+
+    def preempt(self, job_id: str) -> None:
+        """
+        Put a running job (whose worker was stopped) back in the queue,
+        keeping its place among jobs of the same risk.
+        """
+        self._execute(
+            "UPDATE jobs SET status = 'queued', pid = NULL, preempted = 1, stage = NULL WHERE job_id = ? "
+            "AND status = 'running'", (job_id,)
+        )
+
+    def update_progress(self, job_id: str, stage: Optional[str], done: int, total: int, chunk: int,
+                        live: Optional[dict] = None) -> None:
+        self._execute(
+            "UPDATE jobs SET stage = ?, stage_done = ?, stage_total = ?, chunk = ?, live = ? WHERE job_id = ?",
+            (stage, done, total, chunk, json.dumps(live) if live is not None else None, job_id),
+        )
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        """
+        Move a job to a final state (only if it has not reached one yet).
+        """
+        if status not in FINAL_STATES:
+            raise ValueError(f"status must be one of {FINAL_STATES}, got {status!r}")
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ? "
+            "AND status IN ('queued', 'running')",
+            (status, error, time.time(), job_id),
+        )
+
+    def request_cancel(self, job_id: str) -> None:
+        # Queued jobs are cancelled directly; running ones by their runner
+        self._execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                      (time.time(), job_id))
+        self._execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+
+    def retry(self, job_id: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = 'queued', created_at = ?, started_at = NULL, finished_at = NULL, pid = NULL, "
+            "error = NULL, cancel_requested = 0, preempted = 0, stage = NULL, stage_done = 0, stage_total = 0, "
+            "live = NULL "
+            "WHERE job_id = ? AND status IN ('failed', 'cancelled')",
+            (time.time(), job_id),
+        )
+
+    def running(self) -> List[dict]:
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute("SELECT job_id FROM jobs WHERE status = 'running'")]
+        return [self.get(i) for i in ids]
+
+    def requeue_orphans(self) -> int:
+        """
+        Running jobs whose worker process no longer exists (e.g. the server
+        was restarted) go back to the queue; checkpoints make the rerun cheap.
+        """
+        orphans = [j["job_id"] for j in self.running() if not _pid_alive(j["pid"])]
+        for job_id in orphans:
+            self._execute("UPDATE jobs SET status = 'queued', pid = NULL WHERE job_id = ? AND status = 'running'",
+                          (job_id,))
+        return len(orphans)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# --------------------------------------------------
+# WORKER PROCESS
+# --------------------------------------------------
+def run_job(jobs_path: str, job_id: str) -> None:
+    """
+    Entry point of a worker process: run one claimed job to completion.
+    """
+    from llm.local_classifier import load_local_classifier
+    from pipeline import run_pipeline_chunks
+    from utils.aggregates import RunningAggregates
+    from utils.checkpoint import CheckpointStore
+    from utils.excel_io import iter_input_chunks
+    from utils.people import PeopleIndex
+    from utils.result_cache import ResultCache
+    from utils.search_index import SearchIndex
+    from utils.warehouse import Warehouse
+
+    store = JobStore(jobs_path)
+    job = store.get(job_id)
+    aggregates = RunningAggregates()
+    people = PeopleIndex()
+    state = {"stage": None, "done": 0, "total": 0, "chunk": 1, "written": 0.0}
+
+    def _report(force: bool = False) -> None:
+        now = time.monotonic()
+        if force or now - state["written"] >= PROGRESS_EVERY_SECONDS:
+            state["written"] = now
+            live = aggregates.snapshot()
+            live["people"] = people.top(10).to_dict("records")
+            store.update_progress(job_id, state["stage"], state["done"], state["total"], state["chunk"], live)
+
+    def _on_progress(stage, done, total):
+        state.update(stage=stage, done=done, total=total)
+        _report()
+
+    def _on_rows(rows):
+        # The pipeline has already added these rows to `aggregates`
+        people.update(rows, row_ids=rows["unique_id"])
+        _report()
+
+    def _on_chunk(number, chunk_df, chunk_stats):
+        state["chunk"] = number + 1
+
+    try:
+        # Rules over the whole upload first, so its likely-Critical emails
+        # reach the LLM (and the live view) first
+        frame, stats = run_pipeline_chunks(
+            iter_input_chunks(job["input_path"]),
+            risk_first=True,
+            on_chunk=_on_chunk,
+            on_rows=_on_rows,
+            aggregates=aggregates,
+            on_progress=_on_progress,
+            mode=job["mode"],
+            llm_concurrency=job["llm_concurrency"],
+            local_model=load_local_classifier() if job["mode"] == "tiered" else None,
+            checkpoint=CheckpointStore(),
+        )
+        result_cache = ResultCache(max_entries=0)
+        result_cache.put(job["upload_key"], frame, stats)
+        index_path = result_cache.artifact_path(job["upload_key"], "search")
+        if index_path:
+            SearchIndex.build(frame).save(index_path)
+        warehouse = Warehouse()
+        warehouse.append_run(job_id, frame, upload_key=job["upload_key"], file_name=job["file_name"],
+                             mode=job["mode"])
+        warehouse.close()
+        _report(force=True)
+        store.finish(job_id, "done")
+        if os.path.exists(job["input_path"]):
+            os.remove(job["input_path"])
+    except BaseException as exc:
+        store.finish(job_id, "failed", f"{type(exc).__name__}: {exc}")
+        raise
+
+
+class JobRunner:
+    """
+    Claims queued jobs and runs each in a worker process, at most
+    `max_concurrent` at once. Also enforces cancellation, notices workers
+    that died, scores uploads by risk and pauses a running job for a
+    clearly riskier one.
+    """
+
+    def __init__(self, store: JobStore, max_concurrent: int = DEFAULT_MAX_CONCURRENT_JOBS,
+                 poll_seconds: float = 0.5, preempt: bool = PREEMPT_JOBS,
+                 preempt_margin: float = PREEMPT_RISK_MARGIN):
+        self.store = store
+        self.max_concurrent = max(1, max_concurrent)
+        self.poll_seconds = poll_seconds
+        self.preempt = preempt
+        self.preempt_margin = preempt_margin
+        self._workers: Dict[str, subprocess.Popen] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._scorer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> "JobRunner":
+        if self._thread is None:
+            self.store.requeue_orphans()
+            self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+            self._thread.start()
+            # Reading a large workbook takes a while: scoring must not hold up claiming
+            self._scorer = threading.Thread(target=self._score_loop, name="job-scorer", daemon=True)
+            self._scorer.start()
+        return self
+
+    def stop(self, terminate: bool = False) -> None:
+        self._stop.set()
+        for thread in (self._thread, self._scorer):
+            if thread is not None:
+                thread.join()
+        for process in self._workers.values():
+            if terminate:
+                process.terminate()
+            process.wait()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.poll_seconds)
+
+    def _score_loop(self) -> None:
+        while not self._stop.is_set():
+            self.score_pending()
+            self._stop.wait(self.poll_seconds)
+
+    def score_pending(self) -> int:
+        """
+        Estimate the risk of every active job that has none yet.
+        """
+        from utils.excel_io import iter_input_chunks
+        from utils.scheduler import upload_risk
+
+        jobs = self.store.unscored()
+        for job in jobs:
+            try:
+                risk = upload_risk(iter_input_chunks(job["input_path"]))
+            except Exception:
+                # Unreadable (or already finished and removed): the worker reports real errors
+                risk = 0.0
+            self.store.set_risk(job["job_id"], risk)
+        return len(jobs)
+
+    def _preempt_for(self, waiting: dict) -> bool:
+        # The least risky running job, the most recently started among equals
+        running = [j for j in self.store.running() if j["job_id"] in self._workers]
+        if not running:
+            return False
+        victim = min(running, key=lambda j: (j["risk"] or 0.0, -(j["started_at"] or 0.0)))
+        if (waiting["risk"] or 0.0) < (victim["risk"] or 0.0) + self.preempt_margin:
+            return False
+        process = self._workers.pop(victim["job_id"])
+        process.terminate()
+        process.wait()
+        self.store.preempt(victim["job_id"])
+        return True
+
+    def tick(self) -> None:
+        for job in self.store.running():
+            process = self._workers.get(job["job_id"])
+            if process is None:
+                continue
+            if job["cancel_requested"] and process.poll() is None:
+                process.terminate()
+                process.wait()
+                self.store.finish(job["job_id"], "cancelled")
+        for job_id, process in list(self._workers.items()):
+            if process.poll() is not None:
+                # A worker that exits without recording a final state crashed
+                self.store.finish(job_id, "failed", f"worker exited with code {process.returncode}")
+                del self._workers[job_id]
+        if self.preempt and len(self._workers) >= self.max_concurrent:
+            waiting = self.store.next_queued()
+            if waiting is not None:
+                self._preempt_for(waiting)
+        while len(self._workers) < self.max_concurrent:
+            job = self.store.claim_next()
+            if job is None:
+                break
+            # A fresh interpreter per job: nothing inherited from the server
+            # process, and the Streamlit script is never re-imported
+            process = subprocess.Popen(
+                [sys.executable, "-m", "utils.jobs", "--run", job["job_id"], "--jobs", self.store.path],
+                cwd=APP_DIR,
+            )
+            self._workers[job["job_id"]] = process
+            self.store.set_pid(job["job_id"], process.pid)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_CONCURRENT_JOBS, help="Concurrent jobs")
+    parser.add_argument("--jobs", default=DEFAULT_JOBS_PATH, help="SQLite job table")
+    parser.add_argument("--run", metavar="JOB_ID", help="Run one claimed job in this process and exit")
+    args = parser.parse_args(argv)
+
+    if args.run:
+        run_job(args.jobs, args.run)
+        return
+
+    runner = JobRunner(JobStore(args.jobs), max_concurrent=args.workers).start()
+    print(f"job runner: {args.workers} workers on {args.jobs} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        runner.stop(terminate=True)
+
+
+if __name__ == "__main__":
+    main()
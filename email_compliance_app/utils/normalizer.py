@@ -1,6 +1,11 @@
 # email_compliance_app\utils\normalizer.py
 
-from typing import Set
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
 
 # --------------------------------------------------
 # ALLOWED CATEGORIES (Exact matches required from LLM or rules)
@@ -26,58 +31,178 @@ ALLOWED_PRIORITIES: Set[str] = {
     "Low"
 }
 
+# --------------------------------------------------
+# ALIAS TABLES
+# --------------------------------------------------
+# LLMs (and exported files) spell labels many ways: "market manipulation",
+# "Secrecy/Market Manipulation", "Market Manipulation / Misconduct" (the
+# prompt's own severity table). A label is canonicalised by case folding,
+# splitting on separators (+ / & | , ; and), turning punctuation into
+# spaces and mapping each part through the aliases below; the set of parts
+# then names a single or combined category, in any order. Every value
+# seen is memoised, so a repeated label costs one dict probe. Values that
+# name no category are counted and logged, so falling back to a default
+# label is never silent.
+
+CATEGORY_ALIASES: Dict[str, List[str]] = {
+    "Secrecy": ["secret", "secretive", "secrecy concern", "confidential", "confidentiality"],
+    "Market Manipulation": ["manipulation", "misconduct", "market misconduct", "market manipulation misconduct",
+                            "market abuse", "price manipulation", "trading manipulation"],
+    "Market Bribery": ["bribery", "bribe", "bribes", "kickback", "kickbacks"],
+    "Change in Communication": ["change in communications", "change of communication", "communication change",
+                                "channel change", "off channel communication"],
+    "Complaints": ["complaint", "customer complaint", "customer complaints", "client complaint",
+                   "client complaints"],
+    # "General" is what the rules return when no keyword matches
+    "Employee Ethics": ["ethics", "employee ethic", "ethics violation", "policy violation", "general"],
+}
+
+PRIORITY_ALIASES: Dict[str, List[str]] = {
+    "Critical": ["crit", "severe"],
+    "High": ["hi"],
+    "Medium": ["med", "moderate"],
+    "Low": ["lo", "minor"],
+}
+
+# Memoised values per table; beyond this many distinct ones, new values are
+# still resolved but no longer stored
+MAX_MEMOISED_LABELS = 10_000
+
+_SEPARATOR = re.compile(r"\s*(?:[+/&|,;]|\band\b)\s*")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_MISSING = object()
+
+
+def _part_key(text: str) -> str:
+    return " ".join(_NON_ALNUM.sub(" ", text.casefold()).split())
+
+
+class _LabelTable:
+    """
+    Canonical label of any spelling, memoised per raw value.
+    """
+
+    def __init__(self, kind: str, allowed: Set[str], aliases: Dict[str, List[str]]):
+        self.kind = kind
+        self.parts: Dict[str, str] = {}
+        for label in allowed:
+            if "+" not in label:
+                self.parts[_part_key(label)] = label
+        for label, names in aliases.items():
+            for name in names:
+                self.parts[_part_key(name)] = label
+        self.combined: Dict[frozenset, str] = {
+            frozenset(p.strip() for p in label.split("+")): label for label in allowed
+        }
+        self.memo: Dict[str, Optional[str]] = {label: label for label in allowed}
+        self.unknown: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def resolve(self, value: str) -> Optional[str]:
+        parts = set()
+        for part in _SEPARATOR.split(value.casefold()):
+            key = _part_key(part)
+            if not key:
+                continue
+            label = self.parts.get(key)
+            if label is None:
+                return None
+            parts.add(label)
+        return self.combined.get(frozenset(parts)) if parts else None
+
+    def lookup(self, value) -> Optional[str]:
+        if not value:
+            return None
+        if not isinstance(value, str):
+            value = str(value)
+        label = self.memo.get(value, _MISSING)
+        if label is _MISSING:
+            label = self.resolve(value)
+            if len(self.memo) < MAX_MEMOISED_LABELS:
+                self.memo[value] = label
+            if label is None:
+                with self._lock:
+                    first = value not in self.unknown
+                    self.unknown[value] += 1
+                if first:
+                    print(f"unknown {self.kind} label: {value!r} (counted in unknown_labels())")
+            return label
+        if label is None:
+            with self._lock:
+                self.unknown[value] += 1
+        return label
+
+
+_CATEGORIES = _LabelTable("category", ALLOWED_CATEGORIES, CATEGORY_ALIASES)
+_PRIORITIES = _LabelTable("priority", ALLOWED_PRIORITIES, PRIORITY_ALIASES)
+
+
 # --------------------------------------------------
 # NORMALIZATION FUNCTIONS
 # --------------------------------------------------
-def normalize_category(category: str) -> str:
+def lookup_category(category: str) -> Optional[str]:
     """
-    Normalize the detected category.
-    - Strips whitespace
-    - Ensures exact match against ALLOWED_CATEGORIES
-    - Falls back to safest default: "Employee Ethics" (lowest risk)
+    Canonical category for any spelling ("market manipulation",
+    "Market Manipulation + Secrecy", ...), or None if it names none.
     """
-    if not category:
-        return "Employee Ethics"
+    return _CATEGORIES.lookup(category)
 
-    cleaned = category.strip()
 
-    if cleaned in ALLOWED_CATEGORIES:
-        return cleaned
+def normalize_category(category: str, default: str = "Employee Ethics") -> str:
+    """
+    Normalize the detected category.
+    - Case, punctuation, separators and combined-label order are ignored
+    - Known aliases map to their category (see CATEGORY_ALIASES)
+    - Anything else is counted as unknown and `default` is returned
+      (the safest label, "Employee Ethics", unless the caller has a better one)
+    """
+    return _CATEGORIES.lookup(category) or default
+
 
-    # Optional: Add fuzzy tolerance later if needed (e.g., case-insensitive)
-    # For now: strict match for safety and consistency
-    return "Employee Ethics"
+def lookup_priority(priority: str) -> Optional[str]:
+    return _PRIORITIES.lookup(priority)
 
 
-def normalize_priority(priority: str) -> str:
+def normalize_priority(priority: str, default: str = "Low") -> str:
     """
     Normalize the priority level.
-    - Strips whitespace
-    - Ensures exact match against allowed values
-    - Falls back to "Low" (safest)
+    - Case and punctuation are ignored, a few aliases are known
+    - Anything else is counted as unknown and `default` ("Low") is returned
     """
-    if not priority:
-        return "Low"
+    return _PRIORITIES.lookup(priority) or default
 
-    cleaned = priority.strip()
 
-    if cleaned in ALLOWED_PRIORITIES:
-        return cleaned
-
-    return "Low"
+def unknown_labels() -> Dict[str, Dict[str, int]]:
+    """
+    Values seen so far (in this process) that named no category / priority,
+    with how often each was seen.
+    """
+    return {table.kind: dict(table.unknown) for table in (_CATEGORIES, _PRIORITIES)}
 
 
 # --------------------------------------------------
 # OPTIONAL: Helper to validate multiple categories
 # --------------------------------------------------
-def normalize_categories(categories: list[str]) -> list[str]:
+def normalize_categories(categories: Iterable[str]) -> List[str]:
     """
     Normalize a list of categories (e.g., from LLM detecting multiple).
-    Returns only valid ones.
+    Returns the known ones, first occurrence order, without repeats.
     """
     if not categories:
         return []
+    found = (lookup_category(cat) for cat in categories)
+    return list(dict.fromkeys(c for c in found if c))
+
 
-    valid = [normalize_category(cat) for cat in categories if normalize_category(cat) != "Employee Ethics"]
-    # If all invalid, return empty or fallback
-    return valid if valid else []
\ No newline at end of file
+def normalize_category_column(values, default: Optional[str] = "Employee Ethics") -> pd.Series:
+    """
+    normalize_category over a whole column: each distinct value is looked up
+    once. default=None leaves unknown values as missing.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    labels = [lookup_category(v) for v in uniques]
+    if default is not None:
+        labels = [label or default for label in labels]
+    mapped = pd.Series(labels + [default], dtype=object).to_numpy()
+    return pd.Series(mapped[codes], index=values.index, dtype=object)
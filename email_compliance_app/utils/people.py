@@ -0,0 +1,259 @@
+# email_compliance_app\utils\people.py
+
+import re
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# PER-PERSON RISK ROLLUP
+# --------------------------------------------------
+# From / To are free text ("John Smith <john@bank.com>; jane@ext.com").
+# Each field is split into normalised addresses, every address is interned
+# to an integer id once, and a PeopleIndex keeps per id:
+#   - the row ids of the emails it sent / received
+#   - running stats: counts, Critical counts, max / summed score, category mix
+# update() takes one batch of finished rows at a time (O(batch)), so the
+# rollup follows a running analysis as well as a loaded result.
+
+ROLES = ("sent", "received")
+_ADDRESS = re.compile(r"[a-z0-9._%+'-]+@[a-z0-9-]+(?:\.[a-z0-9-]+)+")
+_SEPARATORS = re.compile(r"[;,\n]+")
+
+
+def split_addresses(field) -> List[str]:
+    """
+    Normalised addresses in a From / To field (lowercased, display names
+    and duplicates dropped). Entries without an address are kept as their
+    lowercased name, so "Compliance Team" is still one person.
+    """
+    if field is None or (isinstance(field, float) and np.isnan(field)):
+        return []
+    text = str(field).strip().lower()
+    found = _ADDRESS.findall(text)
+    if not found:
+        found = [part.strip().strip("\"'<> ") for part in _SEPARATORS.split(text)]
+    return list(dict.fromkeys(a.rstrip(".") for a in found if a))
+
+
+class AddressBook:
+    """
+    Interns normalised addresses to dense integer ids.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.addresses: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def intern(self, address: str) -> int:
+        address_id = self.ids.get(address)
+        if address_id is None:
+            address_id = self.ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return address_id
+
+    def lookup(self, address: str) -> Optional[int]:
+        """
+        Id of an address as typed by a user (normalised first), or None.
+        """
+        found = split_addresses(address)
+        return self.ids.get(found[0]) if found else None
+
+
+class PeopleIndex:
+    """
+    Address id -> email row ids, with pre-aggregated risk stats per person.
+
+    Row ids are whatever the caller passes to update() (result frame
+    positions in the app, Unique IDs in a running job).
+    """
+
+    _STAT_COLUMNS = ("emails", "sent", "received", "critical_sent", "critical_received", "score_sum", "max_score")
+
+    def __init__(self):
+        self.book = AddressBook()
+        self.n_rows = 0
+        self._lock = threading.Lock()
+        self._stats = {c: np.zeros(0, dtype=np.float64 if "score" in c else np.int64) for c in self._STAT_COLUMNS}
+        self._category_names: List[str] = []
+        self._category_counts: List[np.ndarray] = []   # per category: count per address id
+        # Distinct From / To values seen so far and their address ids (CSR)
+        self._fields = pd.Index([], dtype=object)
+        self._field_starts = np.zeros(0, dtype=np.int64)
+        self._field_lengths = np.zeros(0, dtype=np.int64)
+        self._field_flat = np.zeros(0, dtype=np.int64)
+        # (address ids, row ids) appended per batch; sorted into a CSR layout on first lookup
+        self._links: Dict[str, List[tuple]] = {role: [] for role in ROLES}
+        self._csr: Dict[str, Optional[tuple]] = {role: None for role in ROLES}
+
+    def _capacity(self) -> int:
+        return len(self._stats["emails"])
+
+    def _grow(self, size: int) -> None:
+        current = self._capacity()
+        if size <= current:
+            return
+        capacity = max(size, current * 2, 1024)
+
+        def grown(values):
+            out = np.zeros(capacity, dtype=values.dtype)
+            out[:current] = values
+            return out
+        self._stats = {c: grown(v) for c, v in self._stats.items()}
+        self._category_counts = [grown(v) for v in self._category_counts]
+
+    def _address_ids(self, values: pd.Series) -> tuple:
+        """
+        (address ids, batch position of their row) for every address in a
+        From / To column. Each distinct field value is split and interned
+        once, ever; rows are then expanded with a vectorised gather.
+        """
+        codes, uniques = pd.factorize(values.fillna("").astype(str))
+        field_ids = self._fields.get_indexer(uniques)
+        new = field_ids < 0
+        if new.any():
+            added = [str(v) for v in np.asarray(uniques, dtype=object)[new]]
+            split = [np.array([self.book.intern(a) for a in split_addresses(v)], dtype=np.int64) for v in added]
+            lengths = np.fromiter((len(a) for a in split), dtype=np.int64, count=len(split))
+            starts = len(self._field_flat) + np.cumsum(lengths) - lengths
+            self._field_starts = np.concatenate([self._field_starts, starts])
+            self._field_lengths = np.concatenate([self._field_lengths, lengths])
+            self._field_flat = np.concatenate([self._field_flat] + split)
+            field_ids[new] = len(self._fields) + np.arange(len(added))
+            self._fields = self._fields.append(pd.Index(added, dtype=object))
+
+        row_fields = field_ids[codes]
+        lengths = self._field_lengths[row_fields]
+        row_starts = np.cumsum(lengths) - lengths
+        gather = np.repeat(self._field_starts[row_fields] - row_starts, lengths) + np.arange(int(lengths.sum()))
+        return self._field_flat[gather], np.repeat(np.arange(len(codes)), lengths)
+
+    def _category_codes(self, categories: pd.Series) -> np.ndarray:
+        codes = pd.Categorical(categories.astype(str))
+        mapping = []
+        for name in codes.categories:
+            if name not in self._category_names:
+                self._category_names.append(name)
+                self._category_counts.append(np.zeros(self._capacity(), dtype=np.int64))
+            mapping.append(self._category_names.index(name))
+        return np.asarray(mapping, dtype=np.int64)[codes.codes]
+
+    def update(self, rows: pd.DataFrame, row_ids: Optional[Sequence[int]] = None) -> None:
+        """
+        Add a batch of finished rows (from_email, to_email, category,
+        priority, score). row_ids default to consecutive positions.
+        """
+        if rows.empty:
+            return
+        with self._lock:
+            if row_ids is None:
+                row_ids = np.arange(self.n_rows, self.n_rows + len(rows))
+            row_ids = np.asarray(row_ids, dtype=np.int64)
+            score = pd.to_numeric(rows["score"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+            critical = (rows["priority"].astype(str) == "Critical").to_numpy(dtype=np.int64)
+            category = self._category_codes(rows["category"])
+
+            sender_ids, sender_pos = self._address_ids(rows["from_email"])
+            recipient_ids, recipient_pos = self._address_ids(rows["to_email"])
+            self._grow(len(self.book))
+
+            for role, critical_column, ids, pos in (("sent", "critical_sent", sender_ids, sender_pos),
+                                                    ("received", "critical_received", recipient_ids, recipient_pos)):
+                np.add.at(self._stats[role], ids, 1)
+                np.add.at(self._stats[critical_column], ids, critical[pos])
+                self._links[role].append((ids, row_ids[pos]))
+                self._csr[role] = None
+
+            # Score and category mix over every email a person is on, once per email
+            ids = np.concatenate([sender_ids, recipient_ids])
+            pos = np.concatenate([sender_pos, recipient_pos])
+            if len(ids):
+                # An address in both From and To of one email counts once
+                first = ~pd.Series(ids * len(rows) + pos).duplicated().to_numpy()
+                ids, pos = ids[first], pos[first]
+            np.add.at(self._stats["emails"], ids, 1)
+            np.add.at(self._stats["score_sum"], ids, score[pos])
+            np.maximum.at(self._stats["max_score"], ids, score[pos])
+            for code in np.unique(category[pos]):
+                mask = category[pos] == code
+                np.add.at(self._category_counts[code], ids[mask], 1)
+            self.n_rows += len(rows)
+
+    def _lookup_rows(self, role: str, address_id: int) -> np.ndarray:
+        if self._csr[role] is None:
+            links = self._links[role]
+            ids = np.concatenate([l[0] for l in links]) if links else np.empty(0, dtype=np.int64)
+            rows = np.concatenate([l[1] for l in links]) if links else np.empty(0, dtype=np.int64)
+            order = np.argsort(ids, kind="stable")
+            self._links[role] = [(ids[order], rows[order])]
+            self._csr[role] = (ids[order], rows[order])
+        ids, rows = self._csr[role]
+        return rows[np.searchsorted(ids, address_id, side="left"):np.searchsorted(ids, address_id, side="right")]
+
+    def rows(self, address: str, role: Optional[str] = None) -> np.ndarray:
+        """
+        Sorted row ids of the emails an address sent, received, or either
+        (role=None).
+        """
+        address_id = self.book.lookup(address)
+        if address_id is None:
+            return np.empty(0, dtype=np.int64)
+        with self._lock:
+            parts = [self._lookup_rows(r, address_id) for r in (ROLES if role is None else (role,))]
+        return np.unique(np.concatenate(parts))
+
+    def table(self) -> pd.DataFrame:
+        """
+        One row per person: counts, Critical counts, max / average score and
+        most frequent category.
+        """
+        with self._lock:
+            n = len(self.book)
+            stats = {c: v[:n].copy() for c, v in self._stats.items()}
+            names = np.asarray(self._category_names + [""], dtype=object)
+            if self._category_counts:
+                mix = np.stack([c[:n] for c in self._category_counts], axis=1)
+                top = np.where(mix.max(axis=1) > 0, mix.argmax(axis=1), len(self._category_names))
+            else:
+                top = np.full(n, len(self._category_names))
+            addresses = list(self.book.addresses)
+        emails = stats["emails"]
+        return pd.DataFrame({
+            "address": addresses,
+            "emails": emails,
+            "sent": stats["sent"],
+            "received": stats["received"],
+            "critical_sent": stats["critical_sent"],
+            "critical_received": stats["critical_received"],
+            "max_score": stats["max_score"],
+            "avg_score": np.divide(stats["score_sum"], emails, out=np.zeros(n), where=emails > 0),
+            "top_category": names[top],
+        })
+
+    def person(self, address: str) -> Optional[dict]:
+        """
+        Stats and category mix of one address (None if never seen).
+        """
+        address_id = self.book.lookup(address)
+        if address_id is None:
+            return None
+        with self._lock:
+            out = {"address": self.book.addresses[address_id]}
+            out.update({c: v[address_id].item() for c, v in self._stats.items()})
+            mix = {name: int(c[address_id]) for name, c in zip(self._category_names, self._category_counts)
+                   if c[address_id]}
+        out["category_mix"] = dict(sorted(mix.items(), key=lambda kv: -kv[1]))
+        out["avg_score"] = out["score_sum"] / out["emails"] if out["emails"] else 0.0
+        return out
+
+    def top(self, n: int = 10, by: str = "critical_sent") -> pd.DataFrame:
+        """
+        The n people ranked by a table() column (ties broken by max score).
+        """
+        table = self.table()
+        return table.sort_values([by, "max_score"], ascending=False, kind="stable").head(n)
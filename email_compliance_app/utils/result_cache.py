@@ -0,0 +1,130 @@
+# email_compliance_app\utils\result_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(APP_DIR, "artifacts", "result_cache"))
+
+# --------------------------------------------------
+# CROSS-SESSION RESULT CACHE
+# --------------------------------------------------
+# Keyed by a hash of the uploaded bytes + the pipeline/prompt version, so:
+#   - a different file with the same name never shows stale results
+#   - the same file uploaded from another browser session is served
+#     instantly instead of being reprocessed (and rebilled)
+# Recent results live in memory (LRU by entry count) and are written through
+# to parquet files on disk (LRU by total bytes), which survive restarts.
+
+
+def cache_key(content: bytes, version: str) -> str:
+    digest = hashlib.sha256(content).hexdigest()
+    return hashlib.sha256(f"{digest}:{version}".encode("utf-8")).hexdigest()[:32]
+
+
+def _restore_optional_ints(frame: pd.DataFrame) -> pd.DataFrame:
+    # Parquet turns an int-or-None object column into float64 / NaN
+    if "inherited_from" in frame.columns:
+        frame["inherited_from"] = pd.array(
+            [None if pd.isna(v) else int(v) for v in frame["inherited_from"]], dtype=object
+        )
+    return frame
+
+
+class ResultCache:
+    """
+    Thread-safe two-level LRU cache of (results frame, run stats).
+
+    Args:
+        max_entries: Results kept in memory
+        disk_dir: Directory for spilled parquet files (None = memory only)
+        max_disk_bytes: Disk budget; least recently used files are removed
+    """
+
+    def __init__(self, max_entries: int = 8, disk_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_disk_bytes: int = 2 * 1024 ** 3):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[pd.DataFrame, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (os.path.join(self.disk_dir, f"{key}.parquet"),
+                os.path.join(self.disk_dir, f"{key}.stats.json"))
+
+    def artifact_path(self, key: str, name: str) -> Optional[str]:
+        """
+        Path for a file / directory derived from an entry (e.g. its search
+        index), removed together with the entry. None for memory-only caches.
+        """
+        return os.path.join(self.disk_dir, f"{key}.{name}") if self.disk_dir else None
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, dict]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if not self.disk_dir:
+            return None
+        frame_path, stats_path = self._paths(key)
+        if not os.path.exists(frame_path):
+            return None
+        try:
+            frame = _restore_optional_ints(pd.read_parquet(frame_path))
+            with open(stats_path, encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(frame_path)  # LRU on disk is by modification time
+        self._remember(key, frame, stats)
+        return frame, stats
+
+    def put(self, key: str, frame: pd.DataFrame, stats: dict) -> None:
+        self._remember(key, frame, stats)
+        if not self.disk_dir:
+            return
+        frame_path, stats_path = self._paths(key)
+        # Stats first: the parquet file appearing is what marks an entry complete
+        with open(stats_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f)
+        tmp_path = frame_path + ".tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, frame_path)
+        self._evict_disk()
+
+    def _remember(self, key: str, frame: pd.DataFrame, stats: dict) -> None:
+        with self._lock:
+            self._memory[key] = (frame, stats)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".parquet"):
+                path = os.path.join(self.disk_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, name[:-len(".parquet")]))
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            for name in os.listdir(self.disk_dir):
+                if name.startswith(f"{key}.") and os.path.isdir(os.path.join(self.disk_dir, name)):
+                    shutil.rmtree(os.path.join(self.disk_dir, name), ignore_errors=True)
+            total -= size
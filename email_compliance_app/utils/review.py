@@ -0,0 +1,102 @@
+# email_compliance_app\utils\review.py
+
+import math
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# PAGINATED REVIEW (search / sort / slice on row positions)
+# --------------------------------------------------
+# The review pane only ever materialises one page of rows. Search and sort
+# work on integer positions, so the cost of building widgets is bounded by
+# the page size no matter how many emails were analysed. With a SearchIndex
+# (utils/search_index.py) queries go through the inverted index and can be
+# ranked by relevance; without one they fall back to a substring scan.
+
+SORT_OPTIONS = {
+    "Priority, then score": "priority",
+    "Relevance (search)": "relevance",
+    "Score (high → low)": "score_desc",
+    "Score (low → high)": "score_asc",
+    "Original order": "original",
+}
+
+PRIORITY_RANK = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
+SEARCH_COLUMNS = ("subject", "from_email", "to_email", "cleaned_text")
+
+
+def search_positions(df: pd.DataFrame, query: str, within: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Positions of rows whose subject / sender / recipients / cleaned text
+    contain every whitespace-separated term of the query (case-insensitive).
+    `within` restricts the search to those positions (e.g. a sidebar filter).
+    """
+    positions = np.arange(len(df)) if within is None else within
+    terms = query.lower().split()
+    if not terms:
+        return positions
+    mask = np.ones(len(positions), dtype=bool)
+    haystack = None
+    for column in SEARCH_COLUMNS:
+        if column in df.columns:
+            values = df[column] if within is None else df[column].iloc[positions]
+            col = values.astype(str).str.lower()
+            haystack = col if haystack is None else haystack + " " + col
+    if haystack is None:
+        return positions
+    for term in terms:
+        mask &= haystack.str.contains(term, regex=False).to_numpy()
+    return positions[mask]
+
+
+def sort_positions(df: pd.DataFrame, positions: np.ndarray, sort_by: str) -> np.ndarray:
+    if sort_by == "original" or len(positions) == 0:
+        return positions
+    scores = df["score"].to_numpy(dtype=np.float64)[positions]
+    if sort_by == "score_desc":
+        return positions[np.argsort(-scores, kind="stable")]
+    if sort_by == "score_asc":
+        return positions[np.argsort(scores, kind="stable")]
+    ranks = df["priority"].map(PRIORITY_RANK).fillna(len(PRIORITY_RANK)).to_numpy()[positions]
+    # lexsort: last key is primary -> priority rank, then highest score
+    return positions[np.lexsort((-scores, ranks))]
+
+
+def review_positions(df: pd.DataFrame, query: str = "", sort_by: str = "priority",
+                     within: Optional[np.ndarray] = None, index=None,
+                     fetch_rows: Optional[Callable[[np.ndarray], pd.DataFrame]] = None) -> np.ndarray:
+    """
+    Positions of the rows matching the search, in display order.
+    "relevance" keeps the index's BM25 order (priority order without a
+    query or an index). Phrases are verified on rows from fetch_rows, or
+    from `df` itself when it is not given.
+    """
+    if index is None or not query.strip():
+        positions = search_positions(df, query, within)
+        return sort_positions(df, positions, "priority" if sort_by == "relevance" else sort_by)
+    positions, _ = index.search(query, within=within, fetch_rows=fetch_rows or (lambda rows: df.iloc[rows]))
+    if sort_by == "relevance":
+        return positions
+    return sort_positions(df, np.sort(positions), sort_by)
+
+
+def page_count(n_rows: int, page_size: int) -> int:
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page_positions(positions: np.ndarray, page: int, page_size: int) -> np.ndarray:
+    """
+    Positions on one page (1-based), clamped to the available pages.
+    """
+    page = min(max(int(page), 1), page_count(len(positions), page_size))
+    start = (page - 1) * page_size
+    return positions[start:start + page_size]
+
+
+def page_rows(df: pd.DataFrame, positions: np.ndarray, page: int, page_size: int) -> pd.DataFrame:
+    """
+    Rows of one page (1-based), clamped to the available pages.
+    """
+    return df.iloc[page_positions(positions, page, page_size)]
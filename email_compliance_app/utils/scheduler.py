@@ -0,0 +1,90 @@
+# email_compliance_app\utils\scheduler.py
+
+import re
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from preprocessing.rules import CATEGORY_KEYWORDS, detect_priority
+from utils.excel_io import BODY_COLUMN
+from utils.review import PRIORITY_RANK
+
+# --------------------------------------------------
+# RISK-FIRST SCHEDULING
+# --------------------------------------------------
+# LLM work is the slow part of a run, so it is done most-likely-risky
+# first instead of in spreadsheet order:
+#   - within a run, the rules pass covers every email before the first LLM
+#     call, and LLM calls are dispatched by rule priority (Critical first),
+#     then by keyword evidence (rule keywords found in the text)
+#   - across uploads, each queued job gets a risk estimate (share of rows
+#     the rules would call Critical, from one vectorised scan of the raw
+#     bodies); the job queue starts the riskiest upload first and pauses a
+#     running lower-risk job for it when all workers are busy
+# Ordering only changes when a result arrives, never what it is.
+
+RiskKey = Tuple[int, int]
+
+
+def _keyword_pattern(keywords: Iterable[str]) -> str:
+    # Longest first, so "strictly between us" is one hit, not "between us"
+    return "|".join(re.escape(k) for k in sorted(set(keywords), key=len, reverse=True))
+
+
+@lru_cache(maxsize=1)
+def _evidence_pattern() -> str:
+    return _keyword_pattern(k for _, words in CATEGORY_KEYWORDS for k in words)
+
+
+@lru_cache(maxsize=1)
+def _critical_pattern() -> str:
+    # Keywords of the categories detect_priority always calls Critical
+    return _keyword_pattern(k for category, words in CATEGORY_KEYWORDS
+                            if detect_priority(category, "") == "Critical" for k in words)
+
+
+def keyword_evidence(texts: Sequence[str]) -> np.ndarray:
+    """
+    Rule keyword occurrences (any category) in each text, counted in one
+    vectorised regex pass.
+    """
+    array = pa.array(list(texts), pa.large_string())
+    counts = pc.count_substring_regex(array, _evidence_pattern(), ignore_case=True)
+    return counts.fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def risk_keys(rule_priorities: Sequence[str], texts: Sequence[str]) -> List[RiskKey]:
+    """
+    Sort key of each email for LLM dispatch (smaller = sooner): rule
+    priority, then keyword evidence.
+    """
+    ranks = [PRIORITY_RANK.get(p, len(PRIORITY_RANK)) for p in rule_priorities]
+    return list(zip(ranks, (-keyword_evidence(texts)).tolist()))
+
+
+def unit_risk_key(keys: Iterable[RiskKey]) -> RiskKey:
+    """
+    Sort key of emails classified together (a conversation): the most
+    severe rule priority, with the evidence of all of them.
+    """
+    keys = list(keys)
+    return min(k[0] for k in keys), sum(k[1] for k in keys)
+
+
+def upload_risk(chunks: Iterable[pd.DataFrame]) -> float:
+    """
+    Share of input rows (utils.excel_io.iter_input_chunks) whose raw body
+    contains a Critical rule keyword.
+    """
+    rows = critical = 0
+    for chunk in chunks:
+        if BODY_COLUMN not in chunk.columns:
+            continue
+        bodies = pa.array(chunk[BODY_COLUMN].astype(str).tolist(), pa.large_string())
+        rows += len(bodies)
+        critical += pc.sum(pc.match_substring_regex(bodies, _critical_pattern(), ignore_case=True)).as_py() or 0
+    return critical / rows if rows else 0.0
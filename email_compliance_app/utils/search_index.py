@@ -0,0 +1,452 @@
+# email_compliance_app\utils\search_index.py
+
+import functools
+import json
+import math
+import os
+import re
+import shutil
+import unicodedata
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# --------------------------------------------------
+# FULL-TEXT SEARCH INDEX OVER RESULTS
+# --------------------------------------------------
+# Built once when a run finishes and saved next to the cached result:
+#   - documents are result rows (ids = row positions), text = SEARCH_FIELDS
+#   - tokens: lowercased runs of letters / digits, found with numpy over
+#     the UTF-8 bytes (no per-email Python)
+#   - postings in CSR form: per term, sorted row ids and term frequencies;
+#     the vocabulary is kept sorted so prefix queries are a range lookup
+#   - saved as plain .npy files and memory-mapped on load, so sessions
+#     share one copy through the page cache instead of rebuilding it
+# Queries support implicit AND, OR, NOT / -term, "exact phrases", prefix*
+# and parentheses, and are ranked by BM25. Positions are not stored:
+# phrase candidates (rows with all phrase terms) are verified against their
+# text, which keeps the index small. Fields are joined with a separator
+# that is not a word character and may not sit inside a phrase, so a
+# phrase never matches across the end of one field and the next.
+
+SEARCH_FIELDS = ("subject", "from_email", "to_email", "cleaned_text")
+# Raw bodies (with signatures / quoted junk) roughly double index size and
+# build time, so they are only indexed on request
+INDEX_RAW_BODY = os.getenv("SEARCH_INDEX_RAW_BODY", "0") == "1"
+BUILD_CHUNK_ROWS = 100_000
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_TERMS = 512
+_NON_WORD = r"[^\p{L}\p{N}]"
+_FIELD_SEPARATOR = "\x1f"
+# Gap between two words of a phrase: non-word characters within one field
+_PHRASE_GAP = r"[^\p{L}\p{N}\x1f]+"
+_QUERY_TOKEN = re.compile(r'"[^"]*"?|\(|\)|[^\s()"]+')
+_FORMAT_VERSION = 1
+
+
+def index_fields() -> tuple:
+    return SEARCH_FIELDS + (("email_body",) if INDEX_RAW_BODY else ())
+
+
+def _document_text(frame: pd.DataFrame, fields: Sequence[str]) -> pa.Array:
+    columns = []
+    for field in fields:
+        if field not in frame.columns:
+            continue
+        values = frame[field]
+        if values.dtype != object and not isinstance(values.dtype, pd.StringDtype):
+            values = values.astype(str)
+        column = pa.array(values, type=pa.large_string(), from_pandas=True)
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+        columns.append(pc.fill_null(column, ""))
+    if not columns:
+        return pa.array([""] * len(frame), type=pa.large_string())
+    if len(columns) == 1:
+        return columns[0]
+    return pc.binary_join_element_wise(*columns, pa.scalar(_FIELD_SEPARATOR, pa.large_string()))
+
+
+@functools.lru_cache(maxsize=1)
+def _word_codepoints() -> np.ndarray:
+    """
+    Code point -> is a letter or digit (Unicode categories L* / N*), the
+    complement of _NON_WORD.
+    """
+    table = np.zeros(0x110000, dtype=bool)
+    table[[cp for cp in range(0x110000) if unicodedata.category(chr(cp))[0] in "LN"]] = True
+    return table
+
+
+# Byte -> is an ASCII letter / digit (multi-byte characters are classified separately)
+_ASCII_WORD = np.zeros(256, dtype=bool)
+for _low, _high in ((48, 58), (97, 123)):
+    _ASCII_WORD[_low:_high] = True
+
+
+def _utf8_code_points(data: np.ndarray, leads: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (code point, byte length) of the multi-byte characters starting at `leads`.
+    """
+    padded = np.concatenate((data, np.zeros(3, dtype=np.uint8)))
+    b0, b1, b2, b3 = (padded[leads + i].astype(np.int64) for i in range(4))
+    lengths = np.where(b0 < 0xE0, 2, np.where(b0 < 0xF0, 3, 4))
+    points = np.select(
+        [lengths == 2, lengths == 3],
+        [(b0 & 0x1F) << 6 | (b1 & 0x3F), (b0 & 0x0F) << 12 | (b1 & 0x3F) << 6 | (b2 & 0x3F)],
+        (b0 & 0x07) << 18 | (b1 & 0x3F) << 12 | (b2 & 0x3F) << 6 | (b3 & 0x3F),
+    )
+    return points, lengths
+
+
+def tokenize_many(texts: pa.Array) -> Tuple[pa.Array, np.ndarray]:
+    """
+    Tokens (lowercased runs of letters / digits) of many texts at once, with
+    the index of the text each came from, in order within each text.
+
+    Works on the UTF-8 buffer with numpy: every character is classified,
+    and since tokens are runs of word characters, the token bytes are just
+    the word bytes in order; only the run boundaries need computing.
+    """
+    texts = pc.utf8_lower(pc.fill_null(texts.cast(pa.large_string()), ""))
+    if isinstance(texts, pa.ChunkedArray):
+        texts = texts.combine_chunks()
+    buffers = texts.buffers()
+    offsets = np.frombuffer(buffers[1], dtype=np.int64)[texts.offset:texts.offset + len(texts) + 1]
+    data = np.frombuffer(buffers[2], dtype=np.uint8) if buffers[2] is not None else np.empty(0, np.uint8)
+    data = data[offsets[0]:offsets[-1]]
+    offsets = offsets - offsets[0]
+
+    word = _ASCII_WORD[data]
+    leads = np.flatnonzero(data >= 0xC0)
+    if len(leads):
+        # Every byte of a multi-byte character takes the character's class
+        points, lengths = _utf8_code_points(data, leads)
+        is_word = _word_codepoints()[points]
+        for i in range(4):
+            inside = lengths > i
+            word[leads[inside] + i] = is_word[inside]
+
+    # A run also breaks where one text ends and the next begins
+    text_start = np.zeros(len(data) + 1, dtype=bool)
+    text_start[offsets] = True
+    before = np.concatenate(([False], word[:-1])) & ~text_start[:-1]
+    after = np.concatenate((word[1:], [False])) & ~text_start[1:]
+    starts = np.flatnonzero(word & ~before)
+    ends = np.flatnonzero(word & ~after) + 1
+
+    token_offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(ends - starts, out=token_offsets[1:])
+    tokens = pa.LargeStringArray.from_buffers(len(starts), pa.py_buffer(token_offsets), pa.py_buffer(data[word]))
+    return tokens, np.searchsorted(offsets, starts, side="right") - 1
+
+
+def tokenize(text: str) -> List[str]:
+    return tokenize_many(pa.array([text], type=pa.large_string()))[0].to_pylist()
+
+
+def _intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Probe the longer sorted array with the shorter one
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    hits = np.searchsorted(b, a).clip(max=len(b) - 1)
+    return a[b[hits] == a]
+
+
+def _subtract(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if not len(a) or not len(b):
+        return a
+    hits = np.searchsorted(b, a).clip(max=len(b) - 1)
+    return a[b[hits] != a]
+
+
+def _union(arrays: List[np.ndarray]) -> np.ndarray:
+    arrays = [a for a in arrays if len(a)]
+    if not arrays:
+        return np.empty(0, dtype=np.int64)
+    return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+
+
+# ---------------- query parsing ----------------
+def parse_query(query: str):
+    """
+    Query string -> expression tree of ("term", t), ("prefix", p),
+    ("phrase", [t, ...]), ("and", [...]), ("or", [...]), ("not", node).
+    Lenient: unbalanced quotes / parentheses are closed implicitly.
+    """
+    tokens = _QUERY_TOKEN.findall(query)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        nodes = [parse_and()]
+        while peek() == "OR":
+            take()
+            nodes.append(parse_and())
+        nodes = [n for n in nodes if n is not None]
+        return None if not nodes else nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and():
+        nodes = []
+        while peek() is not None and peek() not in ("OR", ")"):
+            if peek() == "AND":
+                take()
+                continue
+            node = parse_unary()
+            if node is not None:
+                nodes.append(node)
+        return None if not nodes else nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_unary():
+        token = take()
+        if token == "NOT" or (token.startswith("-") and len(token) > 1):
+            if token != "NOT":
+                tokens.insert(pos, token[1:])
+            if peek() is None:
+                return None
+            inner = parse_unary()
+            return ("not", inner) if inner is not None else None
+        if token == "(":
+            inner = parse_or()
+            if peek() == ")":
+                take()
+            return inner
+        if token.startswith('"'):
+            words = tokenize(token.strip('"'))
+            return ("phrase", words) if len(words) > 1 else (("term", words[0]) if words else None)
+        prefix = token.endswith("*")
+        words = tokenize(token)
+        if not words:
+            return None
+        if prefix and len(words) == 1:
+            return ("prefix", words[0])
+        # e.g. trader@bank.com -> the phrase "trader bank com"
+        return ("phrase", words) if len(words) > 1 else ("term", words[0])
+
+    tree = parse_or()
+    while pos < len(tokens):   # stray ")" - parse the rest as more AND terms
+        take()
+        rest = parse_or()
+        if rest is not None:
+            tree = rest if tree is None else ("and", [tree, rest])
+    return tree
+
+
+def _positive_terms(node, negated: bool = False) -> List[tuple]:
+    """
+    Leaves that contribute to ranking (not under a NOT).
+    """
+    kind = node[0]
+    if kind == "not":
+        return _positive_terms(node[1], not negated)
+    if kind in ("and", "or"):
+        return [leaf for child in node[1] for leaf in _positive_terms(child, negated)]
+    return [] if negated else [node]
+
+
+class SearchIndex:
+    """
+    Inverted index over the text fields of a results frame (see module
+    comment). Use build() / load(), then search().
+    """
+
+    def __init__(self, vocab: np.ndarray, offsets: np.ndarray, docs: np.ndarray, freqs: np.ndarray,
+                 doc_lengths: np.ndarray, fields: Sequence[str]):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.freqs = freqs
+        self.doc_lengths = doc_lengths
+        self.fields = tuple(fields)
+        self.n_docs = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if self.n_docs else 0.0
+
+    # ---------------- building ----------------
+    @classmethod
+    def build(cls, frame: pd.DataFrame, fields: Optional[Sequence[str]] = None,
+              chunk_rows: int = BUILD_CHUNK_ROWS) -> "SearchIndex":
+        fields = index_fields() if fields is None else fields
+        n = len(frame)
+        vocab = pd.Index([], dtype=object)
+        doc_lengths = np.zeros(n, dtype=np.int32)
+        parts = []
+        for start in range(0, n, chunk_rows):
+            stop = min(start + chunk_rows, n)
+            tokens, parents = tokenize_many(_document_text(frame.iloc[start:stop], fields))
+            doc_lengths[start:stop] = np.bincount(parents, minlength=stop - start)
+            encoded = pc.dictionary_encode(tokens).combine_chunks() if isinstance(tokens, pa.ChunkedArray) \
+                else pc.dictionary_encode(tokens)
+            local = encoded.dictionary.to_numpy(zero_copy_only=False).astype(object)
+            term_ids = vocab.get_indexer(local)
+            new = term_ids < 0
+            if new.any():
+                term_ids[new] = len(vocab) + np.arange(int(new.sum()))
+                vocab = vocab.append(pd.Index(local[new], dtype=object))
+            terms = term_ids[encoded.indices.to_numpy()].astype(np.int64)
+            # Unique (term, row) pairs with their counts, ordered by term then row
+            keys, counts = np.unique(terms * (stop - start) + parents, return_counts=True)
+            parts.append((keys // (stop - start), keys % (stop - start) + start, counts))
+
+        # Renumber terms alphabetically, then one stable sort by term keeps
+        # each term's rows ascending (chunks are in row order)
+        vocab = vocab.to_numpy(dtype=object)
+        alphabetical = np.argsort(vocab, kind="stable")
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[alphabetical] = np.arange(len(vocab))
+        terms = rank[np.concatenate([p[0] for p in parts])] if parts else np.empty(0, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        docs = np.concatenate([p[1] for p in parts])[order].astype(np.int32) if parts else np.empty(0, np.int32)
+        freqs = np.minimum(np.concatenate([p[2] for p in parts])[order], 65_535).astype(np.uint16) \
+            if parts else np.empty(0, np.uint16)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(terms, minlength=len(vocab)))
+        return cls(vocab[alphabetical], offsets, docs, freqs, doc_lengths, fields)
+
+    # ---------------- persistence ----------------
+    def save(self, path: str) -> str:
+        """
+        Write the index to directory `path` (replaced atomically).
+        """
+        tmp = path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in ("offsets", "docs", "freqs", "doc_lengths"):
+            np.save(os.path.join(tmp, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp, "vocab.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(self.vocab.tolist()))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": _FORMAT_VERSION, "fields": list(self.fields), "n_docs": self.n_docs}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SearchIndex"]:
+        """
+        Memory-mapped index saved by save(), or None if missing / outdated.
+        """
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != _FORMAT_VERSION:
+                return None
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                      for name in ("offsets", "docs", "freqs", "doc_lengths")}
+            with open(os.path.join(path, "vocab.txt"), encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, ValueError):
+            return None
+        vocab = np.array(text.split("\n") if text else [], dtype=object)
+        return cls(vocab, arrays["offsets"], arrays["docs"], arrays["freqs"], arrays["doc_lengths"],
+                   meta["fields"])
+
+    # ---------------- querying ----------------
+    def _term_id(self, term: str) -> int:
+        i = int(np.searchsorted(self.vocab, term))
+        return i if i < len(self.vocab) and self.vocab[i] == term else -1
+
+    def _prefix_ids(self, prefix: str) -> range:
+        low = int(np.searchsorted(self.vocab, prefix))
+        high = int(np.searchsorted(self.vocab, prefix + "\U0010ffff"))
+        return range(low, min(high, low + MAX_PREFIX_TERMS))
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if term_id < 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint16)
+        start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.docs[start:stop], self.freqs[start:stop]
+
+    def _rows(self, node, universe: np.ndarray, fetch_rows) -> np.ndarray:
+        kind = node[0]
+        if kind == "term":
+            return self.postings(self._term_id(node[1]))[0]
+        if kind == "prefix":
+            return _union([self.postings(i)[0] for i in self._prefix_ids(node[1])])
+        if kind == "phrase":
+            candidates = self._rows(("and", [("term", t) for t in node[1]]), universe, fetch_rows)
+            if fetch_rows is None:
+                raise ValueError("Phrase queries need fetch_rows to verify matches against the row text")
+            candidates = _intersect(candidates.astype(np.int64), universe)
+            if not len(candidates):
+                return candidates
+            # Words are letters / digits only, so they are safe inside the pattern
+            words = _PHRASE_GAP.join(node[1])
+            texts = pc.utf8_lower(_document_text(fetch_rows(candidates), self.fields))
+            found = pc.match_substring_regex(texts, f"(?:^|{_NON_WORD}){words}(?:$|{_NON_WORD})")
+            return candidates[found.to_numpy(zero_copy_only=False)]
+        if kind == "not":
+            return _subtract(universe, self._rows(node[1], universe, fetch_rows).astype(np.int64))
+        if kind == "or":
+            return _union([self._rows(child, universe, fetch_rows).astype(np.int64) for child in node[1]])
+        # and: positives first (smallest first), then remove the negated ones
+        positives = [c for c in node[1] if c[0] != "not"]
+        negatives = [c[1] for c in node[1] if c[0] == "not"]
+        if positives:
+            sets = sorted((self._rows(c, universe, fetch_rows).astype(np.int64) for c in positives), key=len)
+            rows = sets[0]
+            for other in sets[1:]:
+                rows = _intersect(rows, other)
+        else:
+            rows = universe
+        for negative in negatives:
+            rows = _subtract(rows, self._rows(negative, universe, fetch_rows).astype(np.int64))
+        return rows
+
+    def _bm25(self, rows: np.ndarray, leaves: List[tuple]) -> np.ndarray:
+        term_ids = set()
+        for kind, value in leaves:
+            if kind == "term":
+                term_ids.add(self._term_id(value))
+            elif kind == "phrase":
+                term_ids.update(self._term_id(t) for t in value)
+            else:
+                term_ids.update(self._prefix_ids(value))
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / max(self.avg_length, 1e-9))
+        for term_id in term_ids - {-1}:
+            docs, freqs = self.postings(term_id)
+            idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = freqs.astype(np.float32)
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+        return scores[rows]
+
+    def search(self, query: str, within: Optional[np.ndarray] = None,
+               fetch_rows: Optional[Callable[[np.ndarray], pd.DataFrame]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows matching the query, best BM25 score first.
+
+        Args:
+            within: Restrict to these row positions (e.g. a sidebar filter)
+            fetch_rows: Callable(positions) -> frame with the index's fields,
+                        used to verify phrase matches
+
+        Raises:
+            ValueError: If the query has a phrase and fetch_rows is None
+
+        Returns:
+            (row positions, scores); an empty query returns `within` (or
+            all rows) in their given order with zero scores
+        """
+        universe = np.arange(self.n_docs) if within is None else np.asarray(within, dtype=np.int64)
+        tree = parse_query(query)
+        if tree is None:
+            return universe, np.zeros(len(universe), dtype=np.float32)
+        rows = self._rows(tree, np.sort(universe), fetch_rows).astype(np.int64)
+        if within is not None:
+            rows = _intersect(rows, np.sort(universe))
+        scores = self._bm25(rows, _positive_terms(tree))
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
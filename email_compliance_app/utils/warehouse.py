@@ -0,0 +1,272 @@
+# email_compliance_app\utils\warehouse.py
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Sequence
+
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_WAREHOUSE_PATH = os.getenv("WAREHOUSE_PATH", os.path.join(APP_DIR, "artifacts", "history.sqlite"))
+
+# --------------------------------------------------
+# CROSS-RUN RESULT HISTORY
+# --------------------------------------------------
+# Every finished analysis is appended here, so questions across runs are
+# answered without re-uploading anything. Two layers:
+#   - results: one row per analysed email (no bodies), senders stored once
+#     in their own table, indexed on run day, category, priority, score and
+#     sender for drill-down queries
+#   - daily: counts per (day, sender, category, priority) and day_totals:
+#     counts per (day, category, priority), both updated on every append.
+#     Aggregate questions ("top senders by Critical count over the last 90
+#     days", trends, totals) read these, whose size grows with distinct
+#     senders per day (resp. days) rather than with emails.
+
+SECONDS_PER_DAY = 86_400
+_RESULT_COLUMNS = ("unique_id", "from_email", "to_email", "subject", "category", "priority", "score",
+                   "source", "total_tokens")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    "run_no INTEGER PRIMARY KEY, run_id TEXT UNIQUE NOT NULL, upload_key TEXT, file_name TEXT, "
+    "mode TEXT, run_at REAL NOT NULL, run_day INTEGER NOT NULL, emails INTEGER, critical INTEGER)",
+    "CREATE TABLE IF NOT EXISTS senders (sender_id INTEGER PRIMARY KEY, address TEXT UNIQUE NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS results ("
+    "run_no INTEGER NOT NULL, run_day INTEGER NOT NULL, unique_id INTEGER, sender_id INTEGER, "
+    "to_email TEXT, subject TEXT, category TEXT, priority TEXT, score REAL, source TEXT, total_tokens INTEGER)",
+    # (key, score, run_day): "highest scores for X" walks one index backwards
+    # and stops after LIMIT rows, checking the date inside the index
+    "CREATE INDEX IF NOT EXISTS results_priority ON results (priority, score, run_day)",
+    "CREATE INDEX IF NOT EXISTS results_category ON results (category, score, run_day)",
+    "CREATE INDEX IF NOT EXISTS results_sender ON results (sender_id, score, run_day)",
+    "CREATE INDEX IF NOT EXISTS results_score ON results (score)",
+    "CREATE INDEX IF NOT EXISTS results_run ON results (run_no)",
+    "CREATE TABLE IF NOT EXISTS daily ("
+    "run_day INTEGER NOT NULL, sender_id INTEGER NOT NULL, category TEXT NOT NULL, priority TEXT NOT NULL, "
+    "emails INTEGER NOT NULL, score_sum REAL NOT NULL, tokens INTEGER NOT NULL, "
+    "PRIMARY KEY (run_day, sender_id, category, priority)) WITHOUT ROWID",
+    # Covering: top-sender queries never touch the table itself
+    "CREATE INDEX IF NOT EXISTS daily_priority ON daily (priority, run_day, sender_id, emails, score_sum)",
+    "CREATE TABLE IF NOT EXISTS day_totals ("
+    "run_day INTEGER NOT NULL, category TEXT NOT NULL, priority TEXT NOT NULL, "
+    "emails INTEGER NOT NULL, score_sum REAL NOT NULL, tokens INTEGER NOT NULL, "
+    "PRIMARY KEY (run_day, category, priority)) WITHOUT ROWID",
+)
+_UPSERT = (
+    "INSERT INTO {table} ({keys}, emails, score_sum, tokens) VALUES ({marks}, ?, ?, ?) "
+    "ON CONFLICT ({keys}) DO UPDATE SET emails = emails + excluded.emails, "
+    "score_sum = score_sum + excluded.score_sum, tokens = tokens + excluded.tokens"
+)
+
+
+def day_number(timestamp: float) -> int:
+    """
+    UTC day number (days since 1970-01-01) of a Unix timestamp.
+    """
+    return int(timestamp // SECONDS_PER_DAY)
+
+
+def _in_clause(column: str, values: Sequence) -> str:
+    return f"{column} IN ({', '.join('?' * len(values))})"
+
+
+class Warehouse:
+    """
+    SQLite store of every finished run's results (see module comment).
+    """
+
+    def __init__(self, path: str = DEFAULT_WAREHOUSE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    # ---------------- writing ----------------
+    def _sender_ids(self, addresses: pd.Series) -> pd.Series:
+        unique = addresses.drop_duplicates().tolist()
+        self._conn.executemany("INSERT OR IGNORE INTO senders (address) VALUES (?)", [(a,) for a in unique])
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_senders (address TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM wanted_senders")
+        self._conn.executemany("INSERT INTO wanted_senders VALUES (?)", [(a,) for a in unique])
+        mapping = dict(self._conn.execute(
+            "SELECT s.address, s.sender_id FROM senders s JOIN wanted_senders w ON s.address = w.address"
+        ).fetchall())
+        return addresses.map(mapping)
+
+    def append_run(self, run_id: str, frame: pd.DataFrame, upload_key: Optional[str] = None,
+                   file_name: Optional[str] = None, mode: Optional[str] = None,
+                   run_at: Optional[float] = None) -> bool:
+        """
+        Append one run's results (EmailOutput columns; bodies are not kept).
+
+        Returns:
+            False if a run with this id was already stored
+        """
+        run_at = time.time() if run_at is None else run_at
+        run_day = day_number(run_at)
+        rows = pd.DataFrame({c: frame[c] for c in _RESULT_COLUMNS}).reset_index(drop=True)
+        rows["from_email"] = rows["from_email"].astype(str)
+        rows["category"] = rows["category"].astype(str)
+        rows["priority"] = rows["priority"].astype(str)
+        critical = int((rows["priority"] == "Critical").sum())
+
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO runs (run_id, upload_key, file_name, mode, run_at, run_day, emails, "
+                    "critical) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, upload_key, file_name, mode, run_at, run_day, len(rows), critical),
+                )
+                if cursor.rowcount == 0:
+                    self._conn.rollback()
+                    return False
+                run_no = cursor.lastrowid
+                rows["sender_id"] = self._sender_ids(rows["from_email"])
+
+                values = rows[["unique_id", "sender_id", "to_email", "subject", "category", "priority", "score",
+                               "source", "total_tokens"]].astype(object)
+                self._conn.executemany(
+                    "INSERT INTO results (run_no, run_day, unique_id, sender_id, to_email, subject, category, "
+                    "priority, score, source, total_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((run_no, run_day) + r for r in values.itertuples(index=False, name=None)),
+                )
+
+                for table, keys in (("daily", ("sender_id", "category", "priority")),
+                                    ("day_totals", ("category", "priority"))):
+                    rollup = rows.groupby(list(keys), sort=False).agg(
+                        emails=("score", "size"), score_sum=("score", "sum"), tokens=("total_tokens", "sum"),
+                    ).reset_index().astype(object)
+                    self._conn.executemany(
+                        _UPSERT.format(table=table, keys=", ".join(("run_day",) + keys),
+                                       marks=", ".join("?" * (len(keys) + 1))),
+                        ((run_day,) + r for r in rollup.itertuples(index=False, name=None)),
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            # Keeps the planner's statistics current as the tables grow
+            self._conn.execute("PRAGMA optimize")
+        return True
+
+    # ---------------- querying ----------------
+    def _query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        with self._lock:
+            cursor = self._conn.execute(sql, tuple(params))
+            columns = [d[0] for d in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    @staticmethod
+    def _since(days: Optional[int]) -> int:
+        return day_number(time.time()) - days + 1 if days else 0
+
+    def runs(self, limit: int = 50) -> pd.DataFrame:
+        """
+        Most recent runs first.
+        """
+        frame = self._query(
+            "SELECT run_id, file_name, mode, run_at, emails, critical FROM runs ORDER BY run_at DESC LIMIT ?",
+            (limit,),
+        )
+        frame["run_at"] = pd.to_datetime(frame["run_at"], unit="s", utc=True)
+        return frame
+
+    def summary(self, days: Optional[int] = 90) -> dict:
+        """
+        Runs, emails and per-priority counts within the last `days` days.
+        """
+        since = self._since(days)
+        by_priority = self._query(
+            "SELECT priority, SUM(emails) AS emails FROM day_totals WHERE run_day >= ? GROUP BY priority", (since,)
+        )
+        runs = self._query("SELECT COUNT(*) AS runs FROM runs WHERE run_day >= ?", (since,))["runs"].iloc[0]
+        counts = dict(zip(by_priority["priority"], by_priority["emails"].astype(int)))
+        return {"runs": int(runs), "emails": sum(counts.values()), "priority_counts": counts}
+
+    def top_senders(self, days: Optional[int] = 90, priorities: Sequence[str] = ("Critical",),
+                    categories: Sequence[str] = (), limit: int = 20) -> pd.DataFrame:
+        """
+        Senders with the most emails of the given priorities (and categories)
+        in the last `days` days, from the daily rollup.
+        """
+        where, params = ["d.run_day >= ?"], [self._since(days)]
+        if priorities:
+            where.append(_in_clause("d.priority", priorities))
+            params.extend(priorities)
+        if categories:
+            where.append(_in_clause("d.category", categories))
+            params.extend(categories)
+        return self._query(
+            f"SELECT s.address AS sender, t.emails, t.avg_score FROM ("
+            f"SELECT d.sender_id, SUM(d.emails) AS emails, SUM(d.score_sum) / SUM(d.emails) AS avg_score "
+            f"FROM daily d WHERE {' AND '.join(where)} GROUP BY d.sender_id ORDER BY emails DESC LIMIT ?"
+            f") t JOIN senders s ON s.sender_id = t.sender_id ORDER BY t.emails DESC",
+            params + [limit],
+        )
+
+    def daily_counts(self, days: Optional[int] = 90, by: str = "priority",
+                     categories: Sequence[str] = (), priorities: Sequence[str] = ()) -> pd.DataFrame:
+        """
+        Emails per day, split by priority or category, from the day totals.
+        """
+        if by not in ("priority", "category"):
+            raise ValueError(f"by must be 'priority' or 'category', got {by!r}")
+        where, params = ["run_day >= ?"], [self._since(days)]
+        if categories:
+            where.append(_in_clause("category", categories))
+            params.extend(categories)
+        if priorities:
+            where.append(_in_clause("priority", priorities))
+            params.extend(priorities)
+        frame = self._query(
+            f"SELECT run_day, {by}, SUM(emails) AS emails FROM day_totals WHERE {' AND '.join(where)} "
+            f"GROUP BY run_day, {by} ORDER BY run_day",
+            params,
+        )
+        frame["date"] = pd.to_datetime(frame.pop("run_day"), unit="D")
+        return frame[["date", by, "emails"]]
+
+    def search(self, days: Optional[int] = 90, categories: Sequence[str] = (), priorities: Sequence[str] = (),
+               sender: Optional[str] = None, min_score: float = 0.0, limit: int = 200) -> pd.DataFrame:
+        """
+        Highest-scoring stored emails matching the filters, newest run first
+        among equal scores.
+        """
+        where, params = ["r.run_day >= ?"], [self._since(days)]
+        if categories:
+            where.append(_in_clause("r.category", categories))
+            params.extend(categories)
+        if priorities:
+            where.append(_in_clause("r.priority", priorities))
+            params.extend(priorities)
+        if min_score:
+            where.append("r.score >= ?")
+            params.append(min_score)
+        if sender:
+            where.append("r.sender_id = (SELECT sender_id FROM senders WHERE address = ?)")
+            params.append(sender)
+        frame = self._query(
+            f"SELECT u.run_at, u.file_name, r.unique_id, s.address AS from_email, r.to_email, r.subject, "
+            f"r.category, r.priority, r.score, r.source FROM results r "
+            f"JOIN senders s ON s.sender_id = r.sender_id JOIN runs u ON u.run_no = r.run_no "
+            f"WHERE {' AND '.join(where)} ORDER BY r.score DESC, r.run_no DESC LIMIT ?",
+            params + [limit],
+        )
+        frame["run_at"] = pd.to_datetime(frame["run_at"], unit="s", utc=True)
+        return frame
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()